@@ -0,0 +1,185 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = REGISTRY.histogram(
+    "netra_batch_size", "Images per batched interpreter invoke", ("model",),
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "netra_batch_queue_wait_seconds", "Time an image waits in a batcher queue before dispatch", ("model",)
+)
+
+
+class _PendingItem:
+    """Single image waiting in a batcher queue"""
+    __slots__ = ("array", "future", "enqueued_at")
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent single-image requests into one batched interpreter invoke
+
+    A background thread takes the first queued image, then keeps collecting
+    until either ``max_batch_size`` images are pending or ``max_wait_ms`` has
+    elapsed since that first image was queued. The batch is handed to
+    ``predict_fn`` as a list of the queued arrays, so it can be written into
+    the interpreter without first stacking it, and each row of the result is
+    returned to its caller.
+    With ``workers`` > 1 several batches can be in flight at once, which is
+    useful when ``predict_fn`` draws from an interpreter pool.
+    """
+
+    def __init__(self, name: str, predict_fn: Callable[[list], np.ndarray],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, workers: int = 1):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.workers = max(1, workers)
+        self._queue = queue.Queue()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"batcher-{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"{self.name} batcher started - max_batch_size: {self.max_batch_size}, "
+                    f"max_wait: {self.max_wait * 1000:.1f}ms, workers: {self.workers}")
+
+    def stop(self, timeout: float = 5.0):
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending(self) -> int:
+        """Images currently waiting in the queue"""
+        return self._queue.qsize()
+
+    def snapshot(self) -> dict:
+        sizes = BATCH_SIZE.summary().get(self.name, {})
+        waits = QUEUE_WAIT.summary(scale=1000).get(self.name, {})
+        batches = sizes.get("count", 0)
+        return {
+            "batches": batches,
+            "images": round(batches * sizes.get("mean", 0.0)),
+            "mean_batch_size": sizes.get("mean", 0.0),
+            "pending": self.pending(),
+            "queue_wait_ms": {key: waits.get(key, 0.0) for key in ("p50", "p95", "p99")},
+        }
+
+    def submit(self, img_array: np.ndarray) -> Future:
+        """Queue one preprocessed image of shape (1, H, W, C) and return a future for its prediction
+
+        The future resolves to ``(predictions, info)`` where ``predictions`` has
+        shape (1, num_classes), or is a list of such arrays for a multi-output
+        model, and ``info`` holds batch size, queue wait and
+        invoke time for this request.
+        """
+        if not self._threads:
+            raise RuntimeError(f"{self.name} batcher is not running")
+        item = _PendingItem(img_array)
+        self._queue.put(item)
+        return item.future
+
+    def _collect(self, first: _PendingItem) -> tuple:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                # One bad batch must not take the thread, and every later request, down with it
+                logger.exception(f"{self.name} batch dispatch failed")
+                for item in batch:
+                    if item.future.running():
+                        item.future.set_exception(e)
+            if stopping:
+                break
+
+        # Fail anything still queued so callers are not left waiting, handing
+        # other workers' stop sentinels back to the queue
+        sentinels = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                sentinels += 1
+            elif item.future.set_running_or_notify_cancel():
+                item.future.set_exception(RuntimeError(f"{self.name} batcher stopped"))
+        for _ in range(sentinels):
+            self._queue.put(None)
+
+    def _dispatch(self, batch: list):
+        # Drop images whose caller has gone (e.g. the client disconnected);
+        # the rest can no longer be cancelled, so resolving them cannot fail
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        dispatch_time = time.perf_counter()
+        waits = [dispatch_time - item.enqueued_at for item in batch]
+
+        try:
+            invoke_start = time.perf_counter()
+            predictions = self.predict_fn([item.array for item in batch])
+            invoke_ms = (time.perf_counter() - invoke_start) * 1000
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {str(e)}")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        BATCH_SIZE.observe(len(batch), model=self.name)
+        for wait in waits:
+            QUEUE_WAIT.observe(wait, model=self.name)
+
+        for i, item in enumerate(batch):
+            info = {
+                "batch_size": len(batch),
+                "queue_wait_ms": waits[i] * 1000,
+                "invoke_ms": invoke_ms,
+            }
+            # Multi-output models return one array per head; split each of them
+            if isinstance(predictions, list):
+                rows = [head[i:i + 1] for head in predictions]
+            else:
+                rows = predictions[i:i + 1]
+            item.future.set_result((rows, info))
@@ -0,0 +1,84 @@
+import threading
+from typing import Optional
+
+from .metrics import Counter
+
+
+class CascadeStats:
+    """Escalation rate and model latency saved by the confidence-gated cascade, per model
+
+    Every image a screening model answers saves the latency the full model
+    would have taken, estimated as a moving average of the full model's
+    latency on escalated images (the ``seed()`` estimate until the first
+    escalation); every escalated image costs the screening model's latency
+    on top. Callers must measure both tiers the same way, per-image invoke
+    time, so queueing and batching windows do not cancel out the saving.
+    Images screened while there is no full-model estimate yet are counted
+    as ``unestimated`` and add nothing to the saving. Both are exported as
+    counters so dashboards can derive the rate and the net saving, and
+    summarized per model on ``/performance``.
+    """
+
+    def __init__(self, images: Counter, saved: Counter, overhead: Counter, smoothing: float = 0.1):
+        self.images = images
+        self.saved = saved
+        self.overhead = overhead
+        self.smoothing = smoothing
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, name: str) -> dict:
+        return self._models.setdefault(name, {
+            "screened": 0, "escalated": 0, "unestimated": 0, "saved_ms": 0.0, "overhead_ms": 0.0,
+            "full_ms": None,
+        })
+
+    def seed(self, name: str, full_ms: Optional[float]):
+        """Initial full-model per-image invoke estimate, e.g. from interpreter calibration"""
+        with self._lock:
+            model = self._model(name)
+            if model["full_ms"] is None and full_ms:
+                model["full_ms"] = full_ms
+
+    def record(self, name: str, screening_ms: float, full_ms: Optional[float] = None):
+        """One image: answered by the screening model, or escalated when ``full_ms`` is given"""
+        with self._lock:
+            model = self._model(name)
+            saved_ms = 0.0
+            if full_ms is None:
+                model["screened"] += 1
+                if model["full_ms"] is None:
+                    model["unestimated"] += 1
+                else:
+                    saved_ms = max(0.0, model["full_ms"] - screening_ms)
+                    model["saved_ms"] += saved_ms
+            else:
+                model["escalated"] += 1
+                model["overhead_ms"] += screening_ms
+                estimate = model["full_ms"]
+                model["full_ms"] = full_ms if estimate is None else estimate + self.smoothing * (full_ms - estimate)
+
+        if full_ms is None:
+            self.images.inc(model=name, tier="screening")
+            self.saved.inc(saved_ms / 1000, model=name)
+        else:
+            self.images.inc(model=name, tier="escalated")
+            self.overhead.inc(screening_ms / 1000, model=name)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            summary = {}
+            for name, model in self._models.items():
+                images = model["screened"] + model["escalated"]
+                estimated = images - model["unestimated"]
+                summary[name] = {
+                    "screened": model["screened"],
+                    "escalated": model["escalated"],
+                    "escalation_rate": round(model["escalated"] / images, 4) if images else None,
+                    "unestimated": model["unestimated"],
+                    # Averaged over the images a full-model estimate was available for
+                    "avg_saved_ms": round((model["saved_ms"] - model["overhead_ms"]) / estimated, 3)
+                    if estimated else None,
+                    "full_ms_estimate": round(model["full_ms"], 3) if model["full_ms"] is not None else None,
+                }
+            return summary
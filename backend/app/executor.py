@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceSaturated(Exception):
+    """Raised when the inference stage has no admission slots left"""
+
+
+class InferenceExecutor:
+    """Thread pool for CPU-bound decode and preprocessing with bounded admission
+
+    ``admit()`` reserves one of ``max_pending`` slots for the lifetime of a
+    request and fails fast when none are free, so overload turns into a quick
+    503 instead of an ever-growing backlog. ``run()`` executes blocking work
+    on the pool so the event loop only handles I/O, in a copy of the
+    caller's context so context variables such as the request id carry
+    over to the work's log records. Unless given,
+    ``max_pending`` is four per worker but at least ``min_pending``, so
+    admission never caps concurrency below what the downstream batchers
+    need to fill their batches.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 min_pending: int = 1):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or max(self.max_workers * 4, min_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Reserve an admission slot or raise InferenceSaturated"""
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self.rejected += 1
+                raise InferenceSaturated(
+                    f"Inference queue full ({self._in_flight}/{self.max_pending} requests in flight)"
+                )
+            self._in_flight += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextmanager
+    def admit(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not copy contextvars the way asyncio.to_thread does
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_in_flight": self.max_pending,
+                "in_flight": self._in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
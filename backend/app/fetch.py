@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLarge(ValueError):
+    """Raised as soon as a remote image is known to exceed the size cap"""
+
+
+class ImageFetcher:
+    """Shared keep-alive HTTP client for img_url downloads with streaming size limits
+
+    The body is read in chunks and the download is aborted the moment the
+    running total crosses ``max_bytes``, so an oversized response is never
+    fully buffered. When ``check_content_length`` is set, a declared
+    Content-Length over the cap is rejected before reading any body.
+    ``total_timeout`` bounds the whole download, which per-read timeouts
+    alone do not do for a host that trickles bytes.
+    """
+
+    def __init__(self, max_bytes: int, connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 total_timeout: float = 15.0, max_connections: int = 20,
+                 check_content_length: bool = True):
+        self.max_bytes = max_bytes
+        self.total_timeout = total_timeout
+        self.check_content_length = check_content_length
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            headers={'User-Agent': 'Netra-AI/1.0'},
+            follow_redirects=True
+        )
+
+    async def fetch(self, url: str) -> bytes:
+        try:
+            return await asyncio.wait_for(self._fetch(url), timeout=self.total_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Image download exceeded {self.total_timeout:.0f}s") from None
+
+    async def _fetch(self, url: str) -> bytes:
+        async with self._client.stream("GET", url) as response:
+            response.raise_for_status()
+
+            if self.check_content_length:
+                declared = response.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                    raise ImageTooLarge(f"Image too large: {declared} bytes declared")
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > self.max_bytes:
+                    raise ImageTooLarge(f"Image too large: more than {self.max_bytes} bytes")
+
+        return bytes(body)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,346 @@
+import io
+import struct
+from typing import AsyncIterator, Optional
+
+from PIL import Image
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Formats the preprocessing path accepts, matching ARCHIVE_IMAGE_EXTENSIONS
+SUPPORTED_FORMATS = ("JPEG", "PNG", "WEBP", "BMP", "TIFF")
+
+# Smallest side validate_image accepts
+MIN_IMAGE_SIDE = 50
+
+# JPEG start-of-frame markers carry the dimensions; C4, C8 and CC are not frames
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Longest signature needed to tell the supported formats apart
+_SIGNATURE_BYTES = 12
+
+# Most of a streamed file part sniffed for its header; the full check at the
+# end of the part covers headers further in
+_SNIFF_BYTES = 64 * 1024
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class RejectedUpload(ValueError):
+    """Raised as soon as an input is known to be unacceptable, before any pixel decode"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ImageHeader:
+    """Format and dimensions read from an image's first bytes; TIFF dimensions may be unknown"""
+    __slots__ = ("format", "width", "height")
+
+    def __init__(self, format: str, width: Optional[int], height: Optional[int]):
+        self.format = format
+        self.width = width
+        self.height = height
+
+
+def _sniff_jpeg(head: bytes) -> Optional[ImageHeader]:
+    i = 2
+    while True:
+        if i + 2 > len(head):
+            return None
+        if head[i] != 0xFF:
+            raise RejectedUpload("Corrupt JPEG: bad marker")
+        marker = head[i + 1]
+        i += 2
+        if marker == 0xFF:
+            i -= 1  # fill byte, the marker is next
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            raise RejectedUpload("Corrupt JPEG: image data before frame header")
+        if i + 2 > len(head):
+            return None
+        length = struct.unpack(">H", head[i:i + 2])[0]
+        if length < 2:
+            raise RejectedUpload("Corrupt JPEG: bad segment length")
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 7 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[i + 3:i + 7])
+            return ImageHeader("JPEG", width, height)
+        i += length
+
+
+def _sniff_png(head: bytes) -> Optional[ImageHeader]:
+    if len(head) < 24:
+        return None
+    if head[12:16] != b"IHDR":
+        raise RejectedUpload("Corrupt PNG: missing IHDR")
+    width, height = struct.unpack(">II", head[16:24])
+    return ImageHeader("PNG", width, height)
+
+
+def _sniff_webp(head: bytes) -> Optional[ImageHeader]:
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        if head[23:26] != b"\x9d\x01\x2a":
+            raise RejectedUpload("Corrupt WebP: bad VP8 frame")
+        width, height = struct.unpack("<HH", head[26:30])
+        return ImageHeader("WEBP", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        if head[20] != 0x2F:
+            raise RejectedUpload("Corrupt WebP: bad VP8L signature")
+        bits = struct.unpack("<I", head[21:25])[0]
+        return ImageHeader("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return ImageHeader("WEBP", width, height)
+    raise RejectedUpload("Corrupt WebP: unknown chunk")
+
+
+def _sniff_bmp(head: bytes) -> Optional[ImageHeader]:
+    if len(head) < 26:
+        return None
+    header_size = struct.unpack("<I", head[14:18])[0]
+    if header_size == 12:
+        width, height = struct.unpack("<HH", head[18:22])
+    else:
+        width, height = struct.unpack("<ii", head[18:26])
+    return ImageHeader("BMP", width, abs(height))
+
+
+def sniff_image(head: bytes) -> Optional[ImageHeader]:
+    """Format and dimensions from the first bytes of an image, None until enough bytes are in
+
+    Raises RejectedUpload (415) for anything that is not a supported image
+    format and (400) for a header that cannot be valid. Only the header
+    bytes are looked at; nothing is decoded. TIFF keeps its dimensions in
+    an IFD that may be anywhere in the file, so they are left unknown.
+    """
+    if head[:2] == b"\xff\xd8":
+        return _sniff_jpeg(head)
+    if head[:8] == _PNG_SIGNATURE:
+        return _sniff_png(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _sniff_webp(head)
+    if head[:2] == b"BM":
+        return _sniff_bmp(head)
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return ImageHeader("TIFF", None, None)
+    if len(head) < _SIGNATURE_BYTES:
+        return None
+    raise RejectedUpload(f"Unsupported file type (expected one of {', '.join(SUPPORTED_FORMATS)})",
+                         status_code=415)
+
+
+def check_dimensions(header: ImageHeader, max_pixels: int):
+    """Reject images too small to grade or large enough to be a decompression bomb"""
+    if header.width is None:
+        return
+    if header.width < MIN_IMAGE_SIDE or header.height < MIN_IMAGE_SIDE:
+        raise RejectedUpload(f"Image too small: {header.width}x{header.height}")
+    if header.width * header.height > max_pixels:
+        raise RejectedUpload(f"Image too large: {header.width}x{header.height} pixels", status_code=413)
+
+
+def _jpeg_scan_start(data: bytes) -> Optional[int]:
+    """Offset of the first start-of-scan marker, walking segment headers; None if the body ends first"""
+    i = 2
+    while i + 2 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0xDA:
+            return i
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if i + 4 > len(data):
+            return None
+        # Skips whole segments, so an EXIF thumbnail's own markers are never seen
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def _png_complete(data: bytes) -> bool:
+    """Whether the chunk chain reaches IEND inside the body, reading only chunk headers"""
+    i = len(_PNG_SIGNATURE)
+    while i + 8 <= len(data):
+        length = struct.unpack(">I", data[i:i + 4])[0]
+        if data[i + 4:i + 8] == b"IEND":
+            return i + 12 <= len(data)
+        i += length + 12
+    return False
+
+
+def check_complete(header: ImageHeader, image_bytes: bytes):
+    """Reject JPEG and PNG bodies cut off before their end marker
+
+    A JPEG must have an end-of-image marker after its start of scan; it is
+    searched for backwards from the end, so it is found in the last few
+    bytes even when a camera appends data after the image, and the
+    end-of-image marker of an embedded EXIF thumbnail does not count. A PNG
+    must reach its IEND chunk by following the chunk lengths, so IEND bytes
+    inside compressed data do not count. Either way this is far cheaper
+    than a truncated body failing part-way through the full decode.
+    """
+    if header.format == "JPEG":
+        scan = _jpeg_scan_start(image_bytes)
+        complete = scan is not None and image_bytes.rfind(b"\xff\xd9", scan + 2) >= 0
+    elif header.format == "PNG":
+        complete = _png_complete(image_bytes)
+    else:
+        return
+    if not complete:
+        raise RejectedUpload(f"Corrupt {header.format}: truncated (no end marker)")
+
+
+def inspect_image(image_bytes: bytes, max_pixels: int) -> ImageHeader:
+    """Validate complete image bytes from their header; raises RejectedUpload"""
+    header = sniff_image(image_bytes)
+    if header is None:
+        raise RejectedUpload("Corrupt image: truncated header")
+    if header.width is None:
+        # Header-only parse: PIL reads the TIFF IFD without touching pixel data
+        try:
+            width, height = Image.open(io.BytesIO(image_bytes)).size
+        except Exception as e:
+            raise RejectedUpload(f"Corrupt {header.format}: {str(e)}") from None
+        header = ImageHeader(header.format, width, height)
+    check_dimensions(header, max_pixels)
+    check_complete(header, image_bytes)
+    return header
+
+
+class UploadedImage:
+    """One file part read into memory, with its sniffed header"""
+
+    def __init__(self, field: str, filename: str, content_type: str, data: bytes, header: ImageHeader):
+        self.field = field
+        self.filename = filename
+        self.content_type = content_type
+        self.data = data
+        self.header = header
+
+
+class _StreamingForm:
+    """python-multipart callbacks that keep fields in memory and vet the file part as it arrives"""
+
+    def __init__(self, file_field: str, max_file_bytes: int, max_pixels: int, max_field_bytes: int):
+        self.file_field = file_field
+        self.max_file_bytes = max_file_bytes
+        self.max_pixels = max_pixels
+        self.max_field_bytes = max_field_bytes
+        self.fields = {}
+        self.upload: Optional[UploadedImage] = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = None
+        self._filename = None
+        self._content_type = ""
+        self._buffer = bytearray()
+        self._header = None
+        self._next_sniff = _SIGNATURE_BYTES
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._buffer = bytearray()
+        self._header = None
+        self._next_sniff = _SIGNATURE_BYTES
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        self._filename = filename.decode("utf-8", errors="replace") if filename is not None else None
+        self._content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+        if self._filename is not None and self._name != self.file_field:
+            raise RejectedUpload(f"Unexpected file field {self._name} (expected {self.file_field})")
+        if self._filename is not None and self.upload is not None:
+            raise RejectedUpload("Provide a single file per request")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self._buffer += data[start:end]
+        if self._filename is None:
+            if len(self._buffer) > self.max_field_bytes:
+                raise RejectedUpload(f"Form field {self._name} too large", status_code=413)
+            return
+
+        if len(self._buffer) > self.max_file_bytes:
+            raise RejectedUpload(f"File too large: more than {self.max_file_bytes} bytes", status_code=413)
+        # Sniff again only once the buffer has doubled, so small chunks cost
+        # linear time, and give up past _SNIFF_BYTES
+        if self._header is None and self._next_sniff <= _SNIFF_BYTES and len(self._buffer) >= self._next_sniff:
+            head = bytes(self._buffer[:_SNIFF_BYTES])
+            self._next_sniff = min(len(head) * 2, _SNIFF_BYTES) if len(head) < _SNIFF_BYTES else _SNIFF_BYTES + 1
+            self._header = sniff_image(head)
+            if self._header is not None:
+                check_dimensions(self._header, self.max_pixels)
+
+    def on_part_end(self):
+        if self._filename is None:
+            self.fields[self._name] = self._buffer.decode("utf-8", errors="replace")
+            return
+        data = bytes(self._buffer)
+        if not data:
+            # An empty file input is how browsers send "no file"
+            return
+        if self._header is None or self._header.width is None:
+            header = inspect_image(data, self.max_pixels)
+        else:
+            header = self._header
+            check_complete(header, data)
+        self.upload = UploadedImage(self._name, self._filename, self._content_type, data, header)
+
+
+async def read_image_form(content_type: str, stream: AsyncIterator[bytes], max_file_bytes: int,
+                          max_pixels: int, file_field: str = "file", max_field_bytes: int = 64 * 1024) -> tuple:
+    """Stream a multipart body into ``(fields, upload)`` without spooling it to disk
+
+    The single file part is held in memory and capped at ``max_file_bytes``
+    while it is read; its format and dimensions are checked from the first
+    chunk, so a wrong type, corrupt header or oversized image is rejected
+    (RejectedUpload) without reading the rest of the body or decoding
+    anything. ``upload`` is None when no file was sent in ``file_field``.
+    """
+    _, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise RejectedUpload("Missing multipart boundary")
+
+    form = _StreamingForm(file_field, max_file_bytes, max_pixels, max_field_bytes)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": form.on_part_begin,
+        "on_part_data": form.on_part_data,
+        "on_part_end": form.on_part_end,
+        "on_header_field": form.on_header_field,
+        "on_header_value": form.on_header_value,
+        "on_header_end": form.on_header_end,
+        "on_headers_finished": form.on_headers_finished,
+    })
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+        parser.finalize()
+    except FormParserError as e:
+        raise RejectedUpload(f"Invalid multipart data: {str(e)}") from None
+    return form.fields, form.upload
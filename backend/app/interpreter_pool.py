@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from .quantization import TensorQuantization
+
+logger = logging.getLogger(__name__)
+
+
+def _file_fingerprint(path: str) -> str:
+    """First 12 hex digits of the file's sha256, hashed in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class InterpreterPool:
+    """Fixed set of TFLite interpreters for one model, each used by one caller at a time
+
+    TFLite interpreters are not safe to invoke concurrently, so callers
+    ``checkout()`` an interpreter for the duration of a set_tensor/invoke/
+    get_tensor sequence. ``size`` x ``num_threads`` trades parallel requests
+    against intra-op threads per invoke (e.g. 4x1 vs 1x4).
+
+    With ``mmap`` (the default) every interpreter is built from
+    ``model_path``, which TFLite memory-maps read-only: the flatbuffer
+    weights live in the page cache and are shared by every interpreter and
+    every worker process that maps the same file. Otherwise the file is read
+    once into this process and the interpreters share that private copy.
+    A mapped model file must be replaced by rename, never rewritten in place.
+
+    ``interpreter_kwargs`` is called once per interpreter for extra
+    constructor arguments (delegate selection, see
+    ``InterpreterBackend.interpreter_kwargs``); ``delegate`` labels it.
+    """
+
+    def __init__(self, name: str, model_path: str, interpreter_cls,
+                 size: int = 1, num_threads: int = 4, mmap: bool = True,
+                 delegate: str = "xnnpack", interpreter_kwargs: Optional[Callable[[], dict]] = None):
+        self.name = name
+        self.model_path = model_path
+        self.size = max(1, size)
+        self.num_threads = num_threads
+        self.mmap = mmap
+        self.delegate = delegate
+        self.calibration = None
+        self.warmup_ms = None
+        self.variant = None
+
+        if mmap:
+            self.model_content = None
+            self.model_size = os.path.getsize(model_path)
+            self.fingerprint = _file_fingerprint(model_path)
+            source = {"model_path": model_path}
+        else:
+            with open(model_path, 'rb') as f:
+                self.model_content = f.read()
+            self.model_size = len(self.model_content)
+            self.fingerprint = hashlib.sha256(self.model_content).hexdigest()[:12]
+            source = {"model_content": self.model_content}
+
+        self.interpreters = []
+        for _ in range(self.size):
+            extra = interpreter_kwargs() if interpreter_kwargs else {}
+            interpreter = interpreter_cls(**source, num_threads=num_threads, **extra)
+            interpreter.allocate_tensors()
+            self.interpreters.append(interpreter)
+
+        self.input_details = self.interpreters[0].get_input_details()
+        self.output_details = self.interpreters[0].get_output_details()
+        self.input_quantization = [TensorQuantization.from_details(d) for d in self.input_details]
+        self.output_quantization = [TensorQuantization.from_details(d) for d in self.output_details]
+        # (height, width) images are preprocessed to for this model
+        self.input_size = tuple(int(side) for side in self.input_details[0]['shape'][1:3])
+        # First scale/zero_point of the input and first output, (1.0, 0) when not quantized
+        self.input_scale, self.input_zero_point = self.input_quantization[0].scale, self.input_quantization[0].zero_point
+        self.output_scale, self.output_zero_point = self.output_quantization[0].scale, self.output_quantization[0].zero_point
+
+        self._available = queue.Queue()
+        for interpreter in self.interpreters:
+            self._available.put(interpreter)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.checkouts = 0
+
+        logger.info(f"{name} interpreter pool ready - {self.size} x {num_threads} threads ({delegate}), "
+                    f"{self.model_size:,} bytes {'mapped' if mmap else 'read'} from {model_path}")
+
+    def acquire(self, timeout: Optional[float] = None):
+        interpreter = self._available.get(timeout=timeout)
+        with self._lock:
+            self._in_use += 1
+            self.checkouts += 1
+        return interpreter
+
+    def release(self, interpreter):
+        with self._lock:
+            self._in_use -= 1
+        self._available.put(interpreter)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        interpreter = self.acquire(timeout)
+        try:
+            yield interpreter
+        finally:
+            self.release(interpreter)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "num_threads": self.num_threads,
+                "delegate": self.delegate,
+                "mmap": self.mmap,
+                "variant": self.variant,
+                "input_size": f"{self.input_size[0]}x{self.input_size[1]}",
+                "in_use": self._in_use,
+                "utilization": round(self._in_use / self.size, 3),
+                "checkouts": self.checkouts,
+                "input": self.input_quantization[0].snapshot(),
+                "outputs": [quantization.snapshot() for quantization in self.output_quantization],
+                "warmup_ms": self.warmup_ms,
+                "calibration": self.calibration,
+            }
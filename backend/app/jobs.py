@@ -0,0 +1,501 @@
+import asyncio
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Queued jobs run lowest value first, oldest first within a priority
+PRIORITIES = {"interactive": 0, "bulk": 10}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+JOBS = REGISTRY.counter(
+    "netra_jobs_total", "Jobs by priority and outcome (submitted, rejected, done, failed)", ("priority", "status")
+)
+JOB_QUEUE_WAIT = REGISTRY.histogram(
+    "netra_job_queue_wait_seconds", "Time a job waits in the job queue before a worker picks it up", ("priority",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+)
+JOB_RUN = REGISTRY.histogram(
+    "netra_job_run_seconds", "Time a worker spends processing one job", ("priority",)
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    request TEXT NOT NULL,
+    image BLOB,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+# Columns added after the first schema, created on databases that predate them
+_MIGRATIONS = {"owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+               "lease_until": "ALTER TABLE jobs ADD COLUMN lease_until REAL"}
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its limit for the job's priority"""
+
+    def __init__(self, message: str, depth: int):
+        super().__init__(message)
+        self.depth = depth
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+
+class JobStore:
+    """Jobs persisted in a local SQLite database
+
+    A job holds its request parameters (JSON) and, for uploads, the image
+    bytes, so queued work survives a restart. The image is erased as soon as
+    the job is done or failed: deleted content is overwritten
+    (``secure_delete``) and the freed pages are returned to the filesystem
+    when ``prune()`` runs, so patient images do not linger in the file or
+    its free list. ``claim()`` atomically moves
+    the next queued job to running, highest priority and oldest first, under
+    an immediate transaction so several worker processes can share one
+    database file. A claimed job is leased to this store's ``owner`` for
+    ``lease_seconds`` and the lease is kept alive by ``heartbeat()``; only
+    jobs whose lease ran out, because the process running them died, are
+    re-queued by ``recover()``, until they have been attempted
+    ``max_attempts`` times. Jobs a live sibling process is still running
+    are left alone.
+    ``limits`` maps each priority to the queue depth at which new jobs of
+    that priority are refused, so bulk work backs off before interactive.
+    Finished jobs keep their result for ``retention_seconds``.
+    """
+
+    def __init__(self, path: str, limits: dict, retention_seconds: float = 86400, max_attempts: int = 3,
+                 lease_seconds: float = 60.0):
+        self.path = path
+        self.limits = limits
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Only takes effect on a new database, so it goes before anything writes the file
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA secure_delete=ON")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(statement)
+
+    def _depth(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def submit(self, request: dict, image: Optional[bytes], priority: str) -> dict:
+        """Queue a job and return its view; raises JobQueueFull at the priority's limit"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._depth()
+                if depth >= self.limits[priority]:
+                    raise JobQueueFull(f"Job queue full ({depth} queued, limit {self.limits[priority]} "
+                                       f"for {priority} jobs)", depth)
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, priority, created_at, request, image) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, PRIORITIES[priority], now, json.dumps(request), image)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"job_id": job_id, "status": QUEUED, "priority": priority, "created_at": _timestamp(now),
+                "position": depth + 1}
+
+    def claim(self) -> Optional[dict]:
+        """Move the next queued job to running and return it with its request and image"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, priority, created_at, attempts, request, image FROM jobs WHERE status = ? "
+                    "ORDER BY priority, created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, owner = ?, "
+                        "lease_until = ? WHERE id = ?",
+                        (RUNNING, now, self.owner, now + self.lease_seconds, row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "priority": PRIORITY_NAMES.get(row["priority"], str(row["priority"])),
+            "queue_wait_s": now - row["created_at"],
+            "attempt": row["attempts"] + 1,
+            "request": json.loads(row["request"]),
+            "image": row["image"],
+        }
+
+    def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        """Record a job's result or error; the stored image is dropped
+
+        False when the job is no longer leased to this store (its lease ran
+        out and it was re-queued), in which case nothing is recorded.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, image = NULL, owner = NULL, "
+                "lease_until = NULL WHERE id = ? AND status = ? AND owner = ?",
+                (FAILED if error is not None else DONE, time.time(),
+                 json.dumps(result) if result is not None else None, error, job_id, RUNNING, self.owner)
+            ).rowcount > 0
+
+    def heartbeat(self, job_ids) -> int:
+        """Extend the lease on the given jobs this store is running; the number renewed"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        with self._lock:
+            return self._conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ? "
+                f"AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time() + self.lease_seconds, RUNNING, self.owner, *job_ids)
+            ).rowcount
+
+    def release(self) -> int:
+        """Put the jobs this store is running back on the queue, for a clean shutdown"""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, lease_until = NULL "
+                "WHERE status = ? AND owner = ?", (QUEUED, RUNNING, self.owner)
+            ).rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Client view of a job: status, timings, queue position, and its result or error once finished"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, priority, created_at, started_at, finished_at, attempts, result, error "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority < ? OR "
+                    "(priority = ? AND created_at <= ?))",
+                    (QUEUED, row["priority"], row["priority"], row["created_at"])
+                ).fetchone()[0]
+
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "priority": PRIORITY_NAMES.get(row["priority"], str(row["priority"])),
+            "created_at": _timestamp(row["created_at"]),
+            "started_at": _timestamp(row["started_at"]),
+            "finished_at": _timestamp(row["finished_at"]),
+            "attempts": row["attempts"],
+        }
+        if position is not None:
+            job["position"] = position
+        if row["started_at"] is not None:
+            job["queue_wait_ms"] = round((row["started_at"] - row["created_at"]) * 1000, 1)
+        if row["finished_at"] is not None:
+            job["run_ms"] = round((row["finished_at"] - row["started_at"]) * 1000, 1)
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def recover(self) -> tuple:
+        """Re-queue running jobs whose lease expired; ``(requeued, failed)`` counts"""
+        now = time.time()
+        # Rows without a lease were claimed by a version that did not write one
+        expired = "status = ? AND (lease_until IS NULL OR lease_until < ?)"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ?, image = NULL, owner = NULL, "
+                    f"lease_until = NULL WHERE {expired} AND attempts >= ?",
+                    (FAILED, now, f"Interrupted {self.max_attempts} times", RUNNING, now, self.max_attempts)
+                ).rowcount
+                requeued = self._conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, lease_until = NULL "
+                    f"WHERE {expired}", (QUEUED, RUNNING, now)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return requeued, failed
+
+    def prune(self) -> int:
+        """Delete finished jobs older than the retention period and shrink the file"""
+        with self._lock:
+            pruned = 0
+            if self.retention_seconds > 0:
+                pruned = self._conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                    (time.time() - self.retention_seconds,)
+                ).rowcount
+            # Hand the pages freed by erased images and pruned rows back to the
+            # filesystem; executescript runs the pragma to completion, execute() frees one page
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+        return pruned
+
+    def stats(self) -> dict:
+        """Queued jobs and the oldest one's creation time per priority, and jobs by status"""
+        with self._lock:
+            queued = self._conn.execute(
+                "SELECT priority, COUNT(*), MIN(created_at) FROM jobs WHERE status = ? GROUP BY priority", (QUEUED,)
+            ).fetchall()
+            counts = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        by_priority = {value: (count, oldest) for value, count, oldest in queued}
+        return {
+            "queued": {name: by_priority.get(value, (0, None))[0] for name, value in PRIORITIES.items()},
+            "oldest_created_at": {name: by_priority.get(value, (0, None))[1] for name, value in PRIORITIES.items()},
+            "jobs": {status: count for status, count in counts},
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """Background workers that drain a JobStore and wake long-polling clients
+
+    ``workers`` asyncio tasks claim jobs from the store and run them through
+    ``handler``, a coroutine taking the claimed job and returning its result
+    payload; an exception marks the job failed with its message. Store calls
+    run in threads so the event loop never blocks on SQLite; queue depths and
+    job counts for metrics and ``snapshot()`` are read every
+    ``poll_interval`` into a cache the same way. Idle workers
+    sleep until a submit wakes them, or ``poll_interval`` passes so jobs
+    queued by other processes sharing the database are picked up too. While
+    jobs run, their leases are renewed every third of the store's
+    ``lease_seconds``, at the next poll; expired leases, left by a sibling process that died,
+    are recovered at start and then every ``prune_interval``. Jobs
+    interrupted by shutdown are released back to the queue. SQLite errors
+    (e.g. a database locked by a sibling) are logged and retried after
+    ``poll_interval`` rather than stopping the workers; a job whose result
+    could not be recorded keeps its lease only until it lapses, then runs
+    again.
+    """
+
+    def __init__(self, store: JobStore, handler: Callable[[dict], Awaitable[dict]], workers: int = 2,
+                 poll_interval: float = 1.0, prune_interval: float = 300.0):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._waiters = {}
+        self._active = set()
+        self._stats = {"queued": {}, "oldest_created_at": {}, "jobs": {}}
+        self._stats_at: Optional[float] = None
+        self._last_heartbeat = time.monotonic()
+        self._last_prune = time.monotonic()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        requeued, failed = await asyncio.to_thread(self.store.recover)
+        if requeued or failed:
+            logger.info(f"Job queue recovered {requeued} interrupted jobs ({failed} failed after too many attempts)")
+        await self._refresh_stats()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain(), name="job-maintenance"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(self.store.release)
+        if released:
+            logger.info(f"Released {released} interrupted jobs back to the queue")
+        self.store.close()
+
+    async def submit(self, request: dict, image: Optional[bytes], priority: str) -> dict:
+        try:
+            job = await asyncio.to_thread(self.store.submit, request, image, priority)
+        except JobQueueFull:
+            self.rejected += 1
+            JOBS.inc(priority=priority, status="rejected")
+            raise
+        JOBS.inc(priority=priority, status="submitted")
+        self._wakeup.set()
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """The job's view once it finishes or ``timeout`` seconds pass, whichever is first"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in (DONE, FAILED) or remaining <= 0:
+                return job
+            # One event per waiting call, dropped when it wakes, so jobs finished
+            # by another process leave nothing behind
+            event = asyncio.Event()
+            waiters = self._waiters.setdefault(job_id, set())
+            waiters.add(event)
+            try:
+                # Re-read at least every poll interval: another process may have finished it
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                waiters.discard(event)
+                if not waiters and self._waiters.get(job_id) is waiters:
+                    del self._waiters[job_id]
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+                if job is None:
+                    await self._maybe_prune()
+            except sqlite3.Error:
+                logger.exception("Job store unavailable; retrying")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            JOB_QUEUE_WAIT.observe(job["queue_wait_s"], priority=job["priority"])
+            self.running += 1
+            self._active.add(job["job_id"])
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = await self.handler(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                logger.warning(f"Job {job['job_id']} failed: {error}")
+            finally:
+                self.running -= 1
+                self._active.discard(job["job_id"])
+                JOB_RUN.observe(time.perf_counter() - start, priority=job["priority"])
+
+            try:
+                recorded = await asyncio.to_thread(self.store.finish, job["job_id"], result, error)
+            except sqlite3.Error:
+                logger.exception(f"Could not record the outcome of job {job['job_id']}; it runs again once "
+                                 f"its lease lapses")
+                continue
+            if not recorded:
+                logger.warning(f"Job {job['job_id']} lost its lease before finishing; result discarded")
+                continue
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+            JOBS.inc(priority=job["priority"], status=DONE if error is None else FAILED)
+            for event in self._waiters.pop(job["job_id"], ()):
+                event.set()
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._active and time.monotonic() - self._last_heartbeat >= self.store.lease_seconds / 3:
+                try:
+                    await asyncio.to_thread(self.store.heartbeat, set(self._active))
+                    self._last_heartbeat = time.monotonic()
+                except sqlite3.Error:
+                    # Retried at the next poll, well before the lease runs out
+                    logger.exception("Could not renew job leases")
+            try:
+                await self._refresh_stats()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read job queue stats: {str(e)}")
+
+    async def _refresh_stats(self):
+        self._stats = await asyncio.to_thread(self.store.stats)
+        self._stats_at = time.monotonic()
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        """Queued jobs, of one priority or all, as of the last stats refresh"""
+        queued = self._stats["queued"]
+        return queued.get(priority, 0) if priority is not None else sum(queued.values())
+
+    def oldest_wait(self, priority: str) -> float:
+        """Seconds the oldest queued job of ``priority`` (as of the last refresh) has been waiting"""
+        oldest = self._stats["oldest_created_at"].get(priority)
+        return time.time() - oldest if oldest is not None else 0.0
+
+    async def _maybe_prune(self):
+        if time.monotonic() - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = time.monotonic()
+        requeued, failed = await asyncio.to_thread(self.store.recover)
+        if requeued or failed:
+            logger.info(f"Recovered {requeued} jobs with expired leases ({failed} failed after too many attempts)")
+            self._wakeup.set()
+        pruned = await asyncio.to_thread(self.store.prune)
+        if pruned:
+            logger.info(f"Pruned {pruned} finished jobs")
+
+    def snapshot(self) -> dict:
+        return {
+            "path": self.store.path,
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "limits": dict(self.store.limits),
+            "queued": {priority: self.depth(priority) for priority in PRIORITIES},
+            "oldest_wait_s": {priority: round(self.oldest_wait(priority), 3) for priority in PRIORITIES},
+            "jobs": dict(self._stats["jobs"]),
+            "stats_age_s": round(time.monotonic() - self._stats_at, 3) if self._stats_at is not None else None,
+        }
@@ -0,0 +1,197 @@
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import uuid
+import zlib
+from typing import Optional
+
+# Id of the request being handled, set by the request middleware and
+# inherited by the tasks it spawns; attached to every record logged meanwhile
+REQUEST_ID: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+
+def current_request_id() -> str:
+    """Id of the request being handled, or a fresh one outside a request"""
+    return REQUEST_ID.get() or str(uuid.uuid4())[:8]
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id and source location"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "location": f"{record.filename}:{record.lineno}",
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RequestSampler(logging.Filter):
+    """Keeps a fraction of per-request INFO records once their rate crosses a threshold
+
+    Records below WARNING that carry a request id are counted per second;
+    while the previous second saw more than ``above_per_second`` of them,
+    only requests whose id hashes below ``rate`` are logged. The decision is
+    per request, so a sampled request keeps all of its lines. Warnings,
+    errors and records outside a request always pass.
+    """
+
+    def __init__(self, rate: float = 1.0, above_per_second: float = 0.0):
+        super().__init__()
+        self.rate = rate
+        self.above_per_second = above_per_second
+        self._threshold = int(max(0.0, min(1.0, rate)) * 0xFFFFFFFF)
+        self._lock = threading.Lock()
+        self._window = int(time.monotonic())
+        self._count = 0
+        self._previous = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = getattr(record, "request_id", None)
+        if self.rate >= 1.0 or request_id is None or record.levelno >= logging.WARNING:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._previous = self._count if window == self._window + 1 else 0
+                self._window, self._count = window, 0
+            self._count += 1
+            busy = self._previous > self.above_per_second
+        if not busy or zlib.crc32(request_id.encode()) <= self._threshold:
+            return True
+        self.dropped += 1
+        return False
+
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that tags records with the request id and never blocks on INFO
+
+    Only the message is rendered on the calling thread; formatting and
+    I/O happen on the listener thread. When the queue is full, records
+    below WARNING are dropped and counted rather than waited on.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Filters run after this, so the sampler sees the id
+        record.request_id = REQUEST_ID.get()
+        return super().handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+            self.queue.put(record, timeout=1)
+
+
+class TextFormatter(logging.Formatter):
+    """The plain text format, with ``[request id]`` after the location when there is one"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        if request_id and f"[{request_id}]" not in record.getMessage():
+            marker = "] - "
+            position = text.find(marker)
+            if position != -1:
+                position += len(marker)
+                text = f"{text[:position]}[{request_id}] {text[position:]}"
+        return text
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of raising"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s"
+
+
+class LoggingPipeline:
+    """The installed queue handler and listener, for stats and shutdown"""
+
+    def __init__(self, handler: RequestQueueHandler, listener: logging.handlers.QueueListener,
+                 sampler: RequestSampler, log_format: str):
+        self.handler = handler
+        self.listener = listener
+        self.sampler = sampler
+        self.log_format = log_format
+
+    def stop(self):
+        """Flush queued records, stop the listener thread and close the handlers"""
+        if self.listener._thread is None:
+            return
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    def snapshot(self) -> dict:
+        return {
+            "format": self.log_format,
+            "queued": self.handler.queue.qsize(),
+            "queue_size": self.handler.queue.maxsize,
+            "dropped_queue_full": self.handler.dropped,
+            "sample_rate": self.sampler.rate,
+            "sample_above_per_second": self.sampler.above_per_second,
+            "dropped_sampled": self.sampler.dropped,
+            "handlers": [handler.__class__.__name__ for handler in self.listener.handlers],
+        }
+
+
+def configure_logging(handlers: list, level: int = logging.INFO, log_format: str = "json",
+                      sample_rate: float = 1.0, sample_above_per_second: float = 0.0,
+                      queue_size: int = 10000) -> Optional[LoggingPipeline]:
+    """Route the root logger through a queue to ``handlers`` on a background thread
+
+    Like ``logging.basicConfig`` this does nothing when the root logger
+    already has handlers (a script that configured logging before importing
+    the app keeps its own). The listener is stopped, flushing the queue, at
+    interpreter exit.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter(TEXT_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    sampler = RequestSampler(sample_rate, sample_above_per_second)
+    queue_handler = RequestQueueHandler(queue.Queue(maxsize=max(1, queue_size)))
+    queue_handler.addFilter(sampler)
+    listener = _Listener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    pipeline = LoggingPipeline(queue_handler, listener, sampler, log_format)
+    atexit.register(pipeline.stop)
+    return pipeline
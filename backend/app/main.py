@@ -1,60 +1,114 @@
+import asyncio
+import functools
+import json
 import logging
 import time
-import io
 import uuid
+import weakref
 import os
-from typing import Optional
-from contextlib import asynccontextmanager
+import secrets
+import zipfile
+from typing import List, Optional
+from contextlib import asynccontextmanager, nullcontext
 
 import numpy as np
-import tensorflow as tf
-import urllib.request
-from PIL import Image
-from fastapi import FastAPI, File, UploadFile, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-# Cloud-friendly logging configuration
+from .batching import MicroBatcher
+from .cascade import CascadeStats
+from .executor import InferenceExecutor, InferenceSaturated
+from .fetch import ImageFetcher
+from .ingest import RejectedUpload, inspect_image, read_image_form
+from .interpreter_pool import InterpreterPool
+from .jobs import PRIORITIES, JobQueue, JobQueueFull, JobStore
+from .logs import REQUEST_ID, configure_logging, current_request_id
+from .memory import mapped_file_memory, process_memory
+from .metrics import REGISTRY, stage_timer
+from .models import ModelSpec, UnknownModel, binary_probabilities, image_row, select_models
+from .quality import ImageQualityRejected, QualityThresholds, assess_quality
+from .quantization import TensorQuantization
+from .preprocessing import (
+    RESAMPLE_FILTERS,
+    TARGET_SIZE,
+    decode_image,
+    preprocess_image_fast,
+    preprocess_image_quantized,
+    quantize_pixels,
+)
+from .registry import (
+    ModelBundle,
+    ModelRegistry,
+    ReloadInProgress,
+    UnknownModelVersion,
+    discover_versions,
+    resolve_version,
+)
+from .result_cache import ResultCache, cache_key
+from .runtime import DELEGATES, InterpreterBackend, load_interpreter_backend
+from .tuning import calibrate, thread_candidates, time_invokes
+from .variants import load_manifest, parse_selection, resolve_variant
+
+# Cloud-friendly logging configuration: records are queued by the request
+# handlers and formatted and written on a background thread. LOG_FORMAT is
+# "json" (one object per line carrying the request id) or "text". Once
+# per-request INFO lines exceed LOG_SAMPLE_ABOVE_PER_SECOND, only
+# LOG_SAMPLE_RATE of the requests keep them; warnings and errors are always
+# logged. LOG_QUEUE_SIZE bounds the records waiting to be written
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_ABOVE_PER_SECOND = float(os.getenv("LOG_SAMPLE_ABOVE_PER_SECOND", "200"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
 if os.getenv("ENVIRONMENT") == "production":
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        handlers=[logging.StreamHandler()]  # Only console logging in production
-    )
+    _log_handlers = [logging.StreamHandler()]  # Only console logging in production
 else:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        handlers=[
-            logging.FileHandler('netra_api.log', encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+    # delay: the file is only opened once the pipeline writes to it
+    _log_handlers = [logging.FileHandler('netra_api.log', encoding='utf-8', delay=True), logging.StreamHandler()]
+log_pipeline = configure_logging(
+    _log_handlers, level=logging.INFO, log_format=LOG_FORMAT, sample_rate=LOG_SAMPLE_RATE,
+    sample_above_per_second=LOG_SAMPLE_ABOVE_PER_SECOND, queue_size=LOG_QUEUE_SIZE
+)
+if log_pipeline is None:
+    # Logging was configured by whoever imported the app; these handlers are unused
+    for _handler in _log_handlers:
+        _handler.close()
 
 logger = logging.getLogger(__name__)
 
-# Global variables for models
-dr_interpreter = None
-dr_input_details = None
-dr_output_details = None
-glaucoma_interpreter = None
-glaucoma_input_details = None
-glaucoma_output_details = None
-
-# Model input/output scale and zero_point for INT8 quantization
-dr_input_scale = None
-dr_input_zero_point = None
-dr_output_scale = None
-dr_output_zero_point = None
-glaucoma_input_scale = None
-glaucoma_input_zero_point = None
-glaucoma_output_scale = None
-glaucoma_output_zero_point = None
+# Interpreter pools of the serving model version by model name; each pool
+# carries its tensor details and quantization parameters
+model_pools: dict = {}
 
 # Constants
-TARGET_SIZE = (224, 224)
 MODEL_BASE_PATH = os.getenv("MODEL_PATH", "models")
 
+# Interpreter pool shape per model: INTERPRETER_POOL_SIZE interpreters, each
+# invoking with INTERPRETER_NUM_THREADS threads (e.g. 4x1 for throughput, 1x4 for latency).
+# "auto" times each power of two up to the CPUs per interpreter at startup and keeps the fastest
+INTERPRETER_POOL_SIZE = int(os.getenv("INTERPRETER_POOL_SIZE", "1"))
+_num_threads = os.getenv("INTERPRETER_NUM_THREADS", "auto")
+INTERPRETER_NUM_THREADS = None if _num_threads == "auto" else int(_num_threads)
+
+# Delegate: "xnnpack" (the runtime's default CPU delegate), "none" (builtin
+# kernels only), "auto" (calibrate both), or the path of an external delegate
+# library, which falls back to xnnpack when it cannot be loaded
+INTERPRETER_DELEGATE = os.getenv("INTERPRETER_DELEGATE", "xnnpack")
+
+# Timed invokes per candidate setting when calibrating threads or delegate
+CALIBRATION_RUNS = int(os.getenv("CALIBRATION_RUNS", "5"))
+
+# TFLite runtime: "auto" prefers ai_edge_litert, then tflite_runtime, then
+# tensorflow; the chosen package is only imported when models are loaded
+INTERPRETER_BACKEND = os.getenv("INTERPRETER_BACKEND", "auto")
+
+interpreter_backend: Optional[InterpreterBackend] = None
+
+# Memory-map model files (shared page cache across uvicorn workers) instead of
+# reading a private copy into every worker process
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1") == "1"
+
 DR_CLASSES = ["No DR", "Mild NPDR", "Moderate NPDR", "Severe NPDR", "Proliferative DR"]
 GLAUCOMA_CLASSES = ["Normal", "Glaucoma"]
 
@@ -71,158 +125,482 @@ GLAUCOMA_NOTES = {
     1: "Increased likelihood of glaucoma. Recommend further IOP measurement and visual field testing."
 }
 
+# Screening models served, in response order; clients may request a subset
+MODEL_SPECS = (
+    ModelSpec("dr", "diabetic_retinopathy", "DR", "dr_model_int8.tflite", "dr_model.tflite",
+              DR_CLASSES, DR_NOTES),
+    ModelSpec("glaucoma", "glaucoma", "Glaucoma", "glaucoma_model_int8.tflite", "glaucoma_model.tflite",
+              GLAUCOMA_CLASSES, GLAUCOMA_NOTES, postprocess=binary_probabilities),
+)
+
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 
-# Pre-allocated arrays for memory optimization
-IMG_BUFFER = np.zeros((1, 224, 224, 3), dtype=np.float32)
+# Largest width x height accepted from an image header, well above fundus
+# camera resolutions; larger claims are rejected before decode (decompression bombs)
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
 
-def load_models():
-    """Load INT8 quantized TFLite models with threading optimization"""
-    global dr_interpreter, dr_input_details, dr_output_details
-    global glaucoma_interpreter, glaucoma_input_details, glaucoma_output_details
-    global dr_input_scale, dr_input_zero_point, dr_output_scale, dr_output_zero_point
-    global glaucoma_input_scale, glaucoma_input_zero_point, glaucoma_output_scale, glaucoma_output_zero_point
-    
+def _env_limit(name: str, default: float) -> Optional[float]:
+    """Float from the environment; set but empty means no limit"""
+    value = os.getenv(name, str(default)).strip()
+    return float(value) if value else None
+
+# Image-quality gate, run on the preprocessed model input before inference:
+# "report" (the default) only adds the scores and would-be reasons to meta,
+# "enforce" answers images that fail with a 422 retake response, "off" skips
+# it. The default limits are provisional (see QualityThresholds): check them
+# against your cameras' images with benchmarks/quality_gate.py before turning
+# on "enforce". Setting one empty disables that check
+QUALITY_GATE = os.getenv("QUALITY_GATE", "report")
+QUALITY_THRESHOLDS = QualityThresholds(
+    min_sharpness=_env_limit("QUALITY_MIN_SHARPNESS", 8.0),
+    min_brightness=_env_limit("QUALITY_MIN_BRIGHTNESS", 25.0),
+    max_brightness=_env_limit("QUALITY_MAX_BRIGHTNESS", 220.0),
+    max_saturated=_env_limit("QUALITY_MAX_SATURATED", 0.25),
+    min_fov=_env_limit("QUALITY_MIN_FOV", 0.25),
+    max_corner_fov=_env_limit("QUALITY_MAX_CORNER_FOV", 0.5),
+)
+
+# Batch endpoint limits: images per request, images processed concurrently
+# (enough to fill the micro-batcher), and the size of an uploaded zip archive
+BATCH_ENDPOINT_MAX_IMAGES = int(os.getenv("BATCH_ENDPOINT_MAX_IMAGES", "500"))
+BATCH_ENDPOINT_CONCURRENCY = int(os.getenv("BATCH_ENDPOINT_CONCURRENCY", "16"))
+MAX_ARCHIVE_SIZE = int(os.getenv("MAX_ARCHIVE_SIZE", str(500 * 1024 * 1024)))
+ARCHIVE_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+# Preprocessing: "fast" decodes near the target size and quantizes through a
+# lookup table; "reference" keeps the full-resolution LANCZOS float32 path
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "fast")
+PREPROCESS_RESAMPLE = RESAMPLE_FILTERS[os.getenv("PREPROCESS_RESAMPLE", "bilinear").lower()]
+
+# Zero-copy feeding: quantize uint8 pixels directly into the interpreter's input
+# tensor and dequantize from its output tensor instead of set_tensor/get_tensor
+ZERO_COPY_INPUT = os.getenv("ZERO_COPY_INPUT", "1") == "1"
+
+# img_url downloads share one keep-alive connection pool and are streamed so
+# oversized bodies are abandoned as soon as they cross MAX_IMAGE_SIZE
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "3"))
+FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "10"))
+FETCH_TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", "15"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "20"))
+FETCH_CHECK_CONTENT_LENGTH = os.getenv("FETCH_CHECK_CONTENT_LENGTH", "1") == "1"
+
+image_fetcher: Optional[ImageFetcher] = None
+
+# Version name for model folders directly under MODEL_BASE_PATH; versioned
+# layouts (MODEL_BASE_PATH/<version>/DR, .../Glaucoma) use the directory name
+MODEL_VERSION = "tflite_v1_int8_optimized"
+MODEL_DIRS = tuple(spec.directory for spec in MODEL_SPECS)
+
+# Version served at startup: "latest" (highest by natural sort) or a directory name
+ACTIVE_MODEL_VERSION = os.getenv("ACTIVE_MODEL_VERSION", "latest")
+
+# Variant served from a version's variants.json (see build_variants.py): one
+# name for every model ("int8_160") or per model ("dr=int8_160,glaucoma=float16_224");
+# empty serves the variant the manifest marks as selected
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "")
+
+# Confidence-gated cascade: CASCADE_VARIANT names a small variant in the version's
+# variants.json (same syntax as MODEL_VARIANT) that screens every image first; its
+# answer stands when its confidence reaches CASCADE_THRESHOLD (one value, or per
+# model as "dr=0.95,glaucoma=0.9"), otherwise the full model runs. Empty disables it
+CASCADE_VARIANT = os.getenv("CASCADE_VARIANT", "")
+CASCADE_THRESHOLD = os.getenv("CASCADE_THRESHOLD", "0.9")
+CASCADE_THRESHOLDS = {name: float(value) for name, value in parse_selection(CASCADE_THRESHOLD).items()}
+
+# Shared secret for /admin endpoints, sent as X-Admin-Token; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+model_registry: Optional[ModelRegistry] = None
+
+# Content-addressed result cache: RESULT_CACHE_SIZE=0 disables it,
+# RESULT_CACHE_DIR persists entries across restarts
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+
+result_cache: Optional[ResultCache] = None
+
+# Micro-batching window: requests arriving within BATCH_MAX_WAIT_MS of each other
+# share one interpreter invoke, up to BATCH_MAX_SIZE images
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Executor-backed inference stage: decode and preprocessing run on a thread pool
+# sized to the host, with at most INFERENCE_MAX_PENDING diagnoses admitted at once
+# (by default four per worker, but never fewer than fill every pooled
+# interpreter's micro-batch: BATCH_MAX_SIZE x INTERPRETER_POOL_SIZE)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0")) or None
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "0")) or None
+
+inference_executor: Optional[InferenceExecutor] = None
+
+# Job API (/api/jobs), off unless JOB_STORE_PATH names the SQLite file jobs are
+# persisted in, so queued work survives restarts. Uploads are stored in that
+# file until their job is done or failed, so put it somewhere fit for patient
+# images. Jobs are run by JOB_WORKERS background workers, interactive before
+# bulk. A job is refused with 503 once JOB_QUEUE_MAX_DEPTH jobs are queued
+# (JOB_QUEUE_BULK_MAX_DEPTH for bulk ones, so they back off first). Finished
+# jobs are kept JOB_RETENTION_SECONDS; clients long-poll for up to
+# JOB_MAX_WAIT_SECONDS. A running job is leased to its worker process for
+# JOB_LEASE_SECONDS, renewed while it runs, and only re-queued once it lapses
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "1000"))
+JOB_QUEUE_BULK_MAX_DEPTH = int(os.getenv("JOB_QUEUE_BULK_MAX_DEPTH", str(JOB_QUEUE_MAX_DEPTH * 4 // 5)))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "30"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+job_queue: Optional[JobQueue] = None
+
+# Prometheus metrics served on /metrics and summarized on /performance
+REQUEST_LATENCY = REGISTRY.histogram(
+    "netra_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "netra_stage_duration_seconds", "Latency of each per-image request stage", ("stage",)
+)
+MODEL_LATENCY = REGISTRY.histogram(
+    "netra_model_duration_seconds", "Latency of input quantization and interpreter invoke per batch",
+    ("model", "stage")
+)
+ERRORS = REGISTRY.counter(
+    "netra_errors_total", "Failed images by the stage they failed in and their input source",
+    ("stage", "source")
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "netra_queue_depth", "Work waiting or in flight per queue", ("queue",)
+)
+POOL_UTILIZATION = REGISTRY.gauge(
+    "netra_interpreter_pool_utilization", "Fraction of pooled interpreters checked out", ("model",)
+)
+CASCADE_IMAGES = REGISTRY.counter(
+    "netra_cascade_images_total", "Images per model answered by the screening tier or escalated to the full model",
+    ("model", "tier")
+)
+CASCADE_SAVED = REGISTRY.counter(
+    "netra_cascade_saved_seconds_total", "Estimated full-model latency avoided by screening-tier answers", ("model",)
+)
+CASCADE_OVERHEAD = REGISTRY.counter(
+    "netra_cascade_overhead_seconds_total", "Screening-tier latency spent on images that escalated", ("model",)
+)
+cascade_stats = CascadeStats(CASCADE_IMAGES, CASCADE_SAVED, CASCADE_OVERHEAD)
+QUALITY_REJECTIONS = REGISTRY.counter(
+    "netra_quality_rejections_total", "Images turned away by the quality gate, by failed check", ("reason",)
+)
+
+
+def _current_batcher_pending(name: str) -> int:
+    bundle = model_registry.current if model_registry else None
+    return bundle.batchers[name].pending() if bundle else 0
+
+for _spec in MODEL_SPECS:
+    QUEUE_DEPTH.set_function(lambda name=_spec.name: _current_batcher_pending(name), queue=f"{_spec.name}_batcher")
+    POOL_UTILIZATION.set_function(
+        lambda name=_spec.name: model_pools[name].snapshot()["utilization"] if name in model_pools else 0,
+        model=_spec.name
+    )
+QUEUE_DEPTH.set_function(
+    lambda: inference_executor.snapshot()["in_flight"] if inference_executor else 0, queue="admission"
+)
+JOB_OLDEST_WAIT = REGISTRY.gauge(
+    "netra_job_oldest_wait_seconds", "Age of the oldest queued job per priority", ("priority",)
+)
+for _priority in PRIORITIES:
+    QUEUE_DEPTH.set_function(
+        lambda priority=_priority: job_queue.depth(priority) if job_queue else 0, queue=f"jobs_{_priority}"
+    )
+    JOB_OLDEST_WAIT.set_function(
+        lambda priority=_priority: job_queue.oldest_wait(priority) if job_queue else 0, priority=_priority
+    )
+PROCESS_MEMORY = REGISTRY.gauge(
+    "netra_process_memory_bytes", "Resident memory of this worker split into private and shared pages", ("kind",)
+)
+for _kind in ("private", "shared", "pss"):
+    PROCESS_MEMORY.set_function(
+        lambda kind=_kind: process_memory().get(f"{kind}_mb", 0.0) * 1024 * 1024, kind=_kind
+    )
+
+def _resolve_delegate(delegate: str) -> str:
+    """``delegate`` if the backend can apply it, otherwise xnnpack"""
+    if delegate in ("auto", "xnnpack"):
+        return delegate
     try:
-        logger.info("Loading INT8 quantized DR TFLite model...")
-        # Try to load quantized model first, fallback to regular model
-        try:
-            dr_interpreter = tf.lite.Interpreter(
-                model_path=f"{MODEL_BASE_PATH}/DR/dr_model_int8.tflite",
-                num_threads=4
-            )
-            logger.info("Loaded INT8 quantized DR model")
-        except:
-            logger.warning("INT8 DR model not found, using regular model")
-            dr_interpreter = tf.lite.Interpreter(
-                model_path=f"{MODEL_BASE_PATH}/DR/dr_model.tflite",
-                num_threads=4
-            )
-        
-        dr_interpreter.allocate_tensors()
-        dr_input_details = dr_interpreter.get_input_details()
-        dr_output_details = dr_interpreter.get_output_details()
-        
-        # Get quantization parameters for INT8 models
-        dr_input_scale = dr_input_details[0].get('quantization_parameters', {}).get('scales', [1.0])[0]
-        dr_input_zero_point = dr_input_details[0].get('quantization_parameters', {}).get('zero_points', [0])[0]
-        dr_output_scale = dr_output_details[0].get('quantization_parameters', {}).get('scales', [1.0])[0]
-        dr_output_zero_point = dr_output_details[0].get('quantization_parameters', {}).get('zero_points', [0])[0]
-        
-        logger.info(f"DR model loaded - Input: {dr_input_details[0]['shape']}, Output: {dr_output_details[0]['shape']}")
-        logger.info(f"DR quantization - Input scale: {dr_input_scale}, zero_point: {dr_input_zero_point}")
+        interpreter_backend.interpreter_kwargs(delegate)
+    except (ValueError, OSError) as e:
+        logger.warning(f"Delegate {delegate} unavailable, falling back to xnnpack: {str(e)}")
+        return "xnnpack"
+    return delegate
 
-        logger.info("Loading INT8 quantized Glaucoma TFLite model...")
-        # Try to load quantized model first, fallback to regular model
-        try:
-            glaucoma_interpreter = tf.lite.Interpreter(
-                model_path=f"{MODEL_BASE_PATH}/Glaucoma/glaucoma_model_int8.tflite",
-                num_threads=4
-            )
-            logger.info("Loaded INT8 quantized Glaucoma model")
-        except:
-            logger.warning("INT8 Glaucoma model not found, using regular model")
-            glaucoma_interpreter = tf.lite.Interpreter(
-                model_path=f"{MODEL_BASE_PATH}/Glaucoma/glaucoma_model.tflite",
-                num_threads=4
-            )
-        
-        glaucoma_interpreter.allocate_tensors()
-        glaucoma_input_details = glaucoma_interpreter.get_input_details()
-        glaucoma_output_details = glaucoma_interpreter.get_output_details()
-        
-        # Get quantization parameters
-        glaucoma_input_scale = glaucoma_input_details[0].get('quantization_parameters', {}).get('scales', [1.0])[0]
-        glaucoma_input_zero_point = glaucoma_input_details[0].get('quantization_parameters', {}).get('zero_points', [0])[0]
-        glaucoma_output_scale = glaucoma_output_details[0].get('quantization_parameters', {}).get('scales', [1.0])[0]
-        glaucoma_output_zero_point = glaucoma_output_details[0].get('quantization_parameters', {}).get('zero_points', [0])[0]
-        
-        logger.info(f"Glaucoma model loaded - Input: {glaucoma_input_details[0]['shape']}, Output: {glaucoma_output_details[0]['shape']}")
-        logger.info(f"Glaucoma quantization - Input scale: {glaucoma_input_scale}, zero_point: {glaucoma_input_zero_point}")
-        
+def _build_pool(name: str, model_path: str, delegate: str) -> InterpreterPool:
+    """Calibrate threads/delegate when either is auto, then build the pool with the winner"""
+    num_threads = INTERPRETER_NUM_THREADS
+    calibration = None
+    if num_threads is None or delegate == "auto":
+        calibration = calibrate(
+            name, model_path, interpreter_backend.interpreter_cls,
+            thread_candidates(INTERPRETER_POOL_SIZE) if num_threads is None else [num_threads],
+            list(DELEGATES) if delegate == "auto" else [delegate],
+            interpreter_backend.interpreter_kwargs,
+            runs=CALIBRATION_RUNS
+        )
+        num_threads, delegate = calibration["num_threads"], calibration["delegate"]
+
+    pool = InterpreterPool(name, model_path, interpreter_backend.interpreter_cls, size=INTERPRETER_POOL_SIZE,
+                           num_threads=num_threads, mmap=MODEL_MMAP, delegate=delegate,
+                           interpreter_kwargs=functools.partial(interpreter_backend.interpreter_kwargs, delegate))
+    pool.calibration = calibration
+    return pool
+
+def _load_pool(name: str, int8_path: str, float_path: str, delegate: str) -> InterpreterPool:
+    """Build an interpreter pool for one model, preferring the INT8 quantized file"""
+    try:
+        pool = _build_pool(name, int8_path, delegate)
+        logger.info(f"Loaded INT8 quantized {name} model")
+    except Exception:
+        logger.warning(f"INT8 {name} model not found, using regular model")
+        pool = _build_pool(name, float_path, delegate)
+    return pool
+
+def load_model_pools(model_dir: str) -> dict:
+    """Build an interpreter pool for every model in MODEL_SPECS from one model version directory"""
+    global interpreter_backend
+
+    interpreter_backend = load_interpreter_backend(INTERPRETER_BACKEND)
+    delegate = _resolve_delegate(INTERPRETER_DELEGATE)
+    manifest = load_manifest(model_dir)
+    selection = parse_selection(MODEL_VARIANT)
+
+    pools = {}
+    for spec in MODEL_SPECS:
+        variant = resolve_variant(manifest, model_dir, spec.name, selection) if manifest else None
+        if variant:
+            logger.info(f"Loading {spec.directory} variant {variant[0]} TFLite model...")
+            pool = _build_pool(spec.directory, variant[1], delegate)
+            pool.variant = variant[0]
+        else:
+            logger.info(f"Loading INT8 quantized {spec.directory} TFLite model...")
+            pool = _load_pool(spec.directory, *spec.paths(model_dir), delegate)
+        logger.info(f"{spec.directory} model loaded - Input: {pool.input_details[0]['shape']}, "
+                    f"Output: {pool.output_details[0]['shape']}")
+        logger.info(f"{spec.directory} quantization - Input scale: {pool.input_scale}, "
+                    f"zero_point: {pool.input_zero_point}")
+        pools[spec.name] = pool
+    return pools
+
+def load_screening_pools(model_dir: str) -> dict:
+    """Interpreter pools of the CASCADE_VARIANT screening models in one model version directory
+
+    Models the version's variants.json does not cover run without a
+    screening tier; a version without a manifest runs without the cascade.
+    """
+    manifest = load_manifest(model_dir)
+    if manifest is None:
+        logger.warning(f"Cascade disabled for {model_dir}: no variants manifest")
+        return {}
+
+    delegate = _resolve_delegate(INTERPRETER_DELEGATE)
+    selection = parse_selection(CASCADE_VARIANT)
+    pools = {}
+    for spec in MODEL_SPECS:
+        variant = None
+        if spec.name in selection or "*" in selection:
+            variant = resolve_variant(manifest, model_dir, spec.name, selection)
+        if variant is None:
+            continue
+        pool = _build_pool(f"{spec.directory} screening", variant[1], delegate)
+        pool.variant = variant[0]
+        logger.info(f"{spec.directory} screening model {variant[0]} loaded - Input: {pool.input_details[0]['shape']}, "
+                    f"threshold {cascade_threshold(spec.name)}")
+        pools[spec.name] = pool
+    return pools
+
+def cascade_threshold(name: str) -> float:
+    """Screening confidence at or above which ``name``'s screening answer is returned"""
+    return CASCADE_THRESHOLDS.get(name, CASCADE_THRESHOLDS.get("*", 0.9))
+
+def _publish_pools(pools: dict):
+    """Point ``model_pools`` at the serving version's pools"""
+    global model_pools
+    model_pools = pools
+
+def load_models(version: Optional[str] = None) -> str:
+    """Load one model version into the module-level pools without the serving registry
+
+    Used by offline tools; ``version`` defaults to ACTIVE_MODEL_VERSION.
+    Returns the name of the version loaded.
+    """
+    try:
+        versions = discover_versions(MODEL_BASE_PATH, MODEL_DIRS, MODEL_VERSION)
+        loaded_version, model_dir = resolve_version(versions, version or ACTIVE_MODEL_VERSION)
+        _publish_pools(load_model_pools(model_dir))
+        return loaded_version
     except Exception as e:
         logger.error(f"Failed to load models: {str(e)}")
         raise
 
-def validate_image(image: Image.Image) -> bool:
-    """Validate image format and size"""
-    if image.mode not in ['RGB', 'RGBA', 'L']:
-        logger.warning(f"Unsupported image mode: {image.mode}")
-        return False
-    
-    if image.size[0] < 50 or image.size[1] < 50:
-        logger.warning(f"Image too small: {image.size}")
-        return False
-    
-    return True
-
-def preprocess_image_quantized(image: Image.Image, target_size: tuple = TARGET_SIZE) -> tuple:
-    """Memory-optimized preprocessing with quantization support"""
-    global IMG_BUFFER
-    
-    start_time = time.time()
-    
-    if not validate_image(image):
-        raise ValueError("Invalid image format or size")
-    
-    # Convert and resize efficiently
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    image = image.resize(target_size, Image.LANCZOS)
-    
-    # Use pre-allocated buffer
-    img_data = np.array(image, dtype=np.float32) / 255.0
-    np.copyto(IMG_BUFFER[0], img_data)
-    
-    preprocessing_time = (time.time() - start_time) * 1000
-    logger.debug(f"Quantized preprocessing completed in {preprocessing_time:.2f}ms")
-    
-    return IMG_BUFFER.copy()  # Return copy for thread safety
-
-def quantize_input(img_array: np.ndarray, scale: float, zero_point: int) -> np.ndarray:
-    """Convert float32 input to INT8 for quantized models"""
-    if scale == 1.0 and zero_point == 0:
+def quantize_input(img_array: np.ndarray, scale: float, zero_point: int, dtype=np.int8) -> np.ndarray:
+    """Convert float32 input to a quantized ``dtype`` (int8, uint8 or int16)"""
+    if np.all(np.equal(scale, 1.0)) and np.all(np.equal(zero_point, 0)):
         # Model is not quantized, return float input
         return img_array
     
-    # Quantize: q = round(f/scale) + zero_point
-    quantized = np.round(img_array / scale) + zero_point
-    quantized = np.clip(quantized, -128, 127).astype(np.int8)
-    return quantized
-
-def dequantize_output(quantized_output: np.ndarray, scale: float, zero_point: int) -> np.ndarray:
-    """Convert INT8 output back to float32"""
-    if scale == 1.0 and zero_point == 0:
+    # Quantize: q = round(f/scale) + zero_point, saturated to the dtype's range
+    return TensorQuantization(dtype, scale, zero_point, axis=img_array.ndim - 1,
+                              ndim=img_array.ndim).quantize(img_array)
+
+def dequantize_output(quantized_output: np.ndarray, scale, zero_point) -> np.ndarray:
+    """Convert quantized output back to float32; per-axis ``scale``/``zero_point`` arrays broadcast"""
+    if np.all(np.equal(scale, 1.0)) and np.all(np.equal(zero_point, 0)):
         # Model output is not quantized
         return quantized_output
     
     # Dequantize: f = scale * (q - zero_point)
-    return scale * (quantized_output.astype(np.float32) - zero_point)
+    real = np.subtract(quantized_output, zero_point, dtype=np.float32)
+    real *= np.asarray(scale, dtype=np.float32)
+    return real
+
+# Batch size each interpreter's input is allocated for; None once the model rejected a resize
+_allocated_batch_sizes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def ensure_batch_size(interpreter, input_details, batch_size: int) -> bool:
+    """Resize the interpreter input tensor to ``batch_size`` images if needed
+
+    The allocated size is remembered per interpreter, so repeated batches of
+    the same size skip the resize. Returns False when the model's batch
+    dimension is fixed: the interpreter is put back to its previous size and
+    is not asked to resize again.
+    """
+    if interpreter not in _allocated_batch_sizes:
+        _allocated_batch_sizes[interpreter] = int(interpreter.get_input_details()[0]['shape'][0])
+    allocated = _allocated_batch_sizes[interpreter]
+    if allocated == batch_size:
+        return True
+    if allocated is None:
+        return False
+
+    current_shape = [int(dim) for dim in interpreter.get_input_details()[0]['shape']]
+    new_shape = [batch_size] + current_shape[1:]
+    try:
+        interpreter.resize_tensor_input(input_details[0]['index'], new_shape)
+        interpreter.allocate_tensors()
+    except (RuntimeError, ValueError) as e:
+        logger.warning(f"Interpreter rejected batch size {batch_size} ({str(e)}); invoking per image instead")
+        interpreter.resize_tensor_input(input_details[0]['index'], current_shape)
+        interpreter.allocate_tensors()
+        _allocated_batch_sizes[interpreter] = None
+        return False
+    _allocated_batch_sizes[interpreter] = batch_size
+    logger.debug(f"Resized interpreter input to {new_shape}")
+    return True
+
+def _write_input_in_place(interpreter, input_details, images: list,
+                          input_scale: float, input_zero_point: int):
+    """Quantize uint8 images straight into the interpreter's input tensor memory
+
+    The view returned by ``interpreter.tensor()`` must not outlive this call:
+    TFLite refuses to invoke or resize while numpy still references its
+    buffers, and the interpreter pool guarantees nobody else touches this
+    interpreter until it is returned.
+    """
+    input_view = interpreter.tensor(input_details[0]['index'])()
+    row = 0
+    for image in images:
+        quantize_pixels(image, input_details[0]['dtype'], input_scale, input_zero_point,
+                        out=input_view[row:row + image.shape[0]])
+        row += image.shape[0]
+    del input_view
+
+def _read_outputs(interpreter, output_details) -> list:
+    """Every output head as float32, each dequantized with its own (possibly per-axis) parameters"""
+    outputs = []
+    for details in output_details:
+        quantization = TensorQuantization.from_details(details)
+        if ZERO_COPY_INPUT:
+            output_view = interpreter.tensor(details['index'])()
+            if quantization.quantized:
+                outputs.append(quantization.dequantize(output_view))
+            else:
+                # Copy out: the view must not outlive this call
+                outputs.append(np.array(output_view, dtype=np.float32))
+            del output_view
+        else:
+            outputs.append(quantization.dequantize(interpreter.get_tensor(details['index'])))
+    return outputs
+
+def _model_stage(model_name: Optional[str], stage: str):
+    """Per-model stage timer, or a no-op for untracked calls such as warmup"""
+    if model_name is None:
+        return nullcontext()
+    return stage_timer(MODEL_LATENCY, stage, model=model_name)
+
+def _feed_input(interpreter, input_details, images: list, input_scale: float, input_zero_point: int):
+    """Quantize a batch of images into the interpreter's input tensor"""
+    quantization = TensorQuantization.from_details(input_details[0])
+    # Handle quantized vs non-quantized models
+    if images[0].dtype == np.uint8 and quantization.per_axis:
+        # One scale per channel: no single lookup table, normalize then quantize
+        batch = images[0] if len(images) == 1 else np.concatenate(images, axis=0)
+        interpreter.set_tensor(input_details[0]['index'],
+                               quantization.quantize(np.divide(batch, 255.0, dtype=np.float32)))
+    elif images[0].dtype == np.uint8:
+        # Raw pixels: normalize and quantize in one table lookup
+        if ZERO_COPY_INPUT:
+            _write_input_in_place(interpreter, input_details, images, input_scale, input_zero_point)
+        else:
+            batch = images[0] if len(images) == 1 else np.concatenate(images, axis=0)
+            interpreter.set_tensor(
+                input_details[0]['index'],
+                quantize_pixels(batch, input_details[0]['dtype'], input_scale, input_zero_point)
+            )
+    else:
+        batch = images[0] if len(images) == 1 else np.concatenate(images, axis=0)
+        # Quantize for integer models, cast for float32/float16 ones
+        interpreter.set_tensor(input_details[0]['index'], quantization.quantize(batch))
+
+def _invoke_batch(interpreter, input_details, output_details, images: list,
+                  input_scale: float, input_zero_point: int, model_name: Optional[str]) -> list:
+    """Feed ``images`` to an interpreter already sized for them, invoke, and read every output head"""
+    with _model_stage(model_name, "quantize"):
+        _feed_input(interpreter, input_details, images, input_scale, input_zero_point)
+
+    with _model_stage(model_name, "invoke"):
+        interpreter.invoke()
+    return _read_outputs(interpreter, output_details)
 
 def predict_with_tflite_quantized(interpreter, input_details, output_details, 
-                                 img_array: np.ndarray, input_scale: float, 
+                                 img_array, input_scale: float, 
                                  input_zero_point: int, output_scale: float, 
-                                 output_zero_point: int) -> np.ndarray:
-    """Optimized TFLite inference with INT8 quantization support"""
+                                 output_zero_point: int, model_name: Optional[str] = None):
+    """Optimized TFLite inference for int8, uint8, int16-activation and float models
+
+    ``img_array`` is a batch of shape (N, H, W, C), or a list of such arrays
+    (as handed over by the micro-batcher) that together form the batch.
+    Returns the float32 output of shape (N, ...) for single-output models,
+    or a list with one such array per output head. Every head is
+    dequantized with its own, possibly per-axis, parameters from
+    ``output_details``; ``output_scale``/``output_zero_point`` describe the
+    first head only and are kept for existing callers. Models whose batch
+    dimension cannot be resized are invoked once per image.
+    Quantize and invoke times are recorded under ``model_name`` when given.
+    """
     start_time = time.time()
     
     try:
-        # Handle quantized vs non-quantized models
-        if input_details[0]['dtype'] == np.int8:
-            # Quantize input for INT8 model
-            quantized_input = quantize_input(img_array, input_scale, input_zero_point)
-            interpreter.set_tensor(input_details[0]['index'], quantized_input)
+        images = img_array if isinstance(img_array, (list, tuple)) else [img_array]
+        batch_size = sum(image.shape[0] for image in images)
+        if ensure_batch_size(interpreter, input_details, batch_size):
+            outputs = _invoke_batch(interpreter, input_details, output_details, images,
+                                    input_scale, input_zero_point, model_name)
         else:
-            # Use float input for non-quantized model
-            interpreter.set_tensor(input_details[0]['index'], img_array.astype(np.float32))
-        
-        interpreter.invoke()
-        predictions = interpreter.get_tensor(output_details[0]['index'])
-        
-        # Handle quantized output
-        if output_details[0]['dtype'] == np.int8:
-            predictions = dequantize_output(predictions, output_scale, output_zero_point)
+            # Fixed batch dimension: one invoke per image, each head stacked back into a batch
+            per_image = [
+                _invoke_batch(interpreter, input_details, output_details, [image[row:row + 1]],
+                              input_scale, input_zero_point, model_name)
+                for image in images for row in range(image.shape[0])
+            ]
+            outputs = [np.concatenate(head, axis=0) for head in zip(*per_image)]
+        predictions = outputs[0] if len(outputs) == 1 else outputs
         
         inference_time = (time.time() - start_time) * 1000
         logger.debug(f"Quantized inference completed in {inference_time:.2f}ms")
@@ -233,60 +611,268 @@ def predict_with_tflite_quantized(interpreter, input_details, output_details,
         logger.error(f"Quantized TFLite inference failed: {str(e)}")
         raise
 
-async def load_image_from_source(file: Optional[UploadFile], img_url: Optional[str]) -> Image.Image:
-    """Load image from file or URL with validation"""
+def _read_upload_bytes(file: UploadFile) -> bytes:
+    """Blocking read of an uploaded file, run on the inference executor"""
+    if file.size is not None and file.size > MAX_IMAGE_SIZE:
+        raise ValueError(f"File too large: {file.size} bytes")
+    
+    image_bytes = file.file.read(MAX_IMAGE_SIZE + 1)
+    if len(image_bytes) > MAX_IMAGE_SIZE:
+        raise ValueError(f"File too large: more than {MAX_IMAGE_SIZE} bytes")
+    return image_bytes
+
+async def load_image_from_source(file: Optional[UploadFile], img_url: Optional[str]) -> bytes:
+    """Load raw image bytes from file or URL with size validation"""
     try:
         if file:
             logger.info(f"Loading image from uploaded file: {file.filename}")
-            
-            if hasattr(file, 'size') and file.size > MAX_IMAGE_SIZE:
-                raise ValueError(f"File too large: {file.size} bytes")
-            
-            image = Image.open(file.file)
-            
-        else:
-            logger.info(f"Fetching image from URL...")
-            
-            request = urllib.request.Request(
-                img_url,
-                headers={'User-Agent': 'Netra-AI/1.0'}
-            )
-            
-            with urllib.request.urlopen(request, timeout=10) as response:
-                image_bytes = response.read()
-                
-                if len(image_bytes) > MAX_IMAGE_SIZE:
-                    raise ValueError(f"Image too large: {len(image_bytes)} bytes")
-                
-                image = Image.open(io.BytesIO(image_bytes))
+            with stage_timer(STAGE_LATENCY, "read"):
+                image_bytes = await inference_executor.run(_read_upload_bytes, file)
+                inspect_image(image_bytes, MAX_IMAGE_PIXELS)
+            return image_bytes
         
-        logger.info(f"Image loaded - Size: {image.size}, Mode: {image.mode}")
-        return image
+        logger.info("Fetching image from URL...")
+        with stage_timer(STAGE_LATENCY, "fetch"):
+            image_bytes = await image_fetcher.fetch(img_url)
+            inspect_image(image_bytes, MAX_IMAGE_PIXELS)
+        return image_bytes
         
     except Exception as e:
         logger.error(f"Failed to load image: {str(e)}")
         raise
 
+def _list_archive_images(archive: UploadFile) -> tuple:
+    """Open an uploaded zip archive and list its image entries"""
+    archive_file = zipfile.ZipFile(archive.file)
+    entries = [
+        info for info in archive_file.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(ARCHIVE_IMAGE_EXTENSIONS)
+    ]
+    return archive_file, entries
+
+def _read_archive_entry(archive_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    """Read one image from a zip archive without trusting its declared size"""
+    with stage_timer(STAGE_LATENCY, "read"):
+        if info.file_size > MAX_IMAGE_SIZE:
+            raise ValueError(f"File too large: {info.file_size} bytes")
+
+        with archive_file.open(info) as entry:
+            image_bytes = entry.read(MAX_IMAGE_SIZE + 1)
+        if len(image_bytes) > MAX_IMAGE_SIZE:
+            raise ValueError(f"File too large: more than {MAX_IMAGE_SIZE} bytes")
+        inspect_image(image_bytes, MAX_IMAGE_PIXELS)
+    return image_bytes
+
+def decode_and_preprocess(image_bytes: bytes, target_size: tuple = TARGET_SIZE) -> np.ndarray:
+    """Decode raw image bytes and run quantized preprocessing"""
+    return preprocess_sizes(image_bytes, (target_size,))[target_size]
+
+def preprocess_sizes(image_bytes: bytes, sizes) -> dict:
+    """Decode once and preprocess to every input size in ``sizes`` (square models, as TARGET_SIZE)"""
+    sizes = sorted(set(sizes))
+    with stage_timer(STAGE_LATENCY, "decode"):
+        image = decode_image(image_bytes, None if PREPROCESS_MODE == "reference" else sizes[-1])
+    logger.info(f"Image loaded - Size: {image.size}, Mode: {image.mode}")
+
+    with stage_timer(STAGE_LATENCY, "preprocess"):
+        if PREPROCESS_MODE == "reference":
+            return {size: preprocess_image_quantized(image, size) for size in sizes}
+        return {size: preprocess_image_fast(image, size, resample=PREPROCESS_RESAMPLE) for size in sizes}
+
+def preprocess_for_models(image_bytes: bytes, bundle: ModelBundle, specs: list) -> tuple:
+    """``(inputs, screening_inputs)``: preprocessed input per model name for the full and screening tiers
+
+    The image is decoded once; models sharing an input size share the array.
+    ``screening_inputs`` only has the models with a cascade screening model.
+    """
+    sizes = {spec.name: bundle.pools[spec.name].input_size for spec in specs}
+    screening_sizes = {spec.name: bundle.screening_pools[spec.name].input_size
+                       for spec in specs if spec.name in bundle.screening_pools}
+    arrays = preprocess_sizes(image_bytes, [*sizes.values(), *screening_sizes.values()])
+    return ({name: arrays[size] for name, size in sizes.items()},
+            {name: arrays[size] for name, size in screening_sizes.items()})
+
+def preprocess_and_assess(image_bytes: bytes, bundle: ModelBundle, specs: list) -> tuple:
+    """``preprocess_for_models`` plus the quality scores of the largest input (None when the gate is off)"""
+    inputs, screening_inputs = preprocess_for_models(image_bytes, bundle, specs)
+    if QUALITY_GATE == "off":
+        return inputs, screening_inputs, None
+    with stage_timer(STAGE_LATENCY, "quality"):
+        quality = assess_quality(max(inputs.values(), key=lambda pixels: pixels.shape[1]), QUALITY_THRESHOLDS)
+    return inputs, screening_inputs, quality
+
+def _image_size(pools) -> str:
+    """Input resolution(s) of the served models, e.g. ``224x224``"""
+    sizes = sorted({pool.input_size for pool in pools}) or [TARGET_SIZE]
+    return ", ".join(f"{height}x{width}" for height, width in sizes)
+
+def results_version(bundle: ModelBundle, specs: list) -> str:
+    """Version string for cached results, tied to the exact model files that produced them"""
+    fingerprint = ":".join(bundle.pools[spec.name].fingerprint for spec in specs)
+    screening = [f"{bundle.screening_pools[spec.name].fingerprint}@{cascade_threshold(spec.name)}"
+                 for spec in specs if spec.name in bundle.screening_pools]
+    if screening:
+        # Cascade answers differ from the full models', so they are cached apart
+        fingerprint += ":cascade:" + ":".join(screening)
+    if QUALITY_GATE == "enforce":
+        # Only images that passed are cached, so new limits must not reuse them
+        fingerprint += f":quality:{QUALITY_THRESHOLDS.fingerprint()}"
+    return f"{bundle.version}:{PREPROCESS_MODE}:{fingerprint}"
+
+async def cache_lookup(key: str) -> Optional[dict]:
+    if result_cache is None:
+        return None
+    if result_cache.disk_path:
+        return await inference_executor.run(result_cache.get, key)
+    return result_cache.get(key)
+
+async def cache_store(key: str, value: dict):
+    if result_cache is None:
+        return
+    if result_cache.disk_path:
+        await inference_executor.run(result_cache.put, key, value)
+    else:
+        result_cache.put(key, value)
+
+def start_inference_executor():
+    """Create the thread pool that runs decode and preprocessing off the event loop"""
+    global inference_executor
+
+    inference_executor = InferenceExecutor(
+        max_workers=INFERENCE_WORKERS,
+        max_pending=INFERENCE_MAX_PENDING,
+        min_pending=BATCH_MAX_SIZE * INTERPRETER_POOL_SIZE
+    )
+    logger.info(f"Inference executor started - workers: {inference_executor.max_workers}, "
+                f"max in flight: {inference_executor.max_pending}")
+
+def start_image_fetcher():
+    """Create the shared HTTP client used for img_url downloads"""
+    global image_fetcher
+
+    image_fetcher = ImageFetcher(
+        MAX_IMAGE_SIZE,
+        connect_timeout=FETCH_CONNECT_TIMEOUT,
+        read_timeout=FETCH_READ_TIMEOUT,
+        total_timeout=FETCH_TOTAL_TIMEOUT,
+        max_connections=FETCH_MAX_CONNECTIONS,
+        check_content_length=FETCH_CHECK_CONTENT_LENGTH
+    )
+
+def start_result_cache():
+    """Create the diagnosis result cache unless it is disabled"""
+    global result_cache
+
+    if RESULT_CACHE_SIZE <= 0:
+        logger.info("Result cache disabled")
+        return
+
+    result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_DIR)
+    logger.info(f"Result cache ready - {RESULT_CACHE_SIZE} entries, TTL {RESULT_CACHE_TTL_SECONDS:.0f}s, "
+                f"disk: {RESULT_CACHE_DIR or 'disabled'}")
+
+async def start_job_queue():
+    """Open the job store, re-queue interrupted jobs and start the job workers"""
+    global job_queue
+
+    if not JOB_STORE_PATH:
+        logger.info("Job API disabled (set JOB_STORE_PATH to enable it)")
+        return
+
+    store = JobStore(JOB_STORE_PATH, {"interactive": JOB_QUEUE_MAX_DEPTH, "bulk": JOB_QUEUE_BULK_MAX_DEPTH},
+                     retention_seconds=JOB_RETENTION_SECONDS, lease_seconds=JOB_LEASE_SECONDS)
+    job_queue = JobQueue(store, run_job, workers=JOB_WORKERS)
+    await job_queue.start()
+    logger.info(f"Job queue ready - {JOB_WORKERS} workers, {job_queue.depth()} queued, store: {JOB_STORE_PATH}")
+
+def _pool_predictor(pool: InterpreterPool, model_name: str):
+    """Batch predict function for a micro-batcher in front of ``pool``"""
+    def predict(batch):
+        with pool.checkout() as interpreter:
+            return predict_with_tflite_quantized(
+                interpreter, pool.input_details, pool.output_details, batch,
+                pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point,
+                model_name=model_name
+            )
+    return predict
+
+def warmup_pools(pools: dict):
+    """Run one invoke on every pooled interpreter so the first request does not pay for it
+
+    The first invoke packs weights for the delegate and sizes the arena, so
+    its time is recorded on the pool as ``warmup_ms``.
+    """
+    for pool in pools.values():
+        dummy = np.zeros((1, *pool.input_size, 3), dtype=np.uint8)
+        timings = []
+        for interpreter in pool.interpreters:
+            start = time.perf_counter()
+            predict_with_tflite_quantized(
+                interpreter, pool.input_details, pool.output_details, dummy,
+                pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+            )
+            timings.append(round((time.perf_counter() - start) * 1000, 2))
+        pool.warmup_ms = timings
+        logger.info(f"{pool.name} warmup: {', '.join(f'{ms}ms' for ms in timings)} "
+                    f"({pool.num_threads} threads/{pool.delegate})")
+
+def _invoke_ms(pool: InterpreterPool) -> float:
+    """Single-image invoke time of ``pool``'s model, from calibration or timed now when it was skipped"""
+    if pool.calibration:
+        return pool.calibration["invoke_ms"]
+    return time_invokes(pool.interpreters[0], CALIBRATION_RUNS) * 1000
+
+def build_model_bundle(version: str, model_dir: str) -> ModelBundle:
+    """Load, warm up and start micro-batchers for one model version"""
+    pools = load_model_pools(model_dir)
+    screening_pools = load_screening_pools(model_dir) if CASCADE_VARIANT else {}
+
+    logger.info("Warming up quantized models...")
+    warmup_pools(pools)
+    warmup_pools(screening_pools)
+    for name in screening_pools:
+        cascade_stats.seed(name, _invoke_ms(pools[name]))
+
+    return ModelBundle(version, model_dir, pools, _start_batchers(pools), screening_pools=screening_pools,
+                       screening_batchers=_start_batchers(screening_pools, suffix="_screening"))
+
+def _start_batchers(pools: dict, suffix: str = "") -> dict:
+    """One started micro-batcher per pool, named ``{model}{suffix}``"""
+    # One dispatch thread per pooled interpreter so every interpreter can be busy
+    batchers = {
+        name: MicroBatcher(
+            f"{name}{suffix}", _pool_predictor(pool, f"{name}{suffix}"),
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            workers=pool.size
+        )
+        for name, pool in pools.items()
+    }
+    for batcher in batchers.values():
+        batcher.start()
+    return batchers
+
+def start_model_registry():
+    """Discover model versions and load ACTIVE_MODEL_VERSION for serving"""
+    global model_registry
+
+    model_registry = ModelRegistry(
+        MODEL_BASE_PATH, MODEL_DIRS, MODEL_VERSION, build_model_bundle,
+        on_swap=lambda bundle: _publish_pools(bundle.pools)
+    )
+    model_registry.load(ACTIVE_MODEL_VERSION)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     try:
         logger.info("Starting Netra AI with INT8 quantization optimizations...")
-        load_models()
-        
-        # Warmup models
-        logger.info("Warming up quantized models...")
-        dummy = np.zeros((1, TARGET_SIZE[0], TARGET_SIZE[1], 3), dtype=np.float32)
-        
-        predict_with_tflite_quantized(
-            dr_interpreter, dr_input_details, dr_output_details, dummy,
-            dr_input_scale, dr_input_zero_point, dr_output_scale, dr_output_zero_point
-        )
-        predict_with_tflite_quantized(
-            glaucoma_interpreter, glaucoma_input_details, glaucoma_output_details, dummy,
-            glaucoma_input_scale, glaucoma_input_zero_point, glaucoma_output_scale, glaucoma_output_zero_point
-        )
-        
+        start_model_registry()
+        start_inference_executor()
+        start_result_cache()
+        start_image_fetcher()
+        await start_job_queue()
+
         logger.info("Netra AI ready with INT8 quantization!")
     except Exception as e:
         logger.error(f"Failed to start: {str(e)}")
@@ -296,6 +882,14 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Netra AI...")
+    if job_queue is not None:
+        await job_queue.stop()
+    if model_registry is not None:
+        model_registry.shutdown()
+    if inference_executor is not None:
+        inference_executor.shutdown()
+    if image_fetcher is not None:
+        await image_fetcher.aclose()
 
 # Initialize FastAPI app with lifespan
 app = FastAPI(
@@ -323,11 +917,17 @@ app.add_middleware(
 async def log_requests(request: Request, call_next):
     """Log requests with performance tracking"""
     request_id = str(uuid.uuid4())[:8]
+    REQUEST_ID.set(request_id)
     start_time = time.time()
     
     response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
     
     process_time = (time.time() - start_time) * 1000
+    # Label by route template, not raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(process_time / 1000, method=request.method,
+                            route=route.path if route else "unmatched", status=response.status_code)
     logger.info(f"[{request_id}] {request.method} {request.url.path} - {process_time:.2f}ms - {response.status_code}")
     
     return response
@@ -342,10 +942,14 @@ async def root():
         "environment": os.getenv("ENVIRONMENT", "development")
     }
 
+def _int8_models() -> dict:
+    """Whether each loaded model takes INT8 input"""
+    return {f"{name}_model": pool.input_details[0]['dtype'] == np.int8 for name, pool in model_pools.items()}
+
 @app.get("/health")
 async def health_check():
     """Detailed health check endpoint"""
-    models_loaded = dr_interpreter is not None and glaucoma_interpreter is not None
+    models_loaded = all(spec.name in model_pools for spec in MODEL_SPECS)
     
     if not models_loaded:
         return JSONResponse(
@@ -353,147 +957,667 @@ async def health_check():
             status_code=503
         )
     
-    dr_quantized = dr_input_details[0]['dtype'] == np.int8 if dr_input_details else False
-    glaucoma_quantized = glaucoma_input_details[0]['dtype'] == np.int8 if glaucoma_input_details else False
-    
     return {
         "status": "healthy", 
         "models_loaded": models_loaded,
         "environment": os.getenv("ENVIRONMENT", "development"),
         "optimizations": {
-            "image_size": f"{TARGET_SIZE[0]}x{TARGET_SIZE[1]}",
+            "image_size": _image_size(model_pools.values()),
             "multi_threading": "enabled",
             "memory_optimization": "enabled",
-            "int8_quantization": {
-                "dr_model": dr_quantized,
-                "glaucoma_model": glaucoma_quantized
+            "int8_quantization": _int8_models()
+        }
+    }
+
+async def run_diagnosis_models(inputs: dict, bundle: ModelBundle, specs: list,
+                               screening_inputs: Optional[dict] = None) -> tuple:
+    """Run the models in ``specs`` on one image preprocessed per model (``preprocess_for_models``)
+
+    The models are independent, so each runs concurrently with the others.
+    Models with a ``screening_inputs`` entry go through the cascade: their
+    screening model runs first and its answer stands when its confidence
+    reaches ``cascade_threshold``; otherwise the image escalates to the
+    full model. Returns each model's response payload under its result key,
+    the timing and batching details for ``meta`` and the tier that answered
+    each model (``screening`` or ``full``).
+    """
+    screening_inputs = screening_inputs or {}
+    results, timing, batching, tiers = {}, {}, {}, {}
+
+    async def run_model(spec: ModelSpec):
+        screening_ms = None
+        if spec.name in screening_inputs:
+            preds, batch_info = await asyncio.wrap_future(
+                bundle.screening_batchers[spec.name].submit(screening_inputs[spec.name])
+            )
+            timing[f"{spec.name}_screening_ms"] = round(batch_info["queue_wait_ms"] + batch_info["invoke_ms"], 2)
+            # The cascade compares the tiers' per-image invoke times, free of queueing
+            screening_ms = batch_info["invoke_ms"] / batch_info["batch_size"]
+            result = spec.format_result(image_row(preds, 0))
+            if result["confidence"] >= cascade_threshold(spec.name):
+                results[spec.result_key] = result
+                tiers[spec.name] = "screening"
+                cascade_stats.record(spec.name, screening_ms)
+                return
+
+        preds, batch_info = await asyncio.wrap_future(bundle.batchers[spec.name].submit(inputs[spec.name]))
+        results[spec.result_key] = spec.format_result(image_row(preds, 0))
+        tiers[spec.name] = "full"
+        timing[f"{spec.name}_prediction_ms"] = round(batch_info["queue_wait_ms"] + batch_info["invoke_ms"], 2)
+        batching[f"{spec.name}_batch_size"] = batch_info["batch_size"]
+        batching[f"{spec.name}_queue_wait_ms"] = round(batch_info["queue_wait_ms"], 2)
+        if screening_ms is not None:
+            cascade_stats.record(spec.name, screening_ms, batch_info["invoke_ms"] / batch_info["batch_size"])
+
+    inference_start = time.time()
+    with stage_timer(STAGE_LATENCY, "inference"):
+        await asyncio.gather(*(run_model(spec) for spec in specs))
+    timing["inference_wall_ms"] = round((time.time() - inference_start) * 1000, 2)
+    results = {spec.result_key: results[spec.result_key] for spec in specs}
+    return results, timing, batching, {spec.name: tiers[spec.name] for spec in specs}
+
+async def diagnose_image_bytes(image_bytes: bytes, bundle: ModelBundle, specs: list,
+                               no_cache: bool = False) -> tuple:
+    """Cache lookup, preprocessing and inference of ``specs`` for one image's raw bytes with ``bundle``
+
+    Returns ``(results, timing, batching, cache_hit, tiers, quality)``;
+    ``batching``, ``tiers`` (see ``run_diagnosis_models``) and the quality
+    scores are None when the result came from the cache. Raises
+    ImageQualityRejected, before any inference, when QUALITY_GATE enforces
+    and the image fails it.
+    """
+    preprocess_start = time.time()
+    key = await inference_executor.run(cache_key, image_bytes, results_version(bundle, specs))
+    cached = None if no_cache else await cache_lookup(key)
+
+    if cached is not None:
+        preprocessing_time = (time.time() - preprocess_start) * 1000
+        return cached, {"preprocessing_ms": round(preprocessing_time, 2)}, None, True, None, None
+
+    inputs, screening_inputs, quality = await inference_executor.run(
+        preprocess_and_assess, image_bytes, bundle, specs
+    )
+    preprocessing_time = (time.time() - preprocess_start) * 1000
+    if QUALITY_GATE == "enforce" and not quality["passed"]:
+        for reason in quality["reasons"]:
+            QUALITY_REJECTIONS.inc(reason=reason)
+        raise ImageQualityRejected(quality)
+
+    results, timing, batching, tiers = await run_diagnosis_models(inputs, bundle, specs, screening_inputs)
+    await cache_store(key, results)
+    timing = {"preprocessing_ms": round(preprocessing_time, 2), **timing}
+    return results, timing, batching, False, tiers, quality
+
+# Documented request body of the single-image endpoint, which reads its
+# multipart form itself rather than through FastAPI's File/Form parameters
+DIAGNOSE_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "img_url": {"type": "string"},
+                    "no_cache": {"type": "boolean", "default": False},
+                    "models": {"type": "string"},
+                },
             }
         }
+    },
+}
+
+# Job submissions take the same form plus the job's priority
+JOB_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {
+                    **DIAGNOSE_REQUEST_BODY["content"]["multipart/form-data"]["schema"]["properties"],
+                    "priority": {"type": "string", "enum": list(PRIORITIES), "default": "interactive"},
+                },
+            }
+        }
+    },
+}
+
+def _retake_body(error: ImageQualityRejected, request_id: str, source: str, start_time: float) -> dict:
+    """Response for an image the quality gate turned away, with its scores in ``meta``"""
+    return {
+        "error": str(error),
+        "retake": True,
+        "meta": {
+            "request_id": request_id,
+            "input_source": source,
+            "inference_time_ms": int((time.time() - start_time) * 1000),
+            "quality": error.quality
+        }
     }
 
-@app.post("/api/ai-diagnoses")
-async def diagnose(file: UploadFile = File(None), img_url: str = Form(None)):
-    """Optimized diagnostic endpoint with INT8 quantization"""
+def _form_bool(value: Optional[str]) -> bool:
+    """Form checkbox/boolean value as FastAPI would parse it"""
+    return (value or "").strip().lower() in ("true", "1", "on", "yes")
+
+async def _read_diagnosis_form(request: Request) -> tuple:
+    """``(fields, upload)`` of a diagnosis request, streaming and vetting any file part"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        with stage_timer(STAGE_LATENCY, "read"):
+            return await read_image_form(content_type, request.stream(), MAX_IMAGE_SIZE, MAX_IMAGE_PIXELS)
+    form = await request.form()
+    return {key: value for key, value in form.items() if isinstance(value, str)}, None
+
+@app.post("/api/ai-diagnoses", openapi_extra={"requestBody": DIAGNOSE_REQUEST_BODY})
+async def diagnose(request: Request):
+    """Optimized diagnostic endpoint with INT8 quantization
+
+    Takes a ``file`` upload or an ``img_url``. The upload is streamed and
+    its format, dimensions and size are checked from the header as it
+    arrives, so a corrupt, oversized or non-image file is rejected before it
+    is fully read or decoded. Results are cached by image content; pass
+    ``no_cache=true`` to force a fresh inference (the cache entry is
+    refreshed with the new result). ``models`` is a comma-separated subset
+    such as ``dr`` to run only those models; all models run when it is
+    omitted. Quality-gate scores are reported in ``meta``; with
+    QUALITY_GATE=enforce an image that fails the gate (blurry, badly exposed
+    or not a fundus photo) gets a 422 ``retake`` response with its scores
+    instead of a diagnosis.
+    """
     start_time = time.time()
-    request_id = str(uuid.uuid4())[:8]
+    request_id = current_request_id()
+
+    source = "file"
+    try:
+        with inference_executor.admit(), model_registry.use() as bundle:
+            load_start = time.time()
+            fields, upload = await _read_diagnosis_form(request)
+            img_url = fields.get("img_url") or None
+            no_cache = _form_bool(fields.get("no_cache"))
+
+            # Input validation
+            if not upload and not img_url:
+                return JSONResponse(
+                    content={"error": "Either file or img_url must be provided"},
+                    status_code=400
+                )
+
+            if upload and img_url:
+                return JSONResponse(
+                    content={"error": "Provide either file or img_url, not both"},
+                    status_code=400
+                )
+
+            try:
+                specs = select_models(MODEL_SPECS, fields.get("models"))
+            except UnknownModel as e:
+                return JSONResponse(content={"error": str(e)}, status_code=400)
+
+            if upload:
+                logger.info(f"Loaded uploaded file: {upload.filename} "
+                            f"({upload.header.format} {upload.header.width}x{upload.header.height})")
+                image_bytes = upload.data
+            else:
+                source = "url"
+                image_bytes = await load_image_from_source(None, img_url)
+            load_time = (time.time() - load_start) * 1000
+
+            results, timing, batching, cache_hit, tiers, quality = await diagnose_image_bytes(
+                image_bytes, bundle, specs, no_cache
+            )
+
+            # Build response
+            total_time = int((time.time() - start_time) * 1000)
+        
+            response_data = {
+                **results,
+                "meta": {
+                    "request_id": request_id,
+                    "image_size": _image_size(bundle.pools[spec.name] for spec in specs),
+                    "model_version": bundle.version,
+                    "models": [spec.name for spec in specs],
+                    "inference_time_ms": total_time,
+                    "input_source": source,
+                    "optimizations_applied": [
+                        "multi_threading", 
+                        "memory_optimization", 
+                        "int8_quantization",
+                        "micro_batching",
+                        "concurrent_models",
+                        "fast_preprocessing",
+                        "result_cache"
+                    ],
+                    "cache": {
+                        "hit": cache_hit,
+                        "bypassed": no_cache
+                    },
+                    "timing": {
+                        "image_loading_ms": round(load_time + timing["preprocessing_ms"], 2),
+                        **timing
+                    },
+                    "batching": batching,
+                    "tiers": tiers,
+                    "quality": quality
+                }
+            }
 
-    # Input validation
-    if not file and not img_url:
+            with stage_timer(STAGE_LATENCY, "serialize"):
+                response = JSONResponse(content=response_data)
+
+            logger.info(f"[{request_id}] Completed in {total_time}ms (INT8 optimized"
+                        f"{', cached' if cache_hit else ''})")
+            return response
+
+    except RejectedUpload as e:
+        ERRORS.inc(stage="ingest", source=source)
+        logger.warning(f"[{request_id}] Rejected {source}: {str(e)}")
         return JSONResponse(
-            content={"error": "Either file or img_url must be provided"},
-            status_code=400
+            content={"error": str(e), "request_id": request_id},
+            status_code=e.status_code
         )
 
-    if file and img_url:
+    except ImageQualityRejected as e:
+        logger.info(f"[{request_id}] Retake requested: {', '.join(e.quality['reasons'])}")
+        return JSONResponse(content=_retake_body(e, request_id, source, start_time), status_code=422)
+
+    except InferenceSaturated as e:
+        ERRORS.inc(stage="admission", source=source)
+        logger.warning(f"[{request_id}] Rejected: {str(e)}")
         return JSONResponse(
-            content={"error": "Provide either file or img_url, not both"},
-            status_code=400
+            content={"error": "Server is busy, please retry shortly", "request_id": request_id},
+            status_code=503,
+            headers={"Retry-After": "1"}
         )
 
+    except Exception as e:
+        ERRORS.inc(stage=getattr(e, "failed_stage", "unknown"), source=source)
+        logger.exception(f"[{request_id}] Error: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Error processing image: {str(e)}", "request_id": request_id},
+            status_code=500
+        )
+
+@app.post("/api/ai-diagnoses/batch")
+async def diagnose_batch(files: List[UploadFile] = File(None), img_urls: List[str] = Form(None),
+                         archive: UploadFile = File(None), no_cache: bool = Form(False),
+                         models: str = Form(None)):
+    """Batch diagnostic endpoint streaming NDJSON results as images complete
+
+    Accepts any mix of ``files``, ``img_urls`` and a zip ``archive``. Images
+    are decoded in parallel and share micro-batches, and each finished image
+    is written as one JSON line tagged with its ``index`` and ``source``.
+    A failing image produces an ``error`` line without stopping the batch;
+    a final ``summary`` line closes the stream. ``models`` selects a subset
+    of models as for the single-image endpoint.
+    """
+    request_id = current_request_id()
     try:
-        # Load and preprocess image
-        load_start = time.time()
-        image = await load_image_from_source(file, img_url)
-        img_array = preprocess_image_quantized(image)
-        load_time = (time.time() - load_start) * 1000
-
-        # DR prediction with quantization
-        dr_start = time.time()
-        dr_preds = predict_with_tflite_quantized(
-            dr_interpreter, dr_input_details, dr_output_details, img_array,
-            dr_input_scale, dr_input_zero_point, dr_output_scale, dr_output_zero_point
+        specs = select_models(MODEL_SPECS, models)
+    except UnknownModel as e:
+        return JSONResponse(content={"error": str(e), "request_id": request_id}, status_code=400)
+
+    items = []
+    for upload in files or []:
+        items.append(("file", upload.filename, functools.partial(load_image_from_source, upload, None)))
+    for url in img_urls or []:
+        items.append(("url", url, functools.partial(load_image_from_source, None, url)))
+
+    archive_file = None
+    if archive:
+        if archive.size is not None and archive.size > MAX_ARCHIVE_SIZE:
+            return JSONResponse(
+                content={"error": f"Archive too large: {archive.size} bytes", "request_id": request_id},
+                status_code=413
+            )
+        try:
+            archive_file, entries = await inference_executor.run(_list_archive_images, archive)
+        except zipfile.BadZipFile as e:
+            return JSONResponse(
+                content={"error": f"Invalid zip archive: {str(e)}", "request_id": request_id},
+                status_code=400
+            )
+        for info in entries:
+            items.append(("archive", info.filename,
+                          functools.partial(inference_executor.run, _read_archive_entry, archive_file, info)))
+
+    if not items:
+        return JSONResponse(
+            content={"error": "Provide at least one file, img_url or archive image", "request_id": request_id},
+            status_code=400
         )
-        dr_probs = dr_preds[0].tolist()
-        dr_index = int(np.argmax(dr_probs))
-        dr_confidence = float(np.max(dr_probs))
-        dr_time = (time.time() - dr_start) * 1000
-
-        # Glaucoma prediction with quantization
-        glaucoma_start = time.time()
-        glaucoma_preds = predict_with_tflite_quantized(
-            glaucoma_interpreter, glaucoma_input_details, glaucoma_output_details, img_array,
-            glaucoma_input_scale, glaucoma_input_zero_point, glaucoma_output_scale, glaucoma_output_zero_point
+
+    if len(items) > BATCH_ENDPOINT_MAX_IMAGES:
+        return JSONResponse(
+            content={"error": f"Too many images: {len(items)} (max {BATCH_ENDPOINT_MAX_IMAGES})",
+                     "request_id": request_id},
+            status_code=413
         )
-        
-        # Handle binary classification
-        if glaucoma_preds.shape[1] == 1:
-            glaucoma_prob_positive = float(glaucoma_preds[0][0])
-            glaucoma_probs = [1.0 - glaucoma_prob_positive, glaucoma_prob_positive]
-        else:
-            glaucoma_probs = glaucoma_preds[0].tolist()
-        
-        glaucoma_index = int(np.argmax(glaucoma_probs))
-        glaucoma_confidence = float(np.max(glaucoma_probs))
-        glaucoma_time = (time.time() - glaucoma_start) * 1000
 
-        # Build response
-        total_time = int((time.time() - start_time) * 1000)
-        
-        response_data = {
-            "diabetic_retinopathy": {
-                "prediction": DR_CLASSES[dr_index],
-                "confidence": round(dr_confidence, 3),
-                "probabilities": {DR_CLASSES[i]: round(float(dr_probs[i]), 3) for i in range(len(DR_CLASSES))},
-                "severity_level": dr_index,
-                "doctor_note": DR_NOTES.get(dr_index, "")
-            },
-            "glaucoma": {
-                "prediction": GLAUCOMA_CLASSES[glaucoma_index],
-                "confidence": round(glaucoma_confidence, 3),
-                "probabilities": {GLAUCOMA_CLASSES[i]: round(float(glaucoma_probs[i]), 3) for i in range(len(GLAUCOMA_CLASSES))},
-                "severity_level": glaucoma_index,
-                "doctor_note": GLAUCOMA_NOTES.get(glaucoma_index, "")
-            },
-            "meta": {
-                "request_id": request_id,
-                "image_size": f"{TARGET_SIZE[0]}x{TARGET_SIZE[1]}",
-                "model_version": "tflite_v1_int8_optimized",
-                "inference_time_ms": total_time,
-                "input_source": "file" if file else "url",
-                "optimizations_applied": [
-                    "multi_threading", 
-                    "memory_optimization", 
-                    "int8_quantization"
-                ],
-                "timing": {
-                    "image_loading_ms": round(load_time, 2),
-                    "dr_prediction_ms": round(dr_time, 2),
-                    "glaucoma_prediction_ms": round(glaucoma_time, 2)
+    try:
+        inference_executor.acquire()
+    except InferenceSaturated as e:
+        ERRORS.inc(len(items), stage="admission", source="batch")
+        logger.warning(f"[{request_id}] Batch rejected: {str(e)}")
+        return JSONResponse(
+            content={"error": "Server is busy, please retry shortly", "request_id": request_id},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
+
+    # Every image in the batch is scored by the version current at admission
+    bundle = model_registry.acquire()
+    logger.info(f"[{request_id}] Batch of {len(items)} images accepted (models {bundle.version})")
+    semaphore = asyncio.Semaphore(BATCH_ENDPOINT_CONCURRENCY)
+
+    async def process(index: int, source: str, name: str, load) -> dict:
+        async with semaphore:
+            start_time = time.time()
+            try:
+                image_bytes = await load()
+                results, timing, batching, cache_hit, tiers, quality = await diagnose_image_bytes(
+                    image_bytes, bundle, specs, no_cache
+                )
+                return {
+                    "index": index,
+                    "source": source,
+                    "name": name,
+                    **results,
+                    "meta": {
+                        "inference_time_ms": int((time.time() - start_time) * 1000),
+                        "cache": {"hit": cache_hit, "bypassed": no_cache},
+                        "timing": timing,
+                        "batching": batching,
+                        "tiers": tiers,
+                        "quality": quality
+                    }
                 }
-            }
-        }
+            except ImageQualityRejected as e:
+                return {"index": index, "source": source, "name": name,
+                        **_retake_body(e, request_id, source, start_time)}
+            except Exception as e:
+                ERRORS.inc(stage=getattr(e, "failed_stage", "unknown"), source=source)
+                logger.warning(f"[{request_id}] Image {index} ({source}) failed: {str(e)}")
+                return {
+                    "index": index,
+                    "source": source,
+                    "name": name,
+                    "error": f"Error processing image: {str(e)}"
+                }
+
+    async def stream():
+        start_time = time.time()
+        tasks = [asyncio.create_task(process(i, *item)) for i, item in enumerate(items)]
+        succeeded = failed = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                line = await next_result
+                if "error" in line:
+                    failed += 1
+                else:
+                    succeeded += 1
+                with stage_timer(STAGE_LATENCY, "serialize"):
+                    encoded = json.dumps(line)
+                yield encoded + "\n"
+
+            total_time = int((time.time() - start_time) * 1000)
+            yield json.dumps({
+                "summary": {
+                    "request_id": request_id,
+                    "images": len(items),
+                    "succeeded": succeeded,
+                    "failed": failed,
+                    "model_version": bundle.version,
+                    "models": [spec.name for spec in specs],
+                    "total_time_ms": total_time
+                }
+            }) + "\n"
+            logger.info(f"[{request_id}] Batch completed in {total_time}ms - {succeeded} ok, {failed} failed")
+        finally:
+            for task in tasks:
+                task.cancel()
+            model_registry.release(bundle)
+            inference_executor.release()
+            if archive_file is not None:
+                archive_file.close()
 
-        logger.info(f"[{request_id}] Completed in {total_time}ms (INT8 optimized)")
-        return response_data
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
+async def run_job(job: dict) -> dict:
+    """Job queue handler: diagnose a queued image, returning the body /api/ai-diagnoses would have"""
+    request = job["request"]
+    source = request["source"]
+    REQUEST_ID.set(request["request_id"])
+    start_time = time.time()
+    try:
+        with model_registry.use() as bundle:
+            specs = select_models(MODEL_SPECS, request["models"])
+            image_bytes = job["image"]
+            if image_bytes is None:
+                image_bytes = await load_image_from_source(None, request["img_url"])
+            results, timing, batching, cache_hit, tiers, quality = await diagnose_image_bytes(
+                image_bytes, bundle, specs, request["no_cache"]
+            )
+    except ImageQualityRejected as e:
+        # The job succeeded: its answer is a retake request
+        return {**_retake_body(e, request["request_id"], source, start_time), "job_id": job["job_id"]}
     except Exception as e:
-        logger.exception(f"[{request_id}] Error: {str(e)}")
+        stage = "ingest" if isinstance(e, RejectedUpload) else getattr(e, "failed_stage", "unknown")
+        ERRORS.inc(stage=stage, source=source)
+        raise
+
+    total_time = int((time.time() - start_time) * 1000)
+    logger.info(f"[{request['request_id']}] Job {job['job_id']} completed in {total_time}ms "
+                f"after {job['queue_wait_s'] * 1000:.0f}ms queued")
+    return {
+        **results,
+        "meta": {
+            "request_id": request["request_id"],
+            "job_id": job["job_id"],
+            "priority": job["priority"],
+            "image_size": _image_size(bundle.pools[spec.name] for spec in specs),
+            "model_version": bundle.version,
+            "models": [spec.name for spec in specs],
+            "inference_time_ms": total_time,
+            "queue_wait_ms": round(job["queue_wait_s"] * 1000, 1),
+            "input_source": source,
+            "cache": {"hit": cache_hit, "bypassed": request["no_cache"]},
+            "timing": timing,
+            "batching": batching,
+            "tiers": tiers,
+            "quality": quality
+        }
+    }
+
+def _jobs_disabled() -> JSONResponse:
+    return JSONResponse(content={"error": "Job API is disabled (JOB_STORE_PATH not set)"}, status_code=404)
+
+@app.post("/api/jobs", status_code=202, openapi_extra={"requestBody": JOB_REQUEST_BODY})
+async def submit_job(request: Request):
+    """Queue a diagnosis and return its job id without waiting for the result
+
+    Takes the same form as ``/api/ai-diagnoses`` plus ``priority``
+    (``interactive``, the default, or ``bulk``, which runs after every
+    queued interactive job). Uploads are vetted and stored with the job;
+    ``img_url`` images are fetched by the worker, so slow downloads do not
+    hold the connection. Poll ``status_url`` for the result, optionally
+    long-polling with ``wait``. Returns 503 with Retry-After when the queue
+    is full for the job's priority.
+    """
+    request_id = current_request_id()
+    if job_queue is None:
+        return _jobs_disabled()
+
+    try:
+        fields, upload = await _read_diagnosis_form(request)
+    except RejectedUpload as e:
+        ERRORS.inc(stage="ingest", source="file")
+        logger.warning(f"[{request_id}] Rejected job upload: {str(e)}")
+        return JSONResponse(content={"error": str(e), "request_id": request_id}, status_code=e.status_code)
+
+    img_url = fields.get("img_url") or None
+    if bool(upload) == bool(img_url):
         return JSONResponse(
-            content={"error": f"Error processing image: {str(e)}", "request_id": request_id},
-            status_code=500
+            content={"error": "Provide either file or img_url", "request_id": request_id},
+            status_code=400
+        )
+    try:
+        select_models(MODEL_SPECS, fields.get("models"))
+    except UnknownModel as e:
+        return JSONResponse(content={"error": str(e), "request_id": request_id}, status_code=400)
+    priority = (fields.get("priority") or "interactive").strip().lower()
+    if priority not in PRIORITIES:
+        return JSONResponse(
+            content={"error": f"Unknown priority {priority} (expected one of {', '.join(PRIORITIES)})",
+                     "request_id": request_id},
+            status_code=400
         )
 
+    job_request = {
+        "request_id": request_id,
+        "source": "file" if upload else "url",
+        "filename": upload.filename if upload else None,
+        "img_url": img_url,
+        "models": fields.get("models"),
+        "no_cache": _form_bool(fields.get("no_cache")),
+    }
+    try:
+        job = await job_queue.submit(job_request, upload.data if upload else None, priority)
+    except JobQueueFull as e:
+        logger.warning(f"[{request_id}] Job rejected: {str(e)}")
+        return JSONResponse(
+            content={"error": "Job queue is full, please retry later", "request_id": request_id},
+            status_code=503,
+            headers={"Retry-After": "5"}
+        )
+
+    status_url = f"/api/jobs/{job['job_id']}"
+    logger.info(f"[{request_id}] Job {job['job_id']} queued ({priority}, position {job['position']})")
+    return JSONResponse(
+        content={**job, "request_id": request_id, "status_url": status_url},
+        status_code=202,
+        headers={"Location": status_url}
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Status of a job and, once it is done, its diagnosis (or error when it failed)
+
+    ``wait`` long-polls: the response is held for up to that many seconds
+    (at most JOB_MAX_WAIT_SECONDS) until the job finishes.
+    """
+    if job_queue is None:
+        return _jobs_disabled()
+    job = await job_queue.wait(job_id, min(max(wait, 0.0), JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        return JSONResponse(content={"error": f"Unknown job {job_id}"}, status_code=404)
+    return job
+
 @app.get("/performance")
 async def performance_stats():
     """Performance statistics"""
-    dr_quantized = dr_input_details[0]['dtype'] == np.int8 if dr_input_details else False
-    glaucoma_quantized = glaucoma_input_details[0]['dtype'] == np.int8 if glaucoma_input_details else False
-    
+    bundle = model_registry.current if model_registry else None
+    screening_pools = bundle.screening_pools if bundle else {}
+
     return {
         "optimizations": {
             "phase": "1 + INT8 Quantization",
-            "image_size": f"{TARGET_SIZE[0]}x{TARGET_SIZE[1]}",
+            "image_size": _image_size(model_pools.values()),
+            "variants": {f"{name}_model": pool.variant for name, pool in model_pools.items()},
             "multi_threading": True,
             "memory_optimization": True,
-            "int8_quantization": {
-                "dr_model": dr_quantized,
-                "glaucoma_model": glaucoma_quantized
-            },
-            "expected_improvement": "60-80% total latency reduction"
+            "int8_quantization": _int8_models()
+        },
+        # Measured since startup; percentiles are estimated from /metrics histogram buckets
+        "latency_ms": {
+            "stages": STAGE_LATENCY.summary(scale=1000),
+            "models": MODEL_LATENCY.summary(scale=1000),
+            "requests": REQUEST_LATENCY.summary(scale=1000)
+        },
+        "errors": {",".join(key): int(count) for key, count in sorted(ERRORS.values().items())},
+        "batching": {
+            "max_batch_size": BATCH_MAX_SIZE,
+            "max_wait_ms": BATCH_MAX_WAIT_MS,
+            **{f"{name}_model": batcher.snapshot() for name, batcher in (bundle.batchers if bundle else {}).items()}
+        },
+        "models": model_registry.snapshot() if model_registry else None,
+        "cascade": {
+            "variant": CASCADE_VARIANT or None,
+            "thresholds": {f"{name}_model": cascade_threshold(name) for name in screening_pools},
+            "models": {f"{name}_model": stats for name, stats in cascade_stats.snapshot().items()},
+            "screening_pools": {f"{name}_model": pool.snapshot() for name, pool in screening_pools.items()},
+        },
+        "interpreter_backend": interpreter_backend.snapshot() if interpreter_backend else None,
+        "inference_executor": inference_executor.snapshot() if inference_executor else None,
+        "result_cache": result_cache.snapshot() if result_cache else {"enabled": False},
+        "jobs": job_queue.snapshot() if job_queue else {"enabled": False},
+        "quality_gate": {
+            "mode": QUALITY_GATE,
+            "thresholds": vars(QUALITY_THRESHOLDS),
+            "rejections": {key[0]: int(count) for key, count in sorted(QUALITY_REJECTIONS.values().items())}
+        },
+        "logging": log_pipeline.snapshot() if log_pipeline else None,
+        "interpreter_pools": {f"{name}_model": pool.snapshot() for name, pool in model_pools.items()},
+        "memory": {
+            "pid": os.getpid(),
+            "process": process_memory(),
+            "model_files": mapped_file_memory([pool.model_path for pool in model_pools.values()])
         },
         "next_optimizations": [
-            "Custom input size models (160x160)",
             "GPU acceleration",
             "Model pruning"
         ]
     }
+
+def _admin_denied(token: Optional[str]) -> Optional[JSONResponse]:
+    """Error response unless ``token`` matches ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return JSONResponse(content={"error": "Admin endpoints are disabled (ADMIN_TOKEN not set)"}, status_code=404)
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        return JSONResponse(content={"error": "Invalid admin token"}, status_code=403)
+    return None
+
+@app.get("/admin/models")
+async def list_models(x_admin_token: Optional[str] = Header(None)):
+    """Serving and available model versions"""
+    denied = _admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return model_registry.snapshot()
+
+@app.post("/admin/models/reload")
+async def reload_models(version: str = Form("latest"), x_admin_token: Optional[str] = Header(None)):
+    """Load a model version and swap it in without dropping requests
+
+    The current version keeps serving while the new one loads and warms up;
+    requests already running finish on the version they started with. On
+    failure the current version stays in place.
+    """
+    denied = _admin_denied(x_admin_token)
+    if denied:
+        return denied
+
+    previous = model_registry.current.version if model_registry.current else None
+    try:
+        bundle = await asyncio.to_thread(model_registry.load, version)
+    except ReloadInProgress as e:
+        return JSONResponse(content={"error": str(e)}, status_code=409)
+    except UnknownModelVersion as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
+    except Exception as e:
+        logger.exception(f"Model reload to {version} failed: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Reload failed, still serving {previous}: {str(e)}"},
+            status_code=500
+        )
+
+    return {
+        "previous": previous,
+        "current": bundle.version,
+        "load_ms": round(bundle.load_seconds * 1000, 1),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
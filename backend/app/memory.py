@@ -0,0 +1,64 @@
+import os
+import re
+
+_MAPPING_HEADER = re.compile(r"^[0-9a-f]+-[0-9a-f]+ ")
+
+
+def _mb(kib: int) -> float:
+    return round(kib / 1024, 1)
+
+
+def _parse_fields(lines) -> dict:
+    fields = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        parts = rest.split()
+        if len(parts) == 2 and parts[1] == "kB":
+            fields[key] = fields.get(key, 0) + int(parts[0])
+    return fields
+
+
+def _summarize(fields: dict) -> dict:
+    shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": _mb(fields.get("Rss", 0)),
+        "pss_mb": _mb(fields.get("Pss", 0)),
+        "shared_mb": _mb(shared),
+        "private_mb": _mb(private),
+    }
+
+
+def process_memory() -> dict:
+    """Private vs shared resident memory of this process from /proc/self/smaps_rollup
+
+    ``private_mb`` is what this worker alone costs; ``shared_mb`` (page cache
+    of mapped model files, shared libraries) is paid once across workers, and
+    ``pss_mb`` splits shared pages evenly between the processes mapping them.
+    A mapped file only counts as shared once a second process maps it.
+    Empty when the kernel does not provide smaps_rollup (non-Linux).
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="ascii") as f:
+            return _summarize(_parse_fields(f))
+    except OSError:
+        return {}
+
+
+def mapped_file_memory(paths: list) -> dict:
+    """Resident, shared and private memory of the mappings of each file in ``paths``"""
+    wanted = {os.path.realpath(path): path for path in paths}
+    fields = {path: {} for path in paths}
+    try:
+        with open("/proc/self/smaps", "r", encoding="utf-8", errors="replace") as f:
+            current = None
+            for line in f:
+                if _MAPPING_HEADER.match(line):
+                    parts = line.split(None, 5)
+                    current = wanted.get(parts[5].strip()) if len(parts) == 6 else None
+                elif current is not None:
+                    for key, value in _parse_fields([line]).items():
+                        fields[current][key] = fields[current].get(key, 0) + value
+    except OSError:
+        return {}
+    return {path: _summarize(values) for path, values in fields.items()}
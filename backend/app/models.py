@@ -0,0 +1,101 @@
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class UnknownModel(LookupError):
+    """Raised when a request names a model that is not served"""
+
+
+def image_row(predictions, index: int):
+    """One image's output from a batch: an array, or a list of per-head arrays for multi-output models"""
+    if isinstance(predictions, list):
+        return [head[index] for head in predictions]
+    return predictions[index]
+
+
+def binary_probabilities(prediction: np.ndarray) -> list:
+    """Expand a single sigmoid output to [negative, positive]; pass softmax rows through"""
+    if prediction.shape[0] == 1:
+        positive = float(prediction[0])
+        return [1.0 - positive, positive]
+    return prediction.tolist()
+
+
+class ModelSpec:
+    """One screening model: where its files live and how its output is reported
+
+    Loading, quantization parameters, pooling, micro-batching and concurrent
+    execution are the same for every model, so serving another model only
+    takes another spec. ``directory`` is the model's folder inside a model
+    version directory, holding ``filename`` (INT8) or ``fallback_filename``
+    (float). ``postprocess`` turns one output row into class probabilities.
+    Multi-output models classify with their first head; the others are
+    reported under ``outputs`` by their name in ``head_names``.
+    """
+
+    def __init__(self, name: str, result_key: str, directory: str, filename: str, fallback_filename: str,
+                 classes: list, notes: Optional[dict] = None,
+                 postprocess: Optional[Callable[[np.ndarray], list]] = None,
+                 head_names: tuple = ()):
+        self.name = name
+        self.result_key = result_key
+        self.directory = directory
+        self.filename = filename
+        self.fallback_filename = fallback_filename
+        self.classes = classes
+        self.notes = notes or {}
+        self.postprocess = postprocess
+        self.head_names = head_names
+
+    def paths(self, model_dir: str) -> tuple:
+        """``(int8_path, fallback_path)`` inside one model version directory"""
+        return (f"{model_dir}/{self.directory}/{self.filename}",
+                f"{model_dir}/{self.directory}/{self.fallback_filename}")
+
+    def format_result(self, prediction) -> dict:
+        """Response payload for one image's model output (see ``image_row``)"""
+        heads = []
+        if isinstance(prediction, list):
+            prediction, heads = prediction[0], prediction[1:]
+        probs = self.postprocess(prediction) if self.postprocess else prediction.tolist()
+        index = int(np.argmax(probs))
+
+        result = {
+            "prediction": self.classes[index],
+            "confidence": round(float(np.max(probs)), 3),
+            "probabilities": {self.classes[i]: round(float(probs[i]), 3) for i in range(len(self.classes))},
+            "severity_level": index,
+            "doctor_note": self.notes.get(index, "")
+        }
+        if heads:
+            names = [self.head_names[i] if i < len(self.head_names) else f"output_{i + 1}"
+                     for i in range(len(heads))]
+            result["outputs"] = {name: np.round(head.astype(np.float64), 3).tolist()
+                                 for name, head in zip(names, heads)}
+        return result
+
+
+def select_models(specs: tuple, requested: Optional[str] = None) -> list:
+    """Specs named in a comma-separated ``requested`` list (by name or result key), all when empty"""
+    if not requested or not requested.strip():
+        return list(specs)
+
+    by_name = {}
+    for spec in specs:
+        by_name[spec.name] = spec
+        by_name[spec.result_key] = spec
+
+    selected = []
+    for name in requested.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in by_name:
+            raise UnknownModel(f"Unknown model {name} (available: {', '.join(spec.name for spec in specs)})")
+        if by_name[name] not in selected:
+            selected.append(by_name[name])
+    if not selected:
+        return list(specs)
+    # Response and cache key order follow the spec order, not the request
+    return [spec for spec in specs if spec in selected]
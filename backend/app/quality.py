@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+
+# ITU-R BT.601 luma weights
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Pixels darker than this (0-255 luma) are outside the camera's field of view
+FOV_LEVEL = 20.0
+
+# Mean luma the Laplacian is normalized to, so sharpness does not depend on exposure
+_REFERENCE_BRIGHTNESS = 100.0
+
+# Pixels trimmed from the field-of-view rim before measuring sharpness, so
+# the sharp retina/background edge does not count as detail
+_RIM_PIXELS = 4
+
+
+class ImageQualityRejected(ValueError):
+    """Raised when an image fails the quality gate; ``quality`` holds the scores and reasons"""
+
+    def __init__(self, quality: dict):
+        super().__init__(f"Image quality too low for grading ({', '.join(quality['reasons'])}); please retake")
+        self.quality = quality
+
+
+class QualityThresholds:
+    """Limits an image must meet to be graded
+
+    ``min_sharpness`` is the variance of the Laplacian of the luma inside the
+    field of view, at the model input resolution and scaled to a mean luma
+    of 100 so it measures detail rather than exposure. ``min_brightness`` and
+    ``max_brightness`` bound its mean luma (0-255) and ``max_saturated``
+    the fraction of it that is blown out. ``min_fov`` is the fraction of
+    the frame covered by the field of view, and ``max_corner_fov`` the
+    fraction of the corners (outside the inscribed ellipse) inside it: a
+    fundus photo is a lit disc on a dark background, so lit corners mean a
+    non-fundus picture. A limit of None is not checked.
+
+    The defaults are provisional. They were set with
+    ``benchmarks/quality_gate.py`` on synthetic fundus-like images and
+    degraded copies of them (Gaussian blur, scaled exposure, a non-fundus
+    frame), so that the clean images pass and the degraded ones fail; they
+    have not been validated on clinical images. Cameras with a wide field
+    of view or a rectangular crop light the corners and fail
+    ``max_corner_fov``, and sharpness depends on the optics and the
+    compression. Before enforcing the gate, score a set of images graders
+    accepted and rejected with ``--images`` and set the limits from them.
+    """
+
+    def __init__(self, min_sharpness: float = 8.0, min_brightness: float = 25.0, max_brightness: float = 220.0,
+                 max_saturated: float = 0.25, min_fov: float = 0.25, max_corner_fov: float = 0.5):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_saturated = max_saturated
+        self.min_fov = min_fov
+        self.max_corner_fov = max_corner_fov
+
+    def fingerprint(self) -> str:
+        return ",".join(f"{value}" for value in vars(self).values())
+
+
+def _luma(pixels: np.ndarray) -> np.ndarray:
+    """(H, W) float32 luma on a 0-255 scale from uint8 or [0, 1] float pixels of shape (1, H, W, 3)"""
+    image = pixels[0]
+    luma = image.astype(np.float32, copy=False) @ _LUMA
+    if image.dtype != np.uint8:
+        luma *= 255.0
+    return luma
+
+
+def _erode(mask: np.ndarray, iterations: int) -> np.ndarray:
+    """Binary erosion with a 4-neighbourhood, ``iterations`` times; the border counts as outside"""
+    for _ in range(iterations):
+        eroded = np.zeros_like(mask)
+        eroded[1:-1, 1:-1] = (mask[1:-1, 1:-1] & mask[:-2, 1:-1] & mask[2:, 1:-1]
+                              & mask[1:-1, :-2] & mask[1:-1, 2:])
+        mask = eroded
+    return mask
+
+
+_corner_masks = {}
+
+
+def _corner_mask(shape: tuple) -> np.ndarray:
+    """Pixels of a frame outside its inscribed ellipse, cached per shape"""
+    mask = _corner_masks.get(shape)
+    if mask is None:
+        height, width = shape
+        y = (np.arange(height, dtype=np.float32) + 0.5) / height * 2 - 1
+        x = (np.arange(width, dtype=np.float32) + 0.5) / width * 2 - 1
+        mask = (y[:, None] ** 2 + x[None, :] ** 2) > 1.0
+        _corner_masks[shape] = mask
+    return mask
+
+
+def assess_quality(pixels: np.ndarray, thresholds: QualityThresholds) -> dict:
+    """Sharpness, exposure and field-of-view scores of one preprocessed image and whether it passes
+
+    ``pixels`` is the model input array, shape (1, H, W, 3), uint8 or
+    float in [0, 1]. Returns the scores, ``passed`` and the ``reasons`` it
+    failed (``blurry``, ``underexposed``, ``overexposed``,
+    ``no_field_of_view``, ``not_fundus``).
+    """
+    start = time.perf_counter()
+    luma = _luma(pixels)
+    fov = luma > FOV_LEVEL
+    fov_fraction = float(fov.mean())
+    corner = _corner_mask(fov.shape)
+    corner_fov = float(fov[corner].mean())
+
+    if fov.any():
+        retina = luma[fov]
+        brightness = float(retina.mean())
+        saturated = float(np.count_nonzero(retina >= 250.0)) / retina.size
+    else:
+        brightness, saturated = float(luma.mean()), 0.0
+
+    inner = _erode(fov, _RIM_PIXELS)[1:-1, 1:-1]
+    laplacian = (luma[:-2, 1:-1] + luma[2:, 1:-1] + luma[1:-1, :-2] + luma[1:-1, 2:]
+                 - 4.0 * luma[1:-1, 1:-1])
+    sharpness = 0.0
+    if np.count_nonzero(inner) > 16 and brightness > 0:
+        sharpness = float(laplacian[inner].var()) * (_REFERENCE_BRIGHTNESS / brightness) ** 2
+
+    reasons = []
+    t = thresholds
+    if t.min_fov is not None and fov_fraction < t.min_fov:
+        reasons.append("no_field_of_view")
+    if t.max_corner_fov is not None and corner_fov > t.max_corner_fov:
+        reasons.append("not_fundus")
+    if t.min_brightness is not None and brightness < t.min_brightness:
+        reasons.append("underexposed")
+    if ((t.max_brightness is not None and brightness > t.max_brightness)
+            or (t.max_saturated is not None and saturated > t.max_saturated)):
+        reasons.append("overexposed")
+    if t.min_sharpness is not None and sharpness < t.min_sharpness:
+        reasons.append("blurry")
+
+    return {
+        "passed": not reasons,
+        "reasons": reasons,
+        "sharpness": round(sharpness, 2),
+        "brightness": round(brightness, 1),
+        "saturated_fraction": round(saturated, 4),
+        "fov_fraction": round(fov_fraction, 4),
+        "corner_fov_fraction": round(corner_fov, 4),
+        "assess_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
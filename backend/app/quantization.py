@@ -0,0 +1,72 @@
+import numpy as np
+
+# Tensor types the inference path reads and writes: affine-quantized integers,
+# and floats (float16 models keep float32 I/O, but a float16 tensor is widened)
+QUANTIZED_DTYPES = (np.int8, np.uint8, np.int16)
+FLOAT_DTYPES = (np.float32, np.float16)
+
+
+class TensorQuantization:
+    """Affine quantization of one tensor, ``real = scale * (q - zero_point)``
+
+    Parameters are per tensor, or per axis when the tensor carries one scale
+    per slice of ``axis`` (TFLite's ``quantized_dimension``); per-axis
+    scales and zero points are reshaped once so they broadcast against the
+    tensor. Float tensors pass through unchanged apart from dtype.
+    """
+
+    def __init__(self, dtype, scales=(), zero_points=(), axis: int = 0, ndim: int = 0):
+        self.dtype = np.dtype(dtype)
+        scales = np.asarray(scales, dtype=np.float32).reshape(-1)
+        zero_points = np.asarray(zero_points, dtype=np.int32).reshape(-1)
+        if zero_points.size == 0:
+            zero_points = np.zeros(max(1, scales.size), dtype=np.int32)
+
+        self.quantized = np.issubdtype(self.dtype, np.integer) and scales.size > 0
+        self.per_axis = self.quantized and scales.size > 1
+        self.axis = axis
+        self.scale = float(scales[0]) if scales.size else 1.0
+        self.zero_point = int(zero_points[0]) if zero_points.size else 0
+
+        if self.per_axis:
+            shape = [1] * max(ndim, axis + 1)
+            shape[axis] = scales.size
+            self._scales = scales.reshape(shape)
+            self._zero_points = np.broadcast_to(zero_points, (scales.size,)).reshape(shape).astype(np.float32)
+        else:
+            self._scales = np.float32(self.scale)
+            self._zero_points = np.float32(self.zero_point)
+
+    @classmethod
+    def from_details(cls, details: dict) -> "TensorQuantization":
+        params = details.get('quantization_parameters', {})
+        return cls(details['dtype'], params.get('scales', ()), params.get('zero_points', ()),
+                   axis=int(params.get('quantized_dimension', 0)), ndim=len(details.get('shape', ())))
+
+    def quantize(self, values: np.ndarray) -> np.ndarray:
+        """Real values to this tensor's type: round, shift and saturate in one pass"""
+        if not self.quantized:
+            return values.astype(self.dtype, copy=False)
+        info = np.iinfo(self.dtype)
+        scaled = np.divide(values, self._scales, dtype=np.float32)
+        np.rint(scaled, out=scaled)
+        scaled += self._zero_points
+        np.clip(scaled, info.min, info.max, out=scaled)
+        return scaled.astype(self.dtype)
+
+    def dequantize(self, values: np.ndarray) -> np.ndarray:
+        """This tensor's values as float32"""
+        if not self.quantized:
+            return values.astype(np.float32, copy=False)
+        real = np.subtract(values, self._zero_points, dtype=np.float32)
+        real *= self._scales
+        return real
+
+    def snapshot(self) -> dict:
+        return {
+            "dtype": self.dtype.name,
+            "quantized": self.quantized,
+            "per_axis": self.per_axis,
+            "scale": self.scale,
+            "zero_point": self.zero_point,
+        }
@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownModelVersion(LookupError):
+    """Raised when a requested model version has no directory under the model root"""
+
+
+class ReloadInProgress(Exception):
+    """Raised when a reload is requested while another one is still loading"""
+
+
+def _natural_key(name: str) -> list:
+    """Sort key that orders v2 before v10"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def discover_versions(base_path: str, required_dirs: tuple, legacy_version: str) -> list:
+    """``(version, path)`` pairs found under ``base_path``, oldest first
+
+    A version is any subdirectory holding all of ``required_dirs`` (e.g.
+    ``models/2025-09-01/DR``). Model folders directly under ``base_path``
+    (the original flat layout) count as ``legacy_version``, ordered before
+    every versioned directory.
+    """
+    def has_models(path: str) -> bool:
+        return all(os.path.isdir(os.path.join(path, required)) for required in required_dirs)
+
+    versions = []
+    if has_models(base_path):
+        versions.append((legacy_version, base_path))
+    try:
+        entries = sorted(os.scandir(base_path), key=lambda entry: _natural_key(entry.name))
+    except OSError:
+        return versions
+    for entry in entries:
+        if entry.is_dir() and entry.name not in required_dirs and has_models(entry.path):
+            versions.append((entry.name, entry.path))
+    return versions
+
+
+def resolve_version(versions: list, requested: str = "latest") -> tuple:
+    """Pick ``requested`` from ``discover_versions`` output; ``latest`` is the newest"""
+    if not versions:
+        raise UnknownModelVersion("No model versions found")
+    if requested in (None, "", "latest"):
+        return versions[-1]
+    for version, path in versions:
+        if version == requested:
+            return version, path
+    raise UnknownModelVersion(
+        f"Model version {requested} not found (available: {', '.join(v for v, _ in versions)})"
+    )
+
+
+class ModelBundle:
+    """One loaded model version: an interpreter pool and micro-batcher per model
+
+    Requests ``acquire()`` the bundle that is current when they start and
+    keep using it until they ``release()`` it, so a swap never mixes model
+    versions within a request. A retired bundle stops its batchers once the
+    last request using it has released it. ``screening_pools`` and
+    ``screening_batchers`` hold the cascade's screening models, keyed like
+    ``pools``, for the models that have one.
+    """
+
+    def __init__(self, version: str, path: str, pools: dict, batchers: dict, load_seconds: float = 0.0,
+                 screening_pools: Optional[dict] = None, screening_batchers: Optional[dict] = None):
+        self.version = version
+        self.path = path
+        self.pools = pools
+        self.batchers = batchers
+        self.screening_pools = screening_pools or {}
+        self.screening_batchers = screening_batchers or {}
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self.retired = False
+        self.stopped = False
+
+    @property
+    def fingerprint(self) -> str:
+        return ":".join(pool.fingerprint for pool in self.pools.values())
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        for batcher in (*self.batchers.values(), *self.screening_batchers.values()):
+            batcher.stop()
+        logger.info(f"Model version {self.version} unloaded")
+
+    def snapshot(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "fingerprints": {name: pool.fingerprint for name, pool in self.pools.items()},
+            "screening": {name: {"variant": pool.variant, "fingerprint": pool.fingerprint}
+                          for name, pool in self.screening_pools.items()},
+            "loaded_at": round(self.loaded_at, 3),
+            "load_ms": round(self.load_seconds * 1000, 1),
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelRegistry:
+    """Discovers model versions on disk and swaps the serving version without downtime
+
+    ``load()`` builds the new bundle (pools, warmup, batchers) through
+    ``loader`` while the current one keeps serving, then swaps it in under
+    a lock. The previous bundle is retired and unloaded after its in-flight
+    requests finish.
+    """
+
+    def __init__(self, base_path: str, required_dirs: tuple, legacy_version: str,
+                 loader: Callable[[str, str], ModelBundle],
+                 on_swap: Optional[Callable[[ModelBundle], None]] = None):
+        self.base_path = base_path
+        self.required_dirs = required_dirs
+        self.legacy_version = legacy_version
+        self.loader = loader
+        self.on_swap = on_swap
+        self._current: Optional[ModelBundle] = None
+        self._retiring = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.reloads = 0
+
+    @property
+    def current(self) -> Optional[ModelBundle]:
+        return self._current
+
+    def versions(self) -> list:
+        return discover_versions(self.base_path, self.required_dirs, self.legacy_version)
+
+    def load(self, requested: str = "latest") -> ModelBundle:
+        """Load ``requested`` in the calling thread and make it current"""
+        if not self._load_lock.acquire(blocking=False):
+            raise ReloadInProgress("A model reload is already in progress")
+        try:
+            version, path = resolve_version(self.versions(), requested)
+            logger.info(f"Loading model version {version} from {path}...")
+            start = time.perf_counter()
+            bundle = self.loader(version, path)
+            bundle.load_seconds = time.perf_counter() - start
+            self._swap(bundle)
+            logger.info(f"Model version {version} is now serving (loaded in {bundle.load_seconds * 1000:.0f}ms)")
+            return bundle
+        finally:
+            self._load_lock.release()
+
+    def _swap(self, bundle: ModelBundle):
+        stop_now = None
+        with self._lock:
+            previous = self._current
+            self._current = bundle
+            if previous is not None:
+                self.reloads += 1
+                previous.retired = True
+                if previous.in_flight == 0:
+                    stop_now = previous
+                else:
+                    self._retiring.append(previous)
+        if self.on_swap is not None:
+            self.on_swap(bundle)
+        if stop_now is not None:
+            stop_now.stop()
+
+    def acquire(self) -> ModelBundle:
+        with self._lock:
+            bundle = self._current
+            if bundle is None:
+                raise RuntimeError("No model version loaded")
+            bundle.in_flight += 1
+            return bundle
+
+    def release(self, bundle: ModelBundle):
+        with self._lock:
+            bundle.in_flight -= 1
+            finished = bundle.retired and bundle.in_flight == 0
+            if finished and bundle in self._retiring:
+                self._retiring.remove(bundle)
+        if finished:
+            bundle.stop()
+
+    @contextmanager
+    def use(self):
+        bundle = self.acquire()
+        try:
+            yield bundle
+        finally:
+            self.release(bundle)
+
+    def shutdown(self):
+        with self._lock:
+            bundles = [self._current, *self._retiring]
+            self._current = None
+            self._retiring = []
+        for bundle in bundles:
+            if bundle is not None:
+                bundle.stop()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            current = self._current.snapshot() if self._current else None
+            retiring = [bundle.snapshot() for bundle in self._retiring]
+        return {
+            "base_path": self.base_path,
+            "current": current,
+            "retiring": retiring,
+            "available": [version for version, _ in self.versions()],
+            "reloads": self.reloads,
+            "reload_in_progress": self._load_lock.locked(),
+        }
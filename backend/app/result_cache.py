@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(image_bytes: bytes, model_version: str) -> str:
+    """Content address for a diagnosis: hash of the raw image bytes plus model version"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(b"\0" + model_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU cache of diagnosis payloads with a TTL and optional on-disk store
+
+    Entries live in memory up to ``max_entries``; the least recently used one
+    is evicted first. When ``disk_path`` is set every entry is also written
+    there as JSON so the cache survives restarts, and memory misses fall back
+    to disk before reporting a miss.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400,
+                 disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def _disk_file(self, key: str) -> str:
+        return os.path.join(self.disk_path, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._disk_file(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record["stored_at"], record["value"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {key[:12]}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, stored_at: float, value: dict):
+        path = self._disk_file(key)
+        # Unique per process and thread: workers sharing RESULT_CACHE_DIR may write the same key
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to persist cache entry {key[:12]}: {str(e)}")
+
+    def _remember(self, key: str, stored_at: float, value: dict):
+        """Insert into the in-memory LRU; caller holds the lock"""
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.disk_path:
+            entry = self._read_disk(key)
+            if entry is not None and not self._expired(entry[0]):
+                with self._lock:
+                    self._remember(key, *entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: dict):
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, value)
+        if self.disk_path:
+            self._write_disk(key, stored_at, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": bool(self.disk_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,104 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Lightest first: the standalone LiteRT and tflite-runtime wheels ship only the
+# interpreter, while TensorFlow loads the whole training runtime to reach it
+BACKEND_PREFERENCE = ("ai_edge_litert", "tflite_runtime", "tensorflow")
+
+# Built-in delegate choices; anything else is taken as the path of an external
+# delegate library loaded with load_delegate
+DELEGATES = ("xnnpack", "none")
+
+
+class InterpreterBackend:
+    """The TFLite Interpreter class from one runtime package, imported on demand"""
+
+    def __init__(self, name: str, interpreter_cls, version: str, import_seconds: float,
+                 op_resolver_type=None, load_delegate=None):
+        self.name = name
+        self.interpreter_cls = interpreter_cls
+        self.version = version
+        self.import_seconds = import_seconds
+        self.op_resolver_type = op_resolver_type
+        self.load_delegate = load_delegate
+
+    def interpreter_kwargs(self, delegate: str = "xnnpack") -> dict:
+        """Interpreter constructor arguments selecting ``delegate``
+
+        ``xnnpack`` is the default CPU delegate every runtime applies on its
+        own; ``none`` runs the plain builtin kernels. Any other value is an
+        external delegate library, loaded fresh for each interpreter; this
+        raises ValueError or OSError when the library cannot be loaded.
+        """
+        if delegate == "xnnpack":
+            return {}
+        if delegate == "none":
+            if self.op_resolver_type is None:
+                raise ValueError(f"{self.name} cannot disable the default delegates")
+            return {"experimental_op_resolver_type": self.op_resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES}
+        if self.load_delegate is None:
+            raise ValueError(f"{self.name} cannot load external delegates")
+        return {"experimental_delegates": [self.load_delegate(delegate)]}
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "import_ms": round(self.import_seconds * 1000, 1),
+        }
+
+
+def _import_backend(name: str) -> InterpreterBackend:
+    start = time.perf_counter()
+    if name == "ai_edge_litert":
+        from ai_edge_litert.interpreter import Interpreter, OpResolverType, load_delegate
+        package = importlib.import_module("ai_edge_litert")
+    elif name == "tflite_runtime":
+        from tflite_runtime.interpreter import Interpreter, OpResolverType, load_delegate
+        package = importlib.import_module("tflite_runtime")
+    elif name == "tensorflow":
+        import tensorflow as package
+        Interpreter = package.lite.Interpreter
+        OpResolverType = package.lite.experimental.OpResolverType
+        load_delegate = package.lite.experimental.load_delegate
+    else:
+        raise ValueError(f"Unknown interpreter backend: {name} (expected one of {', '.join(BACKEND_PREFERENCE)})")
+    return InterpreterBackend(name, Interpreter, getattr(package, "__version__", "unknown"),
+                              time.perf_counter() - start,
+                              op_resolver_type=OpResolverType, load_delegate=load_delegate)
+
+
+_backend: Optional[InterpreterBackend] = None
+_backend_lock = threading.Lock()
+
+
+def load_interpreter_backend(preference: str = "auto") -> InterpreterBackend:
+    """Import and cache the interpreter runtime; ``auto`` takes the first installed one
+
+    Nothing is imported until the first call, so importing the API does not
+    pay for a runtime before models are actually loaded.
+    """
+    global _backend
+
+    with _backend_lock:
+        if _backend is not None and preference in ("auto", _backend.name):
+            return _backend
+
+        candidates = BACKEND_PREFERENCE if preference == "auto" else (preference,)
+        errors = []
+        for name in candidates:
+            try:
+                _backend = _import_backend(name)
+            except ImportError as e:
+                errors.append(f"{name}: {e}")
+                continue
+            logger.info(f"Interpreter backend: {_backend.name} {_backend.version} "
+                        f"(imported in {_backend.import_seconds * 1000:.0f}ms)")
+            return _backend
+
+        raise ImportError(f"No TFLite interpreter backend available ({'; '.join(errors)})")
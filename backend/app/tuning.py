@@ -0,0 +1,93 @@
+import logging
+import os
+import statistics
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Settings within this fraction of the fastest count as a tie, which goes to
+# the setting with fewer threads so the spare cores serve other requests
+CALIBRATION_TOLERANCE = 0.05
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects taskset/cgroup cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_candidates(pool_size: int, cpus: Optional[int] = None) -> list:
+    """Threads per interpreter worth trying: powers of two up to each interpreter's share of the CPUs"""
+    share = max(1, (cpus or available_cpus()) // max(1, pool_size))
+    candidates = []
+    threads = 1
+    while threads < share:
+        candidates.append(threads)
+        threads *= 2
+    candidates.append(share)
+    return candidates
+
+
+def time_invokes(interpreter, runs: int) -> float:
+    """Median seconds per invoke on a zero input, after one untimed invoke"""
+    details = interpreter.get_input_details()[0]
+    interpreter.set_tensor(details['index'], np.zeros(details['shape'], dtype=details['dtype']))
+    interpreter.invoke()
+    timings = []
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        interpreter.invoke()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate(name: str, model_path: str, interpreter_cls, threads: list, delegates: list,
+              interpreter_kwargs: Callable[[str], dict], runs: int = 5) -> dict:
+    """Time every threads x delegate setting on a scratch interpreter and pick the fastest
+
+    Returns ``num_threads`` and ``delegate`` to build the pool with, plus the
+    median invoke time of every setting tried (None for settings that could
+    not be built, e.g. a delegate library that fails to load).
+    """
+    start = time.perf_counter()
+    measured = []
+    timings = {}
+    for delegate in delegates:
+        for num_threads in threads:
+            label = f"{num_threads}/{delegate}"
+            try:
+                interpreter = interpreter_cls(model_path=model_path, num_threads=num_threads,
+                                              **interpreter_kwargs(delegate))
+                interpreter.allocate_tensors()
+                seconds = time_invokes(interpreter, runs)
+            except (ValueError, OSError, RuntimeError) as e:
+                logger.warning(f"{name} calibration: {label} unavailable ({str(e)})")
+                timings[label] = None
+                continue
+            timings[label] = round(seconds * 1000, 3)
+            measured.append((seconds, num_threads, delegate))
+
+    if not measured:
+        raise RuntimeError(f"No usable interpreter setting for {name} (tried {', '.join(timings)})")
+
+    fastest = min(seconds for seconds, _, _ in measured)
+    seconds, num_threads, delegate = min(
+        (setting for setting in measured if setting[0] <= fastest * (1 + CALIBRATION_TOLERANCE)),
+        key=lambda setting: (setting[1], setting[0])
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"{name} calibration picked {num_threads} threads/{delegate} at {seconds * 1000:.2f}ms per invoke "
+                f"(tried {', '.join(f'{label}={ms}ms' for label, ms in timings.items())}; {elapsed_ms:.0f}ms)")
+    return {
+        "num_threads": num_threads,
+        "delegate": delegate,
+        "invoke_ms": round(seconds * 1000, 3),
+        "timings_ms": timings,
+        "runs": runs,
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Written by build_variants.py at the root of a model version directory
+VARIANTS_MANIFEST = "variants.json"
+
+
+class UnknownVariant(LookupError):
+    """Raised when a requested variant is not listed in a version's manifest"""
+
+
+def load_manifest(model_dir: str) -> Optional[dict]:
+    """The variants manifest of a model version directory, None when it has none"""
+    path = os.path.join(model_dir, VARIANTS_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_selection(value: Optional[str]) -> dict:
+    """``int8_160`` (every model) or ``dr=int8_160,glaucoma=float16_224`` as ``{model: variant}``
+
+    A bare variant name is stored under ``*``.
+    """
+    selection = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" in item:
+            model, variant = item.split("=", 1)
+            selection[model.strip().lower()] = variant.strip()
+        else:
+            selection["*"] = item
+    return selection
+
+
+def resolve_variant(manifest: dict, model_dir: str, model: str, selection: dict) -> Optional[tuple]:
+    """``(variant, path)`` to serve for ``model``, or None when the manifest does not cover it
+
+    The explicit ``selection`` wins over the variant the manifest marks as
+    selected; a selected name the model was not built in raises UnknownVariant.
+    """
+    entry = manifest.get("models", {}).get(model)
+    if entry is None:
+        return None
+    variant = selection.get(model) or selection.get("*") or entry.get("selected") or entry.get("reference")
+    variants = entry.get("variants", {})
+    if variant not in variants:
+        raise UnknownVariant(f"Variant {variant} not built for {model} (available: {', '.join(variants)})")
+    return variant, os.path.join(model_dir, variants[variant]["file"])
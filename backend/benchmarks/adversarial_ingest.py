@@ -0,0 +1,170 @@
+# adversarial_ingest.py
+"""Cost of rejecting bad uploads: header-only ingest vs decode-then-validate
+
+Run from backend/:
+
+    python -m benchmarks.adversarial_ingest
+    python -m benchmarks.adversarial_ingest --models /tmp/netra-models --endpoint --json
+
+Builds a set of hostile inputs (truncated and corrupt JPEGs, random bytes,
+a PDF, a zip, plain text, a body over MAX_IMAGE_SIZE, a PNG whose header
+claims 30000x30000 pixels over a tiny body, an image below the minimum
+size) next to one valid fundus-sized JPEG. Each input is timed through the
+previous ingest path (decode_image then validate_image) and through
+inspect_image, which only reads the header; both report whether the input
+was accepted. With --endpoint every input is also posted to
+/api/ai-diagnoses in-process and the status code and latency are
+reported, showing rejections return before the inference stage.
+"""
+import argparse
+import asyncio
+import io
+import json
+import struct
+import time
+import zipfile
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from app.ingest import RejectedUpload, inspect_image
+from app.preprocessing import decode_image, validate_image
+from benchmarks.health_under_load import make_fundus_jpeg
+from benchmarks.inference_suite import _quiet_server, summarize
+
+
+def _png_bomb(width: int = 30000, height: int = 30000) -> bytes:
+    """A valid PNG header claiming width x height over one compressed row"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    row = zlib.compress(b"\x00" * (1 + width * 3), 9)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", row) + chunk(b"IEND", b"")
+
+
+def _zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("notes.txt", "not an image" * 100)
+    return buffer.getvalue()
+
+
+def adversarial_inputs(max_image_size: int) -> dict:
+    # Fundus-like, so the valid image also passes the quality gate at the endpoint
+    valid = make_fundus_jpeg(2048)
+    tiny = io.BytesIO()
+    Image.new("RGB", (20, 20)).save(tiny, format="PNG")
+    corrupt = bytearray(valid)
+    corrupt[2:64] = bytes(62)  # JPEG signature followed by no valid marker
+    return {
+        "valid_jpeg_2048": valid,
+        "truncated_jpeg": valid[:len(valid) // 3],
+        "header_only_jpeg": valid[:20],
+        "corrupt_jpeg_header": bytes(corrupt),
+        "random_bytes": np.random.default_rng(1).integers(0, 256, 512 * 1024, dtype=np.uint8).tobytes(),
+        "pdf": b"%PDF-1.7\n" + b"0" * 200_000,
+        "zip": _zip(),
+        "text": b"hello " * 10_000,
+        "oversized_jpeg": valid + b"\x00" * (max_image_size + 1 - len(valid)),
+        "png_bomb_30000x30000": _png_bomb(),
+        "too_small_20x20": tiny.getvalue(),
+    }
+
+
+def old_path(image_bytes: bytes, max_image_size: int) -> str:
+    """Size check after the full read, then a full decode and validate_image"""
+    if len(image_bytes) > max_image_size:
+        return "rejected"
+    try:
+        image = decode_image(image_bytes)
+        return "accepted" if validate_image(image) else "rejected"
+    except Exception:
+        return "rejected"
+
+
+def new_path(image_bytes: bytes, max_image_size: int, max_pixels: int) -> str:
+    if len(image_bytes) > max_image_size:
+        return "rejected"
+    try:
+        inspect_image(image_bytes, max_pixels)
+        return "accepted"
+    except RejectedUpload:
+        return "rejected"
+
+
+def time_path(fn, iterations: int) -> tuple:
+    outcome = fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    result = summarize(latencies, time.perf_counter() - start, iterations)
+    return outcome, result["latency_ms"]["p50"]
+
+
+async def post_inputs(server, inputs: dict, iterations: int) -> dict:
+    import httpx
+
+    results = {}
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name, data in inputs.items():
+                latencies, status = [], None
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/api/ai-diagnoses", files={"file": (f"{name}.jpg", data, "image/jpeg")}
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    status = response.status_code
+                results[name] = {"status": status, "p50_ms": round(float(np.median(latencies)), 3)}
+    return results
+
+
+def main(args):
+    server = _quiet_server(args.models)
+    inputs = adversarial_inputs(server.MAX_IMAGE_SIZE)
+    results = {}
+    for name, data in inputs.items():
+        old_outcome, old_ms = time_path(lambda: old_path(data, server.MAX_IMAGE_SIZE), args.iterations)
+        new_outcome, new_ms = time_path(
+            lambda: new_path(data, server.MAX_IMAGE_SIZE, server.MAX_IMAGE_PIXELS), args.iterations
+        )
+        results[name] = {
+            "bytes": len(data),
+            "decode_validate": {"outcome": old_outcome, "p50_ms": old_ms},
+            "header_only": {"outcome": new_outcome, "p50_ms": new_ms},
+        }
+
+    if args.endpoint:
+        endpoint = asyncio.run(post_inputs(server, inputs, args.endpoint_iterations))
+        for name, result in endpoint.items():
+            results[name]["endpoint"] = result
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'input':<22} {'bytes':>9}  {'decode+validate':>22}  {'header only':>20}"
+          + ("  endpoint" if args.endpoint else ""))
+    for name, result in results.items():
+        old, new = result["decode_validate"], result["header_only"]
+        line = (f"{name:<22} {result['bytes']:>9}  {old['outcome']:>9} {old['p50_ms']:>9.3f}ms  "
+                f"{new['outcome']:>9} {new['p50_ms']:>7.3f}ms")
+        if "endpoint" in result:
+            line += f"  {result['endpoint']['status']} in {result['endpoint']['p50_ms']:.2f}ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--endpoint", action="store_true", help="Also post every input to /api/ai-diagnoses")
+    parser.add_argument("--endpoint-iterations", type=int, default=5)
+    parser.add_argument("--models", default="models", help="Model directory for --endpoint")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    main(parser.parse_args())
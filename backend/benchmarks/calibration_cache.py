@@ -0,0 +1,124 @@
+# calibration_cache.py
+"""Calibration dataset: serial per-model decoding vs the cached parallel pipeline
+
+Run from backend/:
+
+    python -m benchmarks.calibration_cache
+    python -m benchmarks.calibration_cache --images sample_images --convert
+
+Writes fundus-like images to a temporary directory (or uses --images) and
+measures: the original pipeline (serial open/convert/resize, paid once per
+converted model), building the memory-mapped cache with all CPUs, and a
+second run that finds the cache and only streams it. Every cached row is
+compared with the server's own decode_and_preprocess output, which must
+match exactly. With --convert, a small Keras model is INT8-converted from
+the cached dataset for each of the two served models to show the streamed
+generator works with the converter end to end.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import quantized_models
+from benchmarks.preprocess_parity import synthetic_images
+
+
+def serial_dataset(image_files: list):
+    """The previous create_representative_dataset loop: default resize filter, one image at a time"""
+    for img_path in image_files:
+        img = Image.open(img_path).convert("RGB").resize((224, 224))
+        yield [np.expand_dims(np.array(img, dtype=np.float32) / 255.0, axis=0)]
+
+
+def drain(generator) -> float:
+    start = time.perf_counter()
+    for _ in generator:
+        pass
+    return time.perf_counter() - start
+
+
+def check_parity(cache, image_files: list, preprocess_mode: str) -> int:
+    """Rows that differ from the serving path's preprocessing of the same file"""
+    import logging
+    import app.main as server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.PREPROCESS_MODE = preprocess_mode
+    mismatches = 0
+    for row, img_path in zip(cache, image_files):
+        with open(img_path, "rb") as f:
+            served = server.decode_and_preprocess(f.read())
+        if served.dtype != np.uint8:
+            served = np.rint(served * 255.0).astype(np.uint8)
+        mismatches += int(not np.array_equal(row, served[0]))
+    return mismatches
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory() as scratch:
+        image_dir = args.images
+        if image_dir is None:
+            image_dir = os.path.join(scratch, "images")
+            os.makedirs(image_dir)
+            for name, data in synthetic_images(args.count, size=args.size):
+                with open(os.path.join(image_dir, name), "wb") as f:
+                    f.write(data)
+        cache_dir = os.path.join(scratch, "cache")
+        image_files = quantized_models.calibration_files(image_dir, args.count)
+
+        serial_s = drain(serial_dataset(image_files))
+
+        start = time.perf_counter()
+        dataset = quantized_models.create_representative_dataset(
+            image_dir, args.count, cache_dir, args.preprocess_mode, workers=args.workers
+        )
+        build_s = time.perf_counter() - start
+        first_stream_s = drain(dataset())
+
+        start = time.perf_counter()
+        dataset = quantized_models.create_representative_dataset(
+            image_dir, args.count, cache_dir, args.preprocess_mode, workers=args.workers
+        )
+        reuse_s = time.perf_counter() - start
+        second_stream_s = drain(dataset())
+
+        cache_path = glob.glob(os.path.join(cache_dir, "*.npy"))[0]
+        cache = np.load(cache_path, mmap_mode="r")
+        mismatches = check_parity(cache, image_files, args.preprocess_mode)
+
+        print(f"{len(image_files)} images ({args.preprocess_mode} preprocessing), "
+              f"cache {os.path.getsize(cache_path) / 1e6:.1f} MB")
+        print(f"serial decode per model:        {serial_s:7.2f}s  (x2 models = {2 * serial_s:.2f}s)")
+        print(f"parallel build:                 {build_s:7.2f}s  + stream {first_stream_s:.2f}s")
+        print(f"cache reuse:                    {reuse_s:7.3f}s  + stream {second_stream_s:.2f}s")
+        print(f"rows differing from serving:    {mismatches}")
+
+        if args.convert:
+            from benchmarks.quantization_parity import build_two_head_model
+
+            model_path = os.path.join(scratch, "model.keras")
+            build_two_head_model().save(model_path)
+            for name in ("dr", "glaucoma"):
+                output_path = os.path.join(scratch, f"{name}_int8.tflite")
+                start = time.perf_counter()
+                if not quantized_models.quantize_model(model_path, output_path, dataset):
+                    return 1
+                print(f"{name} int8 conversion from cache: {time.perf_counter() - start:.1f}s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", help="Directory of fundus images (synthetic ones when omitted)")
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--size", type=int, default=1536, help="Side of the synthetic images")
+    parser.add_argument("--preprocess-mode", default="fast", choices=("fast", "reference"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--convert", action="store_true", help="Also run INT8 conversions from the cache")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+# cascade_thresholds.py
+"""Confidence cascade: escalation rate, agreement and latency saved per threshold
+
+Run from backend/ against a version directory built by build_variants.py:
+
+    python -m benchmarks.cascade_thresholds --models models/2025-10-01 --screening int8_160 --images eval
+    python -m benchmarks.cascade_thresholds --models models/2025-10-01 --screening dr=int8_160 --json
+
+For every model with a screening variant, the screening variant and the
+served (full) variant score the same images through the serving predict
+path. For each threshold the cascade answers from the screening model when
+its top probability reaches the threshold and escalates otherwise; the
+table shows the escalation rate, how often the cascade's answer agrees with
+the full model's, and the mean model latency saved per image (negative
+when escalations cost more than screening saves). Pick the lowest threshold
+whose agreement is acceptable and set it as CASCADE_THRESHOLD.
+"""
+import argparse
+import json
+import logging
+import sys
+
+import numpy as np
+
+import build_variants
+import quantized_models
+from app.variants import load_manifest, parse_selection, resolve_variant
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99)
+
+
+def sweep(screening: dict, full: dict, thresholds: tuple) -> list:
+    """Cascade outcome at each threshold from per-image screening and full predictions"""
+    confidence = screening["probabilities"].max(axis=1)
+    rows = []
+    for threshold in thresholds:
+        answered = confidence >= threshold
+        indices = np.where(answered, screening["indices"], full["indices"])
+        # Screened images save the full invoke; escalated ones pay the screening invoke on top
+        saved_ms = np.where(answered, full["invoke_ms"] - screening["invoke_ms"], -screening["invoke_ms"])
+        rows.append({
+            "threshold": threshold,
+            "escalation_rate": round(float(1 - answered.mean()), 4),
+            "agreement": round(float(np.mean(indices == full["indices"])), 4),
+            "avg_saved_ms": round(float(saved_ms.mean()), 3),
+        })
+    return rows
+
+
+def main(args) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    import app.main as server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    build_variants._server = server
+
+    manifest = load_manifest(args.models)
+    if manifest is None:
+        print(f"No variants manifest in {args.models}; build one with build_variants.py", file=sys.stderr)
+        return 2
+    screening_selection = parse_selection(args.screening)
+    full_selection = parse_selection(args.full)
+
+    paths = quantized_models.calibration_files(args.images, args.limit)
+    eval_set = build_variants.EvalSet(paths)
+    if not len(eval_set):
+        print(f"No evaluation images in {args.images}", file=sys.stderr)
+        return 2
+
+    results = {}
+    for spec in server.MODEL_SPECS:
+        if spec.name not in manifest.get("models", {}):
+            continue
+        if spec.name not in screening_selection and "*" not in screening_selection:
+            continue
+        variants = manifest["models"][spec.name]["variants"]
+        measured = {}
+        for tier, selection in (("screening", screening_selection), ("full", full_selection)):
+            variant, path = resolve_variant(manifest, args.models, spec.name, selection)
+            size = variants[variant]["input_size"][0]
+            measured[tier] = build_variants.evaluate(path, spec, size, eval_set, args.threads, args.runs)
+            measured[tier]["variant"] = variant
+        results[spec.name] = {
+            "screening": measured["screening"]["variant"],
+            "full": measured["full"]["variant"],
+            "screening_invoke_ms": measured["screening"]["invoke_ms"],
+            "full_invoke_ms": measured["full"]["invoke_ms"],
+            "thresholds": sweep(measured["screening"], measured["full"], args.thresholds),
+        }
+
+    if not results:
+        print(f"No model in {args.models} has a screening variant for {args.screening}", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps({"images": len(eval_set), "models": results}, indent=2))
+        return 0
+    print(f"{len(eval_set)} images from {args.images}")
+    for name, result in results.items():
+        print(f"\n{name}: {result['screening']} ({result['screening_invoke_ms']:.2f}ms) -> "
+              f"{result['full']} ({result['full_invoke_ms']:.2f}ms)")
+        print(f"  {'threshold':>9} {'escalated':>10} {'agreement':>10} {'saved ms':>9}")
+        for row in result["thresholds"]:
+            print(f"  {row['threshold']:>9.2f} {row['escalation_rate']:>10.1%} {row['agreement']:>10.1%} "
+                  f"{row['avg_saved_ms']:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", required=True, help="Model version directory with a variants manifest")
+    parser.add_argument("--screening", required=True, help="Screening variant, as CASCADE_VARIANT")
+    parser.add_argument("--full", help="Full variant, as MODEL_VARIANT (default: the manifest's selection)")
+    parser.add_argument("--images", default="sample_images", help="Evaluation images")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--thresholds", nargs="+", type=float, default=list(THRESHOLDS))
+    parser.add_argument("--threads", type=int, default=1, help="Interpreter threads while timing")
+    parser.add_argument("--runs", type=int, default=20, help="Timed invokes per variant")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+# cold_start.py
+"""Cold start time and memory per TFLite interpreter backend
+
+Run from backend/:
+
+    python -m benchmarks.cold_start --models models
+    python -m benchmarks.cold_start --models /tmp/netra-models --backends ai_edge_litert tensorflow --json
+
+Each backend is measured in a fresh interpreter process with
+INTERPRETER_BACKEND set: the time to import app.main, to load both models
+(which is where the runtime package is imported), and to run the first
+prediction, plus resident and peak memory once the models are ready.
+Backends that are not installed are reported as unavailable.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKENDS = ("ai_edge_litert", "tflite_runtime", "tensorflow")
+
+
+def memory_mb() -> dict:
+    """Current and peak RSS from /proc/self/status (Linux only)"""
+    values = {}
+    with open("/proc/self/status", "r", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, kib = line.split()[:2]
+                values["rss_mb" if key == "VmRSS:" else "peak_rss_mb"] = round(int(kib) / 1024, 1)
+    return values
+
+
+def measure_child() -> dict:
+    """Runs inside the fresh process; prints one JSON line"""
+    import_start = time.perf_counter()
+    import app.main as server
+    import_ms = (time.perf_counter() - import_start) * 1000
+
+    import numpy as np
+
+    load_start = time.perf_counter()
+    server.load_models()
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    pool = server.model_pools["dr"]
+    dummy = np.zeros((1, 224, 224, 3), dtype=np.uint8)
+    predict_start = time.perf_counter()
+    with pool.checkout() as interpreter:
+        server.predict_with_tflite_quantized(
+            interpreter, pool.input_details, pool.output_details, dummy,
+            pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+        )
+    first_predict_ms = (time.perf_counter() - predict_start) * 1000
+
+    return {
+        "backend": server.interpreter_backend.name,
+        "version": server.interpreter_backend.version,
+        "runtime_import_ms": round(server.interpreter_backend.import_seconds * 1000, 1),
+        "app_import_ms": round(import_ms, 1),
+        "load_models_ms": round(load_ms, 1),
+        "first_predict_ms": round(first_predict_ms, 1),
+        "tensorflow_imported": "tensorflow" in sys.modules,
+        **memory_mb(),
+    }
+
+
+def measure(backend: str, models: str) -> dict:
+    env = dict(os.environ, INTERPRETER_BACKEND=backend, MODEL_PATH=models, ENVIRONMENT="production")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.cold_start", "--child"],
+                          env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        last_line = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+        return {"backend": backend, "unavailable": last_line}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_wall_ms"] = round(wall_ms, 1)
+    return result
+
+
+def main(args):
+    results = [measure(backend, args.models) for backend in args.backends]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        if "unavailable" in result:
+            print(f"{result['backend']:>15}: unavailable ({result['unavailable']})")
+            continue
+        print(f"{result['backend']:>15}: process {result['process_wall_ms']:7.0f}ms  "
+              f"app import {result['app_import_ms']:6.0f}ms  "
+              f"runtime import {result['runtime_import_ms']:6.0f}ms  "
+              f"load {result['load_models_ms']:6.0f}ms  first predict {result['first_predict_ms']:5.0f}ms  "
+              f"RSS {result['rss_mb']:6.1f}MB (peak {result['peak_rss_mb']:.1f}MB)")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        print(json.dumps(measure_child()))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default=os.getenv("MODEL_PATH", "models"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,109 @@
+# fetch_limits.py
+"""Exercise ImageFetcher against a local stand-in image host
+
+Run from backend/:
+
+    python -m benchmarks.fetch_limits
+
+Starts a threaded HTTP server on localhost with well-behaved, oversized
+(with and without Content-Length), slow-trickle and slow-first-byte
+endpoints, then fetches each one and reports the outcome, the elapsed
+time and how many body bytes the server managed to send before the
+client gave up. Oversized responses should fail after roughly the size
+cap, and slow hosts should fail at the configured timeouts.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.fetch import ImageFetcher
+
+CHUNK = 64 * 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body_size = 0
+    sent = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, total: int, declare_length: bool, delay: float = 0.0):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        if declare_length:
+            self.send_header("Content-Length", str(total))
+        else:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        sent = 0
+        try:
+            while sent < total:
+                size = min(CHUNK, total - sent)
+                payload = b"\xff" * size
+                if declare_length:
+                    self.wfile.write(payload)
+                else:
+                    self.wfile.write(f"{size:x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+                sent += size
+                StandInHandler.sent[self.path] = sent
+                if delay:
+                    time.sleep(delay)
+            if not declare_length:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        cap = StandInHandler.body_size
+        if self.path == "/ok":
+            self._send_body(cap // 2, declare_length=True)
+        elif self.path == "/oversized-declared":
+            self._send_body(cap * 5, declare_length=True)
+        elif self.path == "/oversized-chunked":
+            self._send_body(cap * 5, declare_length=False)
+        elif self.path == "/slow-trickle":
+            self._send_body(cap // 2, declare_length=False, delay=0.5)
+        elif self.path == "/slow-first-byte":
+            time.sleep(30)
+            self._send_body(CHUNK, declare_length=True)
+        else:
+            self.send_error(404)
+
+
+async def run(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    StandInHandler.body_size = args.max_bytes
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    fetcher = ImageFetcher(args.max_bytes, connect_timeout=1.0, read_timeout=args.read_timeout,
+                           total_timeout=args.total_timeout)
+    print(f"cap={args.max_bytes:,} bytes read_timeout={args.read_timeout}s total_timeout={args.total_timeout}s")
+    try:
+        for path in ("/ok", "/oversized-declared", "/oversized-chunked", "/slow-trickle", "/slow-first-byte"):
+            start = time.perf_counter()
+            try:
+                body = await fetcher.fetch(base + path)
+                outcome = f"ok ({len(body):,} bytes)"
+            except Exception as e:
+                outcome = f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+            sent = StandInHandler.sent.get(path, 0)
+            print(f"{path:>20}: {elapsed:6.2f}s server sent {sent:>12,} bytes -> {outcome}")
+    finally:
+        await fetcher.aclose()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-bytes", type=int, default=10 * 1024 * 1024)
+    parser.add_argument("--read-timeout", type=float, default=2.0)
+    parser.add_argument("--total-timeout", type=float, default=4.0)
+    asyncio.run(run(parser.parse_args()))
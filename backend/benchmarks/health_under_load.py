@@ -0,0 +1,103 @@
+# health_under_load.py
+"""Load test: /health latency while diagnoses are in flight
+
+Start the API first (e.g. `uvicorn app.main:app --port 8080` from backend/),
+then run:
+
+    python benchmarks/health_under_load.py --url http://localhost:8080 --concurrency 16
+
+Diagnoses are fired continuously at the requested concurrency while /health
+is polled every --probe-interval seconds. If inference blocks the event loop,
+health probe latency climbs to the inference time; with the executor-backed
+inference stage it should stay in the low milliseconds.
+"""
+import argparse
+import asyncio
+import io
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+
+def make_fundus_jpeg(size: int = 1024) -> bytes:
+    """Synthetic fundus-like JPEG: bright disc on a dark background"""
+    yy, xx = np.mgrid[0:size, 0:size]
+    radius = np.sqrt((xx - size / 2) ** 2 + (yy - size / 2) ** 2)
+    disc = np.clip(1.0 - radius / (size / 2), 0, 1)
+    rng = np.random.default_rng(0)
+    rgb = np.stack([disc * 200, disc * 90, disc * 40], axis=-1) + rng.normal(0, 8, (size, size, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def summarize(samples: list) -> str:
+    if not samples:
+        return "no samples"
+    arr = np.array(samples)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return f"n={arr.size} p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms max={arr.max():.1f}ms"
+
+
+async def diagnose_worker(client: httpx.AsyncClient, image_bytes: bytes, stop: asyncio.Event,
+                          latencies: list, statuses: dict):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/ai-diagnoses",
+            files={"file": ("fundus.jpg", image_bytes, "image/jpeg")},
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+
+async def health_prober(client: httpx.AsyncClient, interval: float, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+
+
+async def main(args):
+    image_bytes = make_fundus_jpeg()
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        idle_health = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(health_prober(client, args.probe_interval, stop, idle_health))
+        await asyncio.sleep(2)
+        stop.set()
+        await prober
+
+        loaded_health, diagnose_latencies, statuses = [], [], {}
+        stop = asyncio.Event()
+        tasks = [
+            asyncio.create_task(diagnose_worker(client, image_bytes, stop, diagnose_latencies, statuses))
+            for _ in range(args.concurrency)
+        ]
+        tasks.append(asyncio.create_task(health_prober(client, args.probe_interval, stop, loaded_health)))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    print(f"/health idle:        {summarize(idle_health)}")
+    print(f"/health under load:  {summarize(loaded_health)}")
+    print(f"diagnoses:           {summarize(diagnose_latencies)}")
+    print(f"diagnose statuses:   {statuses}")
+    print(f"diagnose throughput: {len(diagnose_latencies) / args.duration:.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,320 @@
+# inference_suite.py
+"""Reproducible benchmark suite for the serving stack
+
+Run from backend/:
+
+    python -m benchmarks.inference_suite --output results.json
+    python -m benchmarks.inference_suite --output new.json --compare results.json
+
+Builds small synthetic DR and glaucoma models (see synthetic_models.py) unless
+--models points at a real MODEL_PATH tree, then runs each scenario in a fresh
+spawned process so peak RSS is attributable to that scenario alone:
+
+    preprocess_reference   decode + preprocess_image_quantized
+    preprocess_fast        draft decode + preprocess_image_fast
+    quantize_dequantize    quantize_input + dequantize_output on one batch
+    predict_int8_bN        predict_with_tflite_quantized, INT8 models
+    predict_float_bN       the same after load_models falls back to float
+    endpoint               /api/ai-diagnoses through the ASGI app at --concurrency
+
+Every scenario reports latency percentiles, throughput and peak RSS, and
+the whole run is written as JSON along with the environment. --compare
+prints the change against an earlier results file and exits non-zero when
+a p50 latency or throughput regresses by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.health_under_load import make_fundus_jpeg
+
+
+def summarize(latencies_ms: list, elapsed_s: float, items: int) -> dict:
+    arr = np.array(latencies_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "iterations": int(arr.size),
+        "latency_ms": {
+            "mean": round(float(arr.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(arr.max()), 3),
+        },
+        "throughput_per_s": round(items / elapsed_s, 2),
+    }
+
+
+def timed_loop(fn, iterations: int, warmup: int, items_per_call: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    return summarize(latencies, time.perf_counter() - start, iterations * items_per_call)
+
+
+def _quiet_server(model_path: str):
+    """Import the API with console-only logging and point it at ``model_path``"""
+    os.environ["ENVIRONMENT"] = "production"
+    import logging
+    import app.main as server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.MODEL_BASE_PATH = model_path
+    server.RESULT_CACHE_SIZE = 0
+    return server
+
+
+def _bench_preprocess(config: dict, fast: bool) -> dict:
+    from app.preprocessing import TARGET_SIZE, decode_image, preprocess_image_fast, preprocess_image_quantized
+
+    image_bytes = config["image_bytes"]
+    if fast:
+        fn = lambda: preprocess_image_fast(decode_image(image_bytes, TARGET_SIZE))
+    else:
+        fn = lambda: preprocess_image_quantized(decode_image(image_bytes))
+    return timed_loop(fn, config["iterations"], config["warmup"])
+
+
+def _bench_quantize(config: dict) -> dict:
+    server = _quiet_server(config["models"])
+    batch = np.random.default_rng(0).random((config["batch_size"], 224, 224, 3), dtype=np.float32)
+    outputs = np.random.default_rng(1).integers(-128, 128, (config["batch_size"], 5), dtype=np.int8)
+
+    def fn():
+        server.quantize_input(batch, 1 / 255, -128)
+        server.dequantize_output(outputs, 0.00390625, -128)
+
+    return timed_loop(fn, config["iterations"], config["warmup"], config["batch_size"])
+
+
+def _bench_predict(config: dict) -> dict:
+    server = _quiet_server(config["models"])
+    server.INTERPRETER_NUM_THREADS = config["threads"]
+    server.load_models()
+    pool = server.model_pools["dr"]
+    pixels = np.random.default_rng(0).integers(0, 256, (config["batch_size"], 224, 224, 3), dtype=np.uint8)
+
+    def fn():
+        with pool.checkout() as interpreter:
+            server.predict_with_tflite_quantized(
+                interpreter, pool.input_details, pool.output_details, pixels,
+                pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+            )
+
+    result = timed_loop(fn, config["iterations"], config["warmup"], config["batch_size"])
+    result["model_dtype"] = str(np.dtype(pool.input_details[0]["dtype"]))
+    return result
+
+
+async def _drive_endpoint(server, config: dict) -> dict:
+    import httpx
+
+    image_bytes = config["image_bytes"]
+    latencies, statuses = [], {}
+    remaining = config["iterations"]
+
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            async def post():
+                return await client.post(
+                    "/api/ai-diagnoses", files={"file": ("fundus.jpg", image_bytes, "image/jpeg")}
+                )
+
+            for _ in range(config["warmup"]):
+                await post()
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    response = await post()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(config["concurrency"])))
+            elapsed = time.perf_counter() - start
+
+    result = summarize(latencies, elapsed, len(latencies))
+    result["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    result["concurrency"] = config["concurrency"]
+    return result
+
+
+def _bench_endpoint(config: dict) -> dict:
+    server = _quiet_server(config["models"])
+    server.INTERPRETER_NUM_THREADS = config["threads"]
+    # Measure sustained load, not admission control: every client gets a slot
+    server.INFERENCE_MAX_PENDING = max(config["concurrency"], server.INFERENCE_MAX_PENDING or 0)
+    return asyncio.run(_drive_endpoint(server, config))
+
+
+SCENARIOS = {
+    "preprocess_reference": lambda config: _bench_preprocess(config, fast=False),
+    "preprocess_fast": lambda config: _bench_preprocess(config, fast=True),
+    "quantize_dequantize": _bench_quantize,
+    "predict": _bench_predict,
+    "endpoint": _bench_endpoint,
+}
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process image
+
+    VmHWM is used where available because ru_maxrss survives exec on Linux,
+    so a spawned child would report its parent's peak.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def run_scenario(kind: str, config: dict) -> dict:
+    """Entry point inside the spawned process"""
+    result = SCENARIOS[kind](config)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(kind: str, config: dict) -> dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_scenario, kind, config).result()
+
+
+def environment() -> dict:
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__,
+    }
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def prepare_models(args, scratch: str) -> tuple:
+    """(int8 tree, float-only tree), synthetic unless --models was given"""
+    if args.models:
+        return args.models, args.float_models
+
+    from benchmarks.synthetic_models import MODEL_FILES, write_model_tree
+
+    int8_root = write_model_tree(os.path.join(scratch, "int8"))
+    float_root = os.path.join(scratch, "float")
+    for name, (float_file, _, _, _) in MODEL_FILES.items():
+        os.makedirs(os.path.join(float_root, name))
+        shutil.copy(os.path.join(int8_root, name, float_file), os.path.join(float_root, name, float_file))
+    return int8_root, float_root
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Print changes against ``baseline``; True when nothing regressed past ``tolerance``"""
+    ok = True
+    previous = baseline.get("scenarios", {})
+    print(f"\nComparison with {baseline.get('environment', {}).get('git_commit')} (tolerance {tolerance:.0%}):")
+    for name, result in current["scenarios"].items():
+        if name not in previous:
+            continue
+        old, new = previous[name], result
+        p50_change = new["latency_ms"]["p50"] / old["latency_ms"]["p50"] - 1
+        throughput_change = new["throughput_per_s"] / old["throughput_per_s"] - 1
+        regressed = p50_change > tolerance or throughput_change < -tolerance
+        ok = ok and not regressed
+        print(f"  {name:>22}: p50 {p50_change:+7.1%}  throughput {throughput_change:+7.1%}  "
+              f"rss {new['peak_rss_mb'] - old['peak_rss_mb']:+6.1f}MB{'  REGRESSED' if regressed else ''}")
+    return ok
+
+
+def main(args) -> int:
+    # Built here so generating the test image does not count towards a scenario's peak RSS
+    base = {"iterations": args.iterations, "warmup": args.warmup, "threads": args.threads,
+            "image_bytes": make_fundus_jpeg(args.image_size)}
+    results = {"environment": environment(), "config": vars(args).copy(), "scenarios": {}}
+
+    with tempfile.TemporaryDirectory() as scratch:
+        int8_root, float_root = prepare_models(args, scratch)
+
+        plan = [
+            ("preprocess_reference", "preprocess_reference", {}),
+            ("preprocess_fast", "preprocess_fast", {}),
+            ("quantize_dequantize", "quantize_dequantize", {"models": int8_root, "batch_size": 1}),
+        ]
+        for batch_size in args.batch_sizes:
+            plan.append((f"predict_int8_b{batch_size}", "predict", {"models": int8_root, "batch_size": batch_size}))
+            if float_root:
+                plan.append((f"predict_float_b{batch_size}", "predict",
+                             {"models": float_root, "batch_size": batch_size}))
+        plan.append(("endpoint", "endpoint", {"models": int8_root, "concurrency": args.concurrency,
+                                              "iterations": args.endpoint_requests}))
+
+        for name, kind, overrides in plan:
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            result = run_isolated(kind, {**base, **overrides})
+            results["scenarios"][name] = result
+            latency = result["latency_ms"]
+            print(f"{name:>22}: p50 {latency['p50']:8.2f}ms  p95 {latency['p95']:8.2f}ms  "
+                  f"p99 {latency['p99']:8.2f}ms  {result['throughput_per_s']:8.1f}/s  "
+                  f"peak RSS {result['peak_rss_mb']:.0f}MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if not compare(results, json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    parser.add_argument("--models", help="MODEL_PATH tree to use instead of synthetic models")
+    parser.add_argument("--float-models", help="Float-only MODEL_PATH tree for the fallback scenarios")
+    parser.add_argument("--only", nargs="+", help="Run scenarios whose name starts with one of these")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--threads", type=int, default=4, help="Interpreter threads")
+    parser.add_argument("--image-size", type=int, default=2048, help="Side of the synthetic JPEG")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint-requests", type=int, default=200)
+    sys.exit(main(parser.parse_args()))
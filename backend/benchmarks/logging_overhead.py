@@ -0,0 +1,142 @@
+# logging_overhead.py
+"""Per-request cost of logging: synchronous handlers vs the queued pipeline
+
+Run from backend/:
+
+    python -m benchmarks.logging_overhead
+    python -m benchmarks.logging_overhead --models /tmp/netra-models --endpoint --requests 2000
+
+Compares four configurations: logging off (WARNING), the previous setup
+(text records written by a FileHandler and a StreamHandler on the calling
+thread), the queued JSON pipeline, and the queued pipeline sampling 10% of
+requests. For each it times one INFO call on the calling thread, which is
+what a request handler pays (wall time includes draining the queue, so on a
+single CPU it also counts the listener's work competing for the core).
+With --endpoint it also serves cached
+/api/ai-diagnoses requests in-process from concurrent clients; that path
+logs several INFO lines per request, and the p50/p99 difference from the
+"off" run is the per-request cost of logging. The console stream goes to
+/dev/null and the log file to a temporary directory, so a real terminal or
+slow disk only makes the synchronous numbers worse.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.logs import REQUEST_ID, TEXT_FORMAT, configure_logging
+from benchmarks.health_under_load import make_fundus_jpeg
+
+
+def _reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def install(case: str, log_dir: str, devnull):
+    """Configure the root logger for ``case``; returns the pipeline to stop, if any"""
+    _reset_root()
+    handlers = [logging.FileHandler(os.path.join(log_dir, f"{case}.log"), encoding="utf-8"),
+                logging.StreamHandler(devnull)]
+    if case == "off":
+        logging.getLogger().addHandler(logging.NullHandler())
+        logging.getLogger().setLevel(logging.WARNING)
+        return None
+    if case == "sync_text":
+        logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT, handlers=handlers)
+        return None
+    sample_rate = 0.1 if case == "queue_json_sampled" else 1.0
+    return configure_logging(handlers, log_format="json", sample_rate=sample_rate, sample_above_per_second=0)
+
+
+def per_call_us(calls: int, pipeline) -> tuple:
+    """``(wall, calling thread CPU)`` microseconds per INFO call, including the queue drain"""
+    logger = logging.getLogger("app.main")
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    for i in range(calls):
+        # Five lines per request, as a diagnosis logs
+        request_id = f"{i // 5:08x}"
+        token = REQUEST_ID.set(request_id)
+        logger.info(f"[{request_id}] Fetching image {i} - {i * 0.5:.2f}ms - 200")
+        REQUEST_ID.reset(token)
+    cpu = time.thread_time() - cpu_start
+    if pipeline is not None:
+        pipeline.stop()
+    return (time.perf_counter() - start) / calls * 1e6, cpu / calls * 1e6
+
+
+async def serve_requests(server, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    image = make_fundus_jpeg(512)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def post() -> float:
+            start = time.perf_counter()
+            response = await client.post("/api/ai-diagnoses", files={"file": ("a.jpg", image, "image/jpeg")})
+            response.raise_for_status()
+            return (time.perf_counter() - start) * 1000
+
+        await post()  # fills the result cache
+        latencies = []
+        for start in range(0, requests, concurrency):
+            latencies += await asyncio.gather(*(post() for _ in range(min(concurrency, requests - start))))
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+async def run_endpoint(server, cases: list, log_dir: str, devnull, args) -> dict:
+    results = {}
+    async with server.lifespan(server.app):
+        for case in cases:
+            pipeline = install(case, log_dir, devnull)
+            results[case] = await serve_requests(server, args.requests, args.concurrency)
+            if pipeline is not None:
+                pipeline.stop()
+    return results
+
+
+def main(args):
+    cases = ["off", "sync_text", "queue_json", "queue_json_sampled"]
+    # Keep the app's own logging setup out of the way; every case installs its own
+    logging.basicConfig(handlers=[logging.NullHandler()])
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        calls = {}
+        for case in cases:
+            calls[case] = per_call_us(args.calls, install(case, log_dir, devnull))
+
+        endpoint = {}
+        if args.endpoint:
+            import app.main as server
+
+            server.MODEL_BASE_PATH = args.models
+            server.JOB_STORE_PATH = ""
+            server.INFERENCE_MAX_PENDING = args.concurrency * 2
+            endpoint = asyncio.run(run_endpoint(server, cases, log_dir, devnull, args))
+        _reset_root()
+
+    print(f"{'configuration':<20} {'call wall':>12} {'caller CPU':>12}"
+          + (f" {'request p50':>12} {'request p99':>12}" if endpoint else ""))
+    for case in cases:
+        line = f"{case:<20} {calls[case][0]:>9.2f} us {calls[case][1]:>9.2f} us"
+        if case in endpoint:
+            line += f" {endpoint[case]['p50_ms']:>9.3f} ms {endpoint[case]['p99_ms']:>9.3f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000, help="INFO calls timed per configuration")
+    parser.add_argument("--endpoint", action="store_true", help="Also time cached /api/ai-diagnoses requests")
+    parser.add_argument("--models", default="models", help="Model directory for --endpoint")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    main(parser.parse_args())
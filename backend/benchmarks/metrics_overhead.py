@@ -0,0 +1,61 @@
+# metrics_overhead.py
+"""Per-call cost of the request metrics
+
+Run from backend/:
+
+    python -m benchmarks.metrics_overhead --threads 4
+
+Times Histogram.observe(), stage_timer() and Counter.inc() in a tight loop,
+single-threaded and with several threads contending for the same series.
+A request records roughly ten observations, so per-call costs in the low
+microseconds keep instrumentation far below one percent of an inference.
+"""
+import argparse
+import threading
+import time
+
+from app.metrics import MetricsRegistry, stage_timer
+
+
+def per_call_us(fn, calls: int, threads: int) -> float:
+    def loop():
+        for _ in range(calls):
+            fn()
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (calls * threads) * 1e6
+
+
+def main(args):
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "benchmark", ("stage",))
+    counter = registry.counter("bench_total", "benchmark", ("stage", "source"))
+
+    def timed_block():
+        with stage_timer(histogram, "decode"):
+            pass
+
+    cases = {
+        "Histogram.observe": lambda: histogram.observe(0.004, stage="decode"),
+        "stage_timer": timed_block,
+        "Counter.inc": lambda: counter.inc(stage="decode", source="file"),
+    }
+    for threads in sorted({1, args.threads}):
+        for name, fn in cases.items():
+            print(f"{name:>18} x {threads} threads: {per_call_us(fn, args.calls, threads):.2f} us/call")
+
+    start = time.perf_counter()
+    registry.render()
+    print(f"{'render':>18}: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    main(parser.parse_args())
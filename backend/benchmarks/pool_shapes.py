@@ -0,0 +1,100 @@
+# pool_shapes.py
+"""Benchmark: interpreter pool shapes (interpreters x threads) on this host
+
+Run from backend/:
+
+    python -m benchmarks.pool_shapes --model models/DR/dr_model_int8.tflite
+
+For each shape, one client thread per pooled interpreter checks out an
+interpreter, invokes it on a random input and returns it, for --duration
+seconds. Reports images/sec and mean per-invoke latency so the best
+INTERPRETER_POOL_SIZE / INTERPRETER_NUM_THREADS combination can be chosen.
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.interpreter_pool import InterpreterPool
+from app.runtime import load_interpreter_backend
+
+
+def default_shapes() -> list:
+    cores = os.cpu_count() or 1
+    shapes = []
+    size = 1
+    while size <= cores:
+        shapes.append((size, max(1, cores // size)))
+        size *= 2
+    return shapes
+
+
+def parse_shape(text: str) -> tuple:
+    size, threads = text.lower().split("x")
+    return int(size), int(threads)
+
+
+def random_input(details: dict) -> np.ndarray:
+    shape = details['shape']
+    if details['dtype'] == np.int8:
+        return np.random.randint(-128, 128, size=shape, dtype=np.int8)
+    if details['dtype'] == np.uint8:
+        return np.random.randint(0, 256, size=shape, dtype=np.uint8)
+    return np.random.rand(*shape).astype(details['dtype'])
+
+
+def run_shape(model_path: str, size: int, threads: int, duration: float) -> dict:
+    pool = InterpreterPool("bench", model_path, load_interpreter_backend().interpreter_cls, size=size, num_threads=threads)
+    input_index = pool.input_details[0]['index']
+    sample = random_input(pool.input_details[0])
+
+    for interpreter in pool.interpreters:
+        interpreter.set_tensor(input_index, sample)
+        interpreter.invoke()
+
+    counts = [0] * size
+    latencies = [0.0] * size
+    deadline = time.perf_counter() + duration
+
+    def client(slot: int):
+        while time.perf_counter() < deadline:
+            with pool.checkout() as interpreter:
+                start = time.perf_counter()
+                interpreter.set_tensor(input_index, sample)
+                interpreter.invoke()
+                latencies[slot] += time.perf_counter() - start
+            counts[slot] += 1
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(size)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts)
+    return {
+        "shape": f"{size}x{threads}",
+        "images_per_sec": total / elapsed,
+        "mean_invoke_ms": sum(latencies) / total * 1000 if total else 0.0,
+        "invokes": total,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True, help="Path to a .tflite model")
+    parser.add_argument("--shapes", nargs="*", type=parse_shape,
+                        help="Pool shapes as SIZExTHREADS, e.g. 1x4 2x2 4x1 (default: powers of two up to core count)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"Host cores: {os.cpu_count()}")
+    print(f"{'shape':>8} {'img/s':>10} {'invoke ms':>10} {'invokes':>8}")
+    for size, threads in args.shapes or default_shapes():
+        result = run_shape(args.model, size, threads, args.duration)
+        print(f"{result['shape']:>8} {result['images_per_sec']:>10.1f} "
+              f"{result['mean_invoke_ms']:>10.2f} {result['invokes']:>8}")
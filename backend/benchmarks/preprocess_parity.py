@@ -0,0 +1,140 @@
+# preprocess_parity.py
+"""Accuracy parity and microbenchmark: fast vs reference preprocessing
+
+Run from backend/:
+
+    python -m benchmarks.preprocess_parity --images sample_images --scale 0.003921569 --zero-point -128
+
+Both paths are quantized with the same INT8 input parameters (defaults match
+a [0, 1] input calibrated to the full int8 range) and compared element-wise
+in quantized units. Each path is also timed per image and its peak traced
+allocation reported. Without --images, synthetic fundus-like JPEGs and PNGs
+are generated. Exits non-zero if the mean absolute difference exceeds
+--max-mean-diff, so it can gate changes to the fast path.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from app.main import quantize_input
+from app.preprocessing import (
+    RESAMPLE_FILTERS,
+    preprocess_image_fast,
+    preprocess_image_quantized,
+    quantize_pixels,
+)
+
+
+def synthetic_images(count: int, size: int = 2048) -> list:
+    rng = np.random.default_rng(42)
+    images = []
+    yy, xx = np.mgrid[0:size, 0:size]
+    radius = np.sqrt((xx - size / 2) ** 2 + (yy - size / 2) ** 2) / (size / 2)
+    for i in range(count):
+        disc = np.clip(1.0 - radius, 0, 1) ** rng.uniform(0.5, 1.5)
+        vessels = 0.15 * np.sin(xx / rng.uniform(8, 30)) * np.cos(yy / rng.uniform(8, 30))
+        rgb = np.stack([disc * 210, disc * 100 + vessels * 60, disc * 45], axis=-1)
+        rgb += rng.normal(0, 6, rgb.shape)
+        buffer = io.BytesIO()
+        fmt = "JPEG" if i % 2 == 0 else "PNG"
+        Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(buffer, format=fmt)
+        images.append((f"synthetic_{i}.{fmt.lower()}", buffer.getvalue()))
+    return images
+
+
+def load_images(directory: str, limit: int) -> list:
+    paths = sorted(glob.glob(os.path.join(directory, "*.jpg")) + glob.glob(os.path.join(directory, "*.jpeg"))
+                   + glob.glob(os.path.join(directory, "*.png")))[:limit]
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def reference_path(image_bytes: bytes, scale: float, zero_point: int) -> np.ndarray:
+    image = Image.open(io.BytesIO(image_bytes))
+    return quantize_input(preprocess_image_quantized(image), scale, zero_point)
+
+
+def fast_path(image_bytes: bytes, scale: float, zero_point: int, resample: int) -> np.ndarray:
+    image = Image.open(io.BytesIO(image_bytes))
+    return quantize_pixels(preprocess_image_fast(image, resample=resample), np.int8, scale, zero_point)
+
+
+def measure(fn, repeats: int) -> tuple:
+    """Median wall time in ms and peak traced allocation in bytes"""
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(timings)), peak
+
+
+def main(args) -> int:
+    images = load_images(args.images, args.limit) if args.images else synthetic_images(args.limit)
+    if not images:
+        print("No images found")
+        return 1
+
+    resample = RESAMPLE_FILTERS[args.resample]
+
+    diffs = []
+    ref_times, fast_times, ref_peaks, fast_peaks = [], [], [], []
+    for name, data in images:
+        reference = reference_path(data, args.scale, args.zero_point).astype(np.int16)
+        fast = fast_path(data, args.scale, args.zero_point, resample).astype(np.int16)
+        diff = np.abs(reference - fast)
+        diffs.append(diff)
+
+        ref_ms, ref_peak = measure(lambda: reference_path(data, args.scale, args.zero_point), args.repeats)
+        fast_ms, fast_peak = measure(lambda: fast_path(data, args.scale, args.zero_point, resample), args.repeats)
+        ref_times.append(ref_ms)
+        fast_times.append(fast_ms)
+        ref_peaks.append(ref_peak)
+        fast_peaks.append(fast_peak)
+
+        print(f"{name:>28}: mean|d|={diff.mean():.3f} max|d|={int(diff.max()):>3} "
+              f"ref={ref_ms:7.2f}ms fast={fast_ms:7.2f}ms "
+              f"alloc ref={ref_peak / 1024:8.1f}KiB fast={fast_peak / 1024:8.1f}KiB")
+
+    all_diffs = np.concatenate([d.ravel() for d in diffs])
+    mean_diff = float(all_diffs.mean())
+    print()
+    print(f"Parity (int8 units): mean={mean_diff:.3f} p99={np.percentile(all_diffs, 99):.0f} "
+          f"max={int(all_diffs.max())} within±2={np.mean(all_diffs <= 2) * 100:.2f}%")
+    print(f"Median per-image time: reference={np.median(ref_times):.2f}ms fast={np.median(fast_times):.2f}ms "
+          f"({np.median(ref_times) / np.median(fast_times):.1f}x)")
+    print(f"Median peak allocation: reference={np.median(ref_peaks) / 1024:.1f}KiB "
+          f"fast={np.median(fast_peaks) / 1024:.1f}KiB")
+
+    if mean_diff > args.max_mean_diff:
+        print(f"FAIL: mean difference {mean_diff:.3f} exceeds {args.max_mean_diff}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", help="Directory of .jpg/.png fundus images (default: synthetic)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0 / 255.0)
+    parser.add_argument("--zero-point", type=int, default=-128)
+    parser.add_argument("--resample", choices=sorted(RESAMPLE_FILTERS), default="bilinear")
+    parser.add_argument("--max-mean-diff", type=float, default=2.0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+# quality_gate.py
+"""Image-quality gate: cost per image and verdicts on degraded fundus images
+
+Run from backend/:
+
+    python -m benchmarks.quality_gate
+    python -m benchmarks.quality_gate --images eval --json
+
+Builds fundus-like images and degraded copies of them (Gaussian blur,
+under- and over-exposure, a non-fundus photo-like frame), preprocesses each
+through the serving path, and prints the gate's scores and verdict with
+the default thresholds. The gate runs on the model input array, so its
+cost is timed there, on uint8 (fast preprocessing) and float32 (reference)
+inputs; it has to stay well under 5 ms. With --images every image in the
+directory is scored instead, to calibrate the QUALITY_* limits on real
+data: look at the sharpness and brightness of images clinicians accept.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import quantized_models
+from app.preprocessing import decode_image, preprocess_image_fast
+from app.quality import QualityThresholds, assess_quality
+from benchmarks.health_under_load import make_fundus_jpeg
+from benchmarks.preprocess_parity import synthetic_images
+
+
+def _encode(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def degraded_images(size: int) -> dict:
+    images = {"fundus_noise_texture": make_fundus_jpeg(size)}
+    name, data = next(iter(synthetic_images(1, size=size)))
+    base = Image.open(io.BytesIO(data)).convert("RGB")
+    images["fundus_synthetic"] = _encode(base)
+    for radius in (2, 4, 8):
+        images[f"blur_{radius}px"] = _encode(base.filter(ImageFilter.GaussianBlur(radius * size / 1024)))
+    images["underexposed"] = _encode(Image.eval(base, lambda v: v // 5))
+    images["overexposed"] = _encode(Image.eval(base, lambda v: min(255, v * 16)))
+    rng = np.random.default_rng(0)
+    scene = rng.integers(40, 220, (size // 32, size // 32, 3), dtype=np.uint8)
+    images["non_fundus"] = _encode(Image.fromarray(scene).resize((size, size), Image.BICUBIC))
+    return images
+
+
+def time_gate(pixels: np.ndarray, thresholds: QualityThresholds, iterations: int) -> float:
+    assess_quality(pixels, thresholds)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        assess_quality(pixels, thresholds)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main(args) -> int:
+    thresholds = QualityThresholds()
+    if args.images:
+        images = {}
+        for path in quantized_models.calibration_files(args.images, args.limit):
+            with open(path, "rb") as f:
+                images[path] = f.read()
+    else:
+        images = degraded_images(args.size)
+
+    scores = {}
+    for name, data in images.items():
+        try:
+            pixels = preprocess_image_fast(decode_image(data, (224, 224)))
+        except Exception as e:
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+            continue
+        scores[name] = assess_quality(pixels, thresholds)
+
+    reference = pixels.astype(np.float32) / 255.0
+    timing = {
+        "uint8_ms": round(time_gate(pixels, thresholds, args.iterations), 3),
+        "float32_ms": round(time_gate(reference, thresholds, args.iterations), 3),
+    }
+
+    if args.json:
+        print(json.dumps({"thresholds": vars(thresholds), "timing": timing, "images": scores}, indent=2))
+        return 0
+    print(f"{'image':<28} {'verdict':<28} {'sharpness':>9} {'bright':>7} {'satur':>6} {'fov':>6} {'corners':>7}")
+    for name, quality in scores.items():
+        verdict = "pass" if quality["passed"] else ",".join(quality["reasons"])
+        print(f"{name[-28:]:<28} {verdict:<28} {quality['sharpness']:>9.2f} {quality['brightness']:>7.1f} "
+              f"{quality['saturated_fraction']:>6.3f} {quality['fov_fraction']:>6.3f} "
+              f"{quality['corner_fov_fraction']:>7.3f}")
+    print(f"\ngate cost per 224x224 image: {timing['uint8_ms']:.3f} ms (uint8), {timing['float32_ms']:.3f} ms (float32)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", help="Directory of images to score (synthetic degraded ones when omitted)")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--size", type=int, default=1536, help="Side of the synthetic images")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed gate runs per input type")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sys.exit(main(parser.parse_args()))
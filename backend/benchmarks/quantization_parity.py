@@ -0,0 +1,156 @@
+# quantization_parity.py
+"""Parity of every supported model type against the float model through the serving path
+
+Run from backend/:
+
+    python -m benchmarks.quantization_parity
+    python -m benchmarks.quantization_parity --images sample_images --json
+
+Builds one small two-head Keras model (a 5-way softmax and a single
+sigmoid, so multi-output dequantization is covered too) and converts it to
+float32, float16, int8, uint8-I/O and int16-activation (16x8) TFLite
+files. The same fundus images go through preprocess_image_fast and
+predict_with_tflite_quantized for each file, and every output head is
+compared with the float32 model: max absolute difference and top-1
+agreement of the softmax head. Per-axis dequantization, which the
+converter only emits for weights, is checked against a per-channel loop on
+synthetic parameters. Exits non-zero if any type exceeds its tolerance.
+"""
+import argparse
+import io
+import json
+import sys
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+import app.main as server
+from app.preprocessing import preprocess_image_fast
+from app.quantization import TensorQuantization
+from app.runtime import load_interpreter_backend
+from benchmarks.preprocess_parity import load_images, synthetic_images
+
+# Largest acceptable absolute difference from float32 per converted type
+TOLERANCES = {"float16": 0.01, "int8": 0.08, "uint8": 0.08, "int16x8": 0.02}
+
+
+def build_two_head_model(seed: int = 0) -> tf.keras.Model:
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(224, 224, 3))
+    x = tf.keras.layers.Conv2D(16, 3, strides=2, padding="same", activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(32, 3, strides=2, padding="same", activation="relu")(x)
+    x = tf.keras.layers.Conv2D(64, 3, strides=2, padding="same", activation="relu")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    grade = tf.keras.layers.Dense(5, activation="softmax", name="grade")(x)
+    referable = tf.keras.layers.Dense(1, activation="sigmoid", name="referable")(x)
+    return tf.keras.Model(inputs, [grade, referable])
+
+
+def convert(model: tf.keras.Model, kind: str, calibration: np.ndarray) -> bytes:
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    def representative():
+        for sample in calibration:
+            yield [sample[np.newaxis]]
+
+    if kind == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif kind in ("int8", "uint8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8 if kind == "int8" else tf.uint8
+        converter.inference_output_type = tf.int8 if kind == "int8" else tf.uint8
+    elif kind == "int16x8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.EXPERIMENTAL_TFLITE_BUILTINS_ACTIVATIONS_INT16_WEIGHTS_INT8
+        ]
+        converter.inference_input_type = tf.int16
+        converter.inference_output_type = tf.int16
+    return converter.convert()
+
+
+def run(model_content: bytes, pixels: list) -> tuple:
+    """Outputs of every image through the serving predict path, heads ordered by width"""
+    interpreter = load_interpreter_backend().interpreter_cls(model_content=model_content, num_threads=1)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+    first_input = TensorQuantization.from_details(input_details[0])
+    first_output = TensorQuantization.from_details(output_details[0])
+
+    outputs = server.predict_with_tflite_quantized(
+        interpreter, input_details, output_details, pixels,
+        first_input.scale, first_input.zero_point, first_output.scale, first_output.zero_point
+    )
+    heads = outputs if isinstance(outputs, list) else [outputs]
+    # Converters may order the heads differently; the softmax head is the wider one
+    heads = sorted(heads, key=lambda head: -head.shape[-1])
+    return heads, np.dtype(input_details[0]["dtype"]).name, [np.dtype(d["dtype"]).name for d in output_details]
+
+
+def check_per_axis() -> float:
+    """Vectorized per-axis dequantize/quantize vs a per-channel loop on synthetic parameters"""
+    rng = np.random.default_rng(0)
+    scales = rng.uniform(0.001, 0.05, 8).astype(np.float32)
+    zero_points = rng.integers(-10, 10, 8).astype(np.int32)
+    quantization = TensorQuantization(np.int8, scales, zero_points, axis=1, ndim=2)
+    values = rng.integers(-128, 128, (16, 8)).astype(np.int8)
+
+    expected = np.stack([scales[c] * (values[:, c].astype(np.float32) - zero_points[c]) for c in range(8)], axis=1)
+    dequantized = quantization.dequantize(values)
+    round_trip = quantization.quantize(dequantized)
+    assert np.array_equal(round_trip, values), "per-axis quantize does not invert dequantize"
+    return float(np.max(np.abs(dequantized - expected)))
+
+
+def main(args) -> int:
+    images = load_images(args.images, args.limit) if args.images else synthetic_images(args.limit, size=512)
+    pixels = [preprocess_image_fast(Image.open(io.BytesIO(data))) for _, data in images]
+    calibration = np.concatenate(pixels).astype(np.float32) / 255.0
+
+    model = build_two_head_model()
+    reference, _, _ = run(convert(model, "float32", calibration), pixels)
+
+    results = {"per_axis_max_abs_diff": check_per_axis()}
+    failed = []
+    for kind, tolerance in TOLERANCES.items():
+        heads, input_dtype, output_dtypes = run(convert(model, kind, calibration), pixels)
+        diffs = [float(np.max(np.abs(head - ref))) for head, ref in zip(heads, reference)]
+        agreement = float(np.mean(np.argmax(heads[0], axis=-1) == np.argmax(reference[0], axis=-1)))
+        results[kind] = {
+            "input_dtype": input_dtype,
+            "output_dtypes": output_dtypes,
+            "max_abs_diff": [round(diff, 5) for diff in diffs],
+            "top1_agreement": round(agreement, 3),
+            "tolerance": tolerance,
+        }
+        if max(diffs) > tolerance:
+            failed.append(kind)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(pixels)} images, two output heads; per-axis dequantize max diff "
+              f"{results['per_axis_max_abs_diff']:.2e}")
+        for kind in TOLERANCES:
+            result = results[kind]
+            print(f"{kind:>8}: input {result['input_dtype']:>7}, outputs {'/'.join(result['output_dtypes']):>13}  "
+                  f"max |diff| {', '.join(f'{diff:.4f}' for diff in result['max_abs_diff'])}  "
+                  f"top-1 agreement {result['top1_agreement']:.1%}  (tolerance {result['tolerance']})")
+    if failed:
+        print(f"Exceeded tolerance: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", help="Directory of fundus images (synthetic ones when omitted)")
+    parser.add_argument("--limit", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+# synthetic_models.py
+"""Small stand-in DR and glaucoma models laid out like MODEL_PATH
+
+Run from backend/:
+
+    python -m benchmarks.synthetic_models --output /tmp/netra-models
+
+Builds two small convolutional Keras models with the serving models'
+interface (224x224x3 input with a dynamic batch dimension, a 5-way softmax
+for DR and a single sigmoid for glaucoma), then writes the float TFLite
+file with the same converter call as convert_to_tflite.py and the INT8
+file through quantize_models.quantize_model with synthetic calibration.
+Benchmarks can then run without the proprietary weights.
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from quantized_models import create_representative_dataset, quantize_model
+
+MODEL_FILES = {
+    "DR": ("dr_model.tflite", "dr_model_int8.tflite", 5, "softmax"),
+    "Glaucoma": ("glaucoma_model.tflite", "glaucoma_model_int8.tflite", 1, "sigmoid"),
+}
+
+
+def build_model(outputs: int, activation: str, width: int = 16, seed: int = 0) -> tf.keras.Model:
+    """Conv stem and global pooling head, enough work per invoke to be measurable"""
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(224, 224, 3))
+    x = tf.keras.layers.Conv2D(width, 3, strides=2, padding="same", activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(width * 2, 3, strides=2, padding="same", activation="relu")(x)
+    x = tf.keras.layers.Conv2D(width * 4, 3, strides=2, padding="same", activation="relu")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(inputs, tf.keras.layers.Dense(outputs, activation=activation)(x))
+
+
+def write_model_tree(root: str, int8: bool = True, width: int = 16, calibration_samples: int = 32) -> str:
+    """Write <root>/DR and <root>/Glaucoma with float and (optionally) INT8 models"""
+    for seed, (name, (float_file, int8_file, outputs, activation)) in enumerate(MODEL_FILES.items()):
+        model_dir = os.path.join(root, name)
+        os.makedirs(model_dir, exist_ok=True)
+        model = build_model(outputs, activation, width=width, seed=seed)
+
+        with open(os.path.join(model_dir, float_file), "wb") as f:
+            f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+        if int8:
+            with tempfile.TemporaryDirectory() as scratch:
+                keras_path = os.path.join(scratch, "model.keras")
+                model.save(keras_path)
+                representative = create_representative_dataset(
+                    image_dir=os.path.join(scratch, "no-images"), num_samples=calibration_samples
+                )
+                if not quantize_model(keras_path, os.path.join(model_dir, int8_file), representative):
+                    raise RuntimeError(f"INT8 conversion of synthetic {name} model failed")
+    return root
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--float-only", action="store_true", help="Skip the INT8 files to test the fallback")
+    parser.add_argument("--width", type=int, default=16)
+    args = parser.parse_args()
+    np.random.seed(0)
+    write_model_tree(args.output, int8=not args.float_only, width=args.width)
+    print(f"Synthetic models written to {args.output}")
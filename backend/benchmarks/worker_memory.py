@@ -0,0 +1,77 @@
+# worker_memory.py
+"""Per-worker private vs shared memory with mapped or copied model files
+
+Run from backend/:
+
+    python -m benchmarks.worker_memory --workers 4
+    python -m benchmarks.worker_memory --workers 4 --no-mmap
+
+Starts --workers spawned processes the way uvicorn --workers does, each of
+which loads both models and runs one prediction per pooled interpreter.
+Once every worker is ready they read /proc/self/smaps_rollup at the same
+moment, so pages shared between them are counted as shared. Private memory
+per worker is what each additional worker costs; with MODEL_MMAP the model
+files should show up as shared page cache rather than private heap.
+Linux only.
+"""
+import argparse
+import multiprocessing
+import os
+
+
+def worker(index: int, mmap: bool, barrier, results):
+    os.environ["MODEL_MMAP"] = "1" if mmap else "0"
+    os.environ["ENVIRONMENT"] = "production"
+    import logging
+
+    import numpy as np
+
+    import app.main as server
+    from app.memory import mapped_file_memory, process_memory
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.load_models()
+    dummy = np.zeros((1, 224, 224, 3), dtype=np.uint8)
+    for pool in server.model_pools.values():
+        for interpreter in pool.interpreters:
+            server.predict_with_tflite_quantized(
+                interpreter, pool.input_details, pool.output_details, dummy,
+                pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+            )
+
+    barrier.wait()
+    model_paths = [pool.model_path for pool in server.model_pools.values()]
+    results.put((index, process_memory(), mapped_file_memory(model_paths),
+                 sum(os.path.getsize(path) for path in model_paths)))
+    barrier.wait()
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(i, not args.no_mmap, barrier, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    reports = sorted(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    print(f"{args.workers} workers, model files {'memory-mapped' if not args.no_mmap else 'read into each worker'} "
+          f"({reports[0][3] / 1024 / 1024:.1f}MB on disk)")
+    for index, memory, files, _ in reports:
+        mapped = sum(usage["rss_mb"] for usage in files.values())
+        print(f"  worker {index}: rss {memory['rss_mb']:7.1f}MB  private {memory['private_mb']:7.1f}MB  "
+              f"shared {memory['shared_mb']:7.1f}MB  pss {memory['pss_mb']:7.1f}MB  "
+              f"model mappings {mapped:6.1f}MB")
+    total_pss = sum(memory["pss_mb"] for _, memory, _, _ in reports)
+    mean_private = sum(memory["private_mb"] for _, memory, _, _ in reports) / len(reports)
+    print(f"  total pss {total_pss:.1f}MB, mean private per worker {mean_private:.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-mmap", action="store_true", help="Read model files into each worker instead")
+    main(parser.parse_args())
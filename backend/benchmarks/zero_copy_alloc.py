@@ -0,0 +1,96 @@
+# zero_copy_alloc.py
+"""Bytes allocated per request: reference, LUT + set_tensor, and zero-copy feeding
+
+Run from backend/:
+
+    python -m benchmarks.zero_copy_alloc --model models/DR/dr_model_int8.tflite
+
+Each mode preprocesses the same JPEG and runs one prediction. Peak traced
+allocation above the starting point is recorded separately for
+preprocessing and for feeding + invoke with tracemalloc (numpy reports its
+buffers to it), along with the median time per request.
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+import app.main as server
+from app.interpreter_pool import InterpreterPool
+from app.runtime import load_interpreter_backend
+from app.preprocessing import preprocess_image_fast, preprocess_image_quantized
+
+
+def make_jpeg(size: int = 2048) -> bytes:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def preprocess(image_bytes: bytes, mode: str) -> np.ndarray:
+    image = Image.open(io.BytesIO(image_bytes))
+    if mode == "reference":
+        return preprocess_image_quantized(image)
+    return preprocess_image_fast(image)
+
+
+def feed_and_invoke(pool: InterpreterPool, img_array: np.ndarray, mode: str) -> np.ndarray:
+    server.ZERO_COPY_INPUT = mode == "zero-copy"
+    with pool.checkout() as interpreter:
+        return server.predict_with_tflite_quantized(
+            interpreter, pool.input_details, pool.output_details, img_array,
+            pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+        )
+
+
+def traced(fn) -> tuple:
+    """Result, peak bytes allocated above the starting point, and wall time in ms"""
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    return result, peak - baseline, elapsed
+
+
+def measure(pool: InterpreterPool, image_bytes: bytes, mode: str, repeats: int) -> dict:
+    feed_and_invoke(pool, preprocess(image_bytes, mode), mode)
+
+    tracemalloc.start()
+    samples = []
+    for _ in range(repeats):
+        img_array, preprocess_peak, preprocess_ms = traced(lambda: preprocess(image_bytes, mode))
+        # Bound as a default: the name is deleted below so the next sample starts from a clean baseline
+        _, feed_peak, feed_ms = traced(lambda array=img_array: feed_and_invoke(pool, array, mode))
+        samples.append((preprocess_peak, feed_peak, preprocess_ms + feed_ms))
+        del img_array
+    tracemalloc.stop()
+
+    preprocess_peaks, feed_peaks, timings = zip(*samples)
+    return {
+        "preprocess_bytes": int(np.median(preprocess_peaks)),
+        "feed_bytes": int(np.median(feed_peaks)),
+        "ms": float(np.median(timings)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True, help="Path to a .tflite model")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    pool = InterpreterPool("bench", args.model, load_interpreter_backend().interpreter_cls, size=1, num_threads=4)
+    image_bytes = make_jpeg()
+
+    print(f"{'mode':>12} {'preprocess KiB':>15} {'feed+invoke KiB':>16} {'ms/request':>11}")
+    for mode in ("reference", "set_tensor", "zero-copy"):
+        result = measure(pool, image_bytes, mode, args.repeats)
+        print(f"{mode:>12} {result['preprocess_bytes'] / 1024:>15.1f} "
+              f"{result['feed_bytes'] / 1024:>16.1f} {result['ms']:>11.2f}")
@@ -0,0 +1,380 @@
+# build_variants.py
+"""Build, benchmark and compare TFLite variants of the screening models
+
+For every model this converts a matrix of variants, float32, float16,
+dynamic-range and full INT8 at each requested input resolution, into a
+model version directory, then for each variant measures the file size and
+the median invoke time on this host, and scores it against the float32
+model at its native resolution on a local image set: top-1 agreement,
+mean absolute probability difference and, with --labels, accuracy. The
+results go to ``variants.json`` in the version directory together with
+the selected variant per model: the fastest one whose agreement is at
+least --min-agreement. The server loads that directory like any other
+model version and serves the selected variants, or the ones named by
+MODEL_VARIANT, so the speed/accuracy trade-off is picked from the table.
+
+Reduced resolutions reuse the trained weights on a smaller input, which
+only works for fully convolutional models (global pooling before the
+classifier); the agreement column shows what that costs without
+retraining. Variants that cannot be built are listed as failed.
+
+Run from backend/:
+
+    python build_variants.py --output models/2025-10-01 --eval-images eval --labels eval/labels.csv
+    python build_variants.py --output models/2025-10-01 --kinds float16 int8 --sizes 224 160 --min-agreement 0.98
+
+The labels CSV has a ``path`` column (relative to --eval-images or
+absolute) and one column per model, named like the model (``dr``) or its
+result key, holding a class name or index; blank cells are unlabeled.
+"""
+import argparse
+import csv
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import quantized_models
+from app.preprocessing import RESAMPLE_FILTERS
+from app.quantization import TensorQuantization
+from app.runtime import load_interpreter_backend
+from app.tuning import available_cpus, time_invokes
+from app.variants import VARIANTS_MANIFEST
+
+KINDS = ("float32", "float16", "dynamic", "int8")
+
+# Keras sources of the served models, as quantized_models.py uses them
+DEFAULT_MODELS = {
+    "dr": "models/DR/CLINIC_READY_73_PERCENT_MODEL.h5",
+    "glaucoma": "models/Glaucoma/tpu_glaucoma_final.keras",
+}
+
+# Images scored per interpreter invoke while evaluating
+EVAL_BATCH_SIZE = 16
+
+_server = None
+
+
+def variant_name(kind: str, size: int) -> str:
+    return f"{kind}_{size}"
+
+
+def _resize_input_layers(config, shape: list):
+    """Set the batch shape of every InputLayer in a (possibly nested) model config"""
+    if isinstance(config, dict):
+        if config.get("class_name") == "InputLayer":
+            layer_config = config["config"]
+            layer_config["batch_shape" if "batch_shape" in layer_config else "batch_input_shape"] = shape
+        for value in config.values():
+            _resize_input_layers(value, shape)
+    elif isinstance(config, list):
+        for value in config:
+            _resize_input_layers(value, shape)
+
+
+def with_input_size(model, size: int):
+    """``model`` rebuilt on a ``size`` x ``size`` input with the same weights; raises if it cannot take it"""
+    height, width, channels = model.input_shape[1:4]
+    if (height, width) == (size, size):
+        return model
+    config = model.get_config()
+    _resize_input_layers(config, [None, size, size, channels])
+    resized = model.__class__.from_config(config)
+    resized.set_weights(model.get_weights())
+    return resized
+
+
+def convert(model, kind: str, representative_dataset=None) -> bytes:
+    """TFLite flatbuffer of ``model`` as one of KINDS"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if kind == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif kind == "dynamic":
+        # Weights stored as int8, activations stay float: no calibration needed
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif kind == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif kind != "float32":
+        raise ValueError(f"Unknown variant kind {kind} (expected one of {', '.join(KINDS)})")
+    return converter.convert()
+
+
+def read_labels(labels_path: str, eval_dir: str, specs: tuple) -> dict:
+    """``{image path: {model name: class index}}`` from a labels CSV"""
+    labels = {}
+    with open(labels_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            path = row["path"] if os.path.isabs(row["path"]) else os.path.join(eval_dir, row["path"])
+            image_labels = {}
+            for spec in specs:
+                value = (row.get(spec.name) or row.get(spec.result_key) or "").strip()
+                if not value:
+                    continue
+                names = [name.lower() for name in spec.classes]
+                image_labels[spec.name] = int(value) if value.isdigit() else names.index(value.lower())
+            labels[path] = image_labels
+    return labels
+
+
+class EvalSet:
+    """Evaluation images, preprocessed through the serving path once per input size"""
+
+    def __init__(self, paths: list):
+        self.paths, self._images = [], []
+        self._arrays = {}
+        for path in paths:
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+            try:
+                _server.decode_and_preprocess(image_bytes)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            self.paths.append(path)
+            self._images.append(image_bytes)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def arrays(self, size: int) -> list:
+        if size not in self._arrays:
+            self._arrays[size] = [_server.decode_and_preprocess(image_bytes, (size, size))
+                                  for image_bytes in self._images]
+        return self._arrays[size]
+
+
+def evaluate(model_path: str, spec, size: int, eval_set: EvalSet, threads: int, runs: int) -> dict:
+    """Median invoke time and per-image predictions of one variant through the serving predict path"""
+    interpreter = load_interpreter_backend().interpreter_cls(model_path=model_path, num_threads=threads)
+    interpreter.allocate_tensors()
+    invoke_ms = time_invokes(interpreter, runs) * 1000
+
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+    first_input = TensorQuantization.from_details(input_details[0])
+    first_output = TensorQuantization.from_details(output_details[0])
+
+    images = eval_set.arrays(size)
+    indices, probabilities = [], []
+    for start in range(0, len(images), EVAL_BATCH_SIZE):
+        batch = images[start:start + EVAL_BATCH_SIZE]
+        predictions = _server.predict_with_tflite_quantized(
+            interpreter, input_details, output_details, batch,
+            first_input.scale, first_input.zero_point, first_output.scale, first_output.zero_point
+        )
+        for i in range(len(batch)):
+            row = _server.image_row(predictions, i)
+            head = row[0] if isinstance(row, list) else row
+            probs = spec.postprocess(head) if spec.postprocess else head.tolist()
+            indices.append(int(np.argmax(probs)))
+            probabilities.append(probs)
+    return {
+        "invoke_ms": round(invoke_ms, 3),
+        "indices": np.array(indices),
+        "probabilities": np.array(probabilities, dtype=np.float64),
+    }
+
+
+def compare(measured: dict, reference: dict, labels: list) -> dict:
+    """Agreement with the reference variant and, where labeled, accuracy"""
+    scores = {
+        "agreement": round(float(np.mean(measured["indices"] == reference["indices"])), 4),
+        "mean_abs_diff": round(float(np.mean(np.abs(measured["probabilities"] - reference["probabilities"]))), 5),
+    }
+    labeled = [(i, label) for i, label in enumerate(labels) if label is not None]
+    if labeled:
+        scores["accuracy"] = round(float(np.mean([measured["indices"][i] == label for i, label in labeled])), 4)
+        scores["labeled_images"] = len(labeled)
+    return scores
+
+
+def select_variant(variants: dict, reference: str, min_agreement: float) -> str:
+    """Fastest variant that agrees with the reference on at least ``min_agreement`` of the images"""
+    eligible = [name for name, variant in variants.items() if variant["agreement"] >= min_agreement]
+    if not eligible:
+        return reference
+    return min(eligible, key=lambda name: variants[name]["invoke_ms"])
+
+
+def build_model(spec, source: str, args, eval_set: EvalSet, labels: dict) -> dict:
+    """Convert, benchmark and score every variant of one model; returns its manifest entry"""
+    print(f"\n📦 {spec.name}: loading {source}...")
+    model = tf.keras.models.load_model(source)
+    native_size = int(model.input_shape[1])
+    sizes = sorted(set(args.sizes) | {native_size}, reverse=True)
+    reference_name = variant_name("float32", native_size)
+    kinds = list(dict.fromkeys(["float32"] + list(args.kinds)))
+
+    model_dir = os.path.join(args.output, spec.directory)
+    os.makedirs(model_dir, exist_ok=True)
+    image_labels = [labels.get(path, {}).get(spec.name) for path in eval_set.paths]
+
+    measured, variants, failed = {}, {}, {}
+    for size in sizes:
+        try:
+            sized_model = with_input_size(model, size)
+        except Exception as e:
+            for kind in kinds:
+                failed[variant_name(kind, size)] = f"input size {size} not supported: {e}"
+            print(f"⚠️  {spec.name} cannot run at {size}x{size}: {e}")
+            continue
+
+        for kind in kinds:
+            name = variant_name(kind, size)
+            if kind == "float32" and "float32" not in args.kinds and name != reference_name:
+                continue
+            dataset = None
+            if kind == "int8":
+                dataset = quantized_models.create_representative_dataset(
+                    args.calibration_images, args.num_samples, args.cache_dir, args.preprocess_mode,
+                    args.resample, args.workers, target_size=(size, size)
+                )
+            start = time.perf_counter()
+            try:
+                flatbuffer = convert(sized_model, kind, dataset)
+            except Exception as e:
+                failed[name] = f"conversion failed: {e}"
+                print(f"❌ {spec.name} {name}: {e}")
+                continue
+            convert_s = time.perf_counter() - start
+
+            file = os.path.join(spec.directory, f"{spec.name}_{name}.tflite")
+            path = os.path.join(args.output, file)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(flatbuffer)
+            os.replace(f"{path}.tmp", path)
+
+            measured[name] = evaluate(path, spec, size, eval_set, args.threads, args.runs)
+            variants[name] = {
+                "kind": kind,
+                "input_size": [size, size],
+                "file": file,
+                "size_bytes": len(flatbuffer),
+                "invoke_ms": measured[name]["invoke_ms"],
+                "convert_s": round(convert_s, 1),
+            }
+
+    if reference_name not in measured:
+        raise RuntimeError(f"{spec.name}: float32 reference at {native_size}x{native_size} could not be built")
+    for name, variant in variants.items():
+        variant.update(compare(measured[name], measured[reference_name], image_labels))
+
+    selected = select_variant(variants, reference_name, args.min_agreement)
+    print_table(spec.name, variants, failed, selected)
+    return {
+        "source": source,
+        "reference": reference_name,
+        "selected": selected,
+        "variants": variants,
+        "failed": failed,
+    }
+
+
+def print_table(model: str, variants: dict, failed: dict, selected: str):
+    print(f"\n{model}: {'variant':<14} {'size KB':>9} {'invoke ms':>10} {'agreement':>10} {'mean diff':>10} "
+          f"{'accuracy':>9}")
+    for name, variant in sorted(variants.items(), key=lambda item: item[1]["invoke_ms"]):
+        accuracy = f"{variant['accuracy']:.1%}" if "accuracy" in variant else "-"
+        marker = " <- selected" if name == selected else ""
+        print(f"{'':<{len(model) + 2}}{name:<14} {variant['size_bytes'] / 1024:>9.0f} {variant['invoke_ms']:>10.2f} "
+              f"{variant['agreement']:>10.1%} {variant['mean_abs_diff']:>10.4f} {accuracy:>9}{marker}")
+    errors = {}
+    for name, error in failed.items():
+        errors.setdefault(error, []).append(name)
+    for error, names in errors.items():
+        print(f"{'':<{len(model) + 2}}{', '.join(names)} failed: {error}")
+
+
+def main(args) -> int:
+    global _server
+    logging.basicConfig(level=logging.WARNING)
+    import app.main as server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.PREPROCESS_MODE = args.preprocess_mode
+    server.PREPROCESS_RESAMPLE = RESAMPLE_FILTERS[args.resample]
+    _server = server
+
+    specs = {spec.name: spec for spec in server.MODEL_SPECS}
+    sources = dict(DEFAULT_MODELS)
+    for item in args.model or []:
+        name, path = item.split("=", 1)
+        sources[name.strip().lower()] = path
+    unknown = set(sources) - set(specs)
+    if unknown:
+        print(f"Unknown model {', '.join(sorted(unknown))} (available: {', '.join(specs)})", file=sys.stderr)
+        return 2
+
+    eval_dir = args.eval_images or args.calibration_images
+    labels = read_labels(args.labels, eval_dir, server.MODEL_SPECS) if args.labels else {}
+    eval_paths = sorted(labels) if labels else quantized_models.calibration_files(eval_dir, args.eval_limit)
+    eval_set = EvalSet(eval_paths[:args.eval_limit])
+    if not len(eval_set):
+        print(f"No evaluation images in {eval_dir}", file=sys.stderr)
+        return 2
+    print(f"Evaluating on {len(eval_set)} images from {eval_dir}{' (labeled)' if labels else ''}")
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = {
+        "format": 1,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "host": {
+            "machine": platform.machine(),
+            "cpus": available_cpus(),
+            "threads": args.threads,
+            "interpreter_backend": load_interpreter_backend().snapshot(),
+        },
+        "preprocess": {"mode": args.preprocess_mode, "resample": args.resample},
+        "evaluation": {"images": len(eval_set), "labeled": bool(labels), "min_agreement": args.min_agreement},
+        "models": {},
+    }
+    for name, source in sources.items():
+        if not os.path.exists(source):
+            print(f"⚠️  Model file not found: {source}")
+            continue
+        manifest["models"][name] = build_model(specs[name], source, args, eval_set, labels)
+
+    if not manifest["models"]:
+        print("❌ No models were built", file=sys.stderr)
+        return 1
+
+    manifest_path = os.path.join(args.output, VARIANTS_MANIFEST)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    print(f"\n✅ Manifest written to {manifest_path}; serve it as model version {os.path.basename(args.output.rstrip('/'))}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True, help="Model version directory to write variants into")
+    parser.add_argument("--model", action="append", help="NAME=PATH of a Keras model (default: the served models)")
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[224, 192, 160], help="Square input resolutions")
+    parser.add_argument("--calibration-images", default="sample_images", help="INT8 calibration images")
+    parser.add_argument("--num-samples", type=int, default=100, help="Calibration images per INT8 variant")
+    parser.add_argument("--cache-dir", default=".calibration_cache")
+    parser.add_argument("--eval-images", help="Evaluation images (default: the calibration images)")
+    parser.add_argument("--eval-limit", type=int, default=500)
+    parser.add_argument("--labels", help="CSV of evaluation labels (see above)")
+    parser.add_argument("--preprocess-mode", default=os.getenv("PREPROCESS_MODE", "fast"), choices=("fast", "reference"))
+    parser.add_argument("--resample", default=os.getenv("PREPROCESS_RESAMPLE", "bilinear").lower(),
+                        choices=sorted(RESAMPLE_FILTERS))
+    parser.add_argument("--workers", type=int, default=None, help="Calibration preprocessing threads")
+    parser.add_argument("--threads", type=int, default=1, help="Interpreter threads while timing")
+    parser.add_argument("--runs", type=int, default=20, help="Timed invokes per variant")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Least top-1 agreement with the float32 reference for a variant to be selected")
+    sys.exit(main(parser.parse_args()))
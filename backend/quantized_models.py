@@ -1,36 +1,166 @@
 # quantize_models.py
 import tensorflow as tf
 import numpy as np
-from PIL import Image
+import argparse
+import concurrent.futures
+import hashlib
+import json
 import os
 import glob
+import time
+
+from app.preprocessing import (
+    RESAMPLE_FILTERS,
+    TARGET_SIZE,
+    decode_image,
+    preprocess_image_fast,
+    preprocess_image_quantized,
+)
+from app.tuning import available_cpus
+
+CALIBRATION_EXTENSIONS = ("*.jpg", "*.jpeg", "*.png")
+
+# Bump when the cache layout or the way pixels are produced changes
+CALIBRATION_CACHE_FORMAT = 1
+
+
+def serving_pixels(image_bytes, preprocess_mode="fast", resample="bilinear", target_size=TARGET_SIZE):
+    """uint8 pixels (H, W, 3) of one image through exactly the serving decode and preprocessing
+
+    Mirrors ``decode_and_preprocess`` in app/main.py for PREPROCESS_MODE and
+    PREPROCESS_RESAMPLE. The reference path returns ``pixels / 255`` as
+    float32, which maps back to the same uint8 values without loss, so both
+    modes are cached as uint8 and the model sees identical float inputs.
+    """
+    image = decode_image(image_bytes, None if preprocess_mode == "reference" else target_size)
+    if preprocess_mode == "reference":
+        normalized = preprocess_image_quantized(image, target_size)[0]
+        return np.rint(normalized * 255.0).astype(np.uint8)
+    return preprocess_image_fast(image, target_size, resample=RESAMPLE_FILTERS[resample])[0]
+
+
+def calibration_files(image_dir, num_samples):
+    files = []
+    for pattern in CALIBRATION_EXTENSIONS:
+        files += glob.glob(os.path.join(image_dir, pattern))
+    return sorted(files)[:num_samples]
+
+
+def calibration_cache_key(image_files, preprocess_mode, resample, target_size=TARGET_SIZE):
+    """Digest of the images (path, size, mtime) and the transform applied to them"""
+    digest = hashlib.sha256(json.dumps({
+        "format": CALIBRATION_CACHE_FORMAT,
+        "target_size": list(target_size),
+        "preprocess_mode": preprocess_mode,
+        "resample": resample if preprocess_mode != "reference" else "lanczos",
+    }, sort_keys=True).encode())
+    for path in image_files:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _preprocess_into(cache, index, img_path, preprocess_mode, resample, target_size):
+    """Decode one calibration image straight into its row of the cache"""
+    with open(img_path, "rb") as f:
+        image_bytes = f.read()
+    cache[index] = serving_pixels(image_bytes, preprocess_mode, resample, target_size)
+
+
+def build_calibration_cache(image_dir="sample_images", num_samples=100, cache_dir=".calibration_cache",
+                            preprocess_mode="fast", resample="bilinear", workers=None, target_size=TARGET_SIZE):
+    """Preprocessed calibration tensors as a read-only memory-mapped ``(N, H, W, 3)`` uint8 array
+
+    Images are decoded and preprocessed once, in parallel (PIL releases the
+    GIL while decoding and resizing), each worker writing its row of a
+    ``.npy`` file in ``cache_dir``. The file is named by a digest of the
+    image list and the transform, so later runs (another model, or the same
+    model after retraining) reuse it and only pay for reading it back.
+    Returns None when ``image_dir`` has no images.
+    """
+    image_files = calibration_files(image_dir, num_samples)
+    if not image_files:
+        return None
+
+    key = calibration_cache_key(image_files, preprocess_mode, resample, target_size)
+    cache_path = os.path.join(cache_dir, f"calibration_{key}.npy")
+    if os.path.exists(cache_path):
+        cache = np.load(cache_path, mmap_mode="r")
+        print(f"Using {len(cache)} cached calibration tensors from {cache_path}")
+        return cache
+
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    partial_path = f"{cache_path}.{os.getpid()}.partial.npy"
+    shape = (len(image_files), target_size[0], target_size[1], 3)
+    cache = np.lib.format.open_memmap(partial_path, mode="w+", dtype=np.uint8, shape=shape)
+
+    workers = workers or available_cpus()
+    valid = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_preprocess_into, cache, index, img_path, preprocess_mode, resample, target_size): index
+            for index, img_path in enumerate(image_files)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            try:
+                future.result()
+                valid.append(index)
+            except Exception as e:
+                print(f"Error processing {image_files[index]}: {e}")
+
+    if not valid:
+        del cache
+        os.remove(partial_path)
+        return None
+
+    valid.sort()
+    if len(valid) < len(image_files):
+        # Compact the rows of images that could not be decoded out of the file
+        compact_path = f"{cache_path}.{os.getpid()}.compact.npy"
+        compact = np.lib.format.open_memmap(compact_path, mode="w+", dtype=np.uint8,
+                                            shape=(len(valid),) + shape[1:])
+        for row, index in enumerate(valid):
+            compact[row] = cache[index]
+        compact.flush()
+        del compact, cache
+        os.remove(partial_path)
+        partial_path = compact_path
+    else:
+        cache.flush()
+        del cache
+    os.replace(partial_path, cache_path)
+
+    print(f"Preprocessed {len(valid)}/{len(image_files)} calibration images with {workers} workers "
+          f"in {time.perf_counter() - start:.1f}s ({preprocess_mode}), cached at {cache_path}")
+    return np.load(cache_path, mmap_mode="r")
+
+
+def create_representative_dataset(image_dir="sample_images", num_samples=100, cache_dir=".calibration_cache",
+                                  preprocess_mode="fast", resample="bilinear", workers=None, target_size=TARGET_SIZE):
+    """Create representative dataset for quantization calibration
+
+    Builds (or reuses) the calibration cache once; the returned generator
+    function can be handed to any number of converters and streams one
+    sample at a time from the memory-mapped file, normalized to [0, 1] as
+    the serving path does, so the dataset is never held in memory as float32.
+    """
+    cache = build_calibration_cache(image_dir, num_samples, cache_dir, preprocess_mode, resample, workers,
+                                    target_size)
 
-def create_representative_dataset(image_dir="sample_images", num_samples=100):
-    """Create representative dataset for quantization calibration"""
     def representative_data_gen():
-        # Get sample images from your training data or similar medical images
-        image_files = glob.glob(os.path.join(image_dir, "*.jpg")) + \
-                     glob.glob(os.path.join(image_dir, "*.png"))
-        
         # If no images available, create synthetic data
-        if not image_files:
+        if cache is None:
             print("No sample images found, using synthetic data for calibration")
             for _ in range(num_samples):
                 # Generate random data that matches your input distribution
-                synthetic_data = np.random.rand(224, 224, 3).astype(np.float32)
+                synthetic_data = np.random.rand(target_size[0], target_size[1], 3).astype(np.float32)
                 yield [np.expand_dims(synthetic_data, axis=0)]
         else:
-            print(f"Using {min(len(image_files), num_samples)} sample images for calibration")
-            for i, img_path in enumerate(image_files[:num_samples]):
-                try:
-                    img = Image.open(img_path)
-                    img = img.convert('RGB')
-                    img = img.resize((224, 224))
-                    img_array = np.array(img, dtype=np.float32) / 255.0
-                    yield [np.expand_dims(img_array, axis=0)]
-                except Exception as e:
-                    print(f"Error processing {img_path}: {e}")
-                    continue
+            print(f"Using {len(cache)} sample images for calibration")
+            for i in range(len(cache)):
+                yield [cache[i:i + 1].astype(np.float32) / 255.0]
     
     return representative_data_gen
 
@@ -85,10 +215,24 @@ def quantize_model(model_path, output_path, representative_dataset):
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the screening models to INT8 TFLite")
+    parser.add_argument("--images", default="sample_images", help="Directory of calibration images")
+    parser.add_argument("--num-samples", type=int, default=100)
+    parser.add_argument("--cache-dir", default=".calibration_cache",
+                        help="Where preprocessed calibration tensors are cached between runs")
+    parser.add_argument("--preprocess-mode", default=os.getenv("PREPROCESS_MODE", "fast"),
+                        choices=("fast", "reference"), help="Serving preprocessing to calibrate with")
+    parser.add_argument("--resample", default=os.getenv("PREPROCESS_RESAMPLE", "bilinear").lower(),
+                        choices=sorted(RESAMPLE_FILTERS), help="Resize filter of the fast preprocessing")
+    parser.add_argument("--workers", type=int, default=None, help="Preprocessing threads (default: all CPUs)")
+    args = parser.parse_args()
+
     print("🚀 Starting model quantization...")
     
-    # Create representative dataset
-    representative_dataset = create_representative_dataset()
+    # Create representative dataset once; every model below streams it from the cache
+    representative_dataset = create_representative_dataset(
+        args.images, args.num_samples, args.cache_dir, args.preprocess_mode, args.resample, args.workers
+    )
     
     models_to_quantize = [
         {
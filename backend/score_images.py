@@ -0,0 +1,270 @@
+# score_images.py
+"""Offline bulk scoring of retinal images with the serving models
+
+Walks a directory (or reads a manifest of paths), shards the images across
+a pool of worker processes that each load their own interpreter for every
+served model, and appends results to a CSV file or a Parquet directory as
+chunks finish. Re-running with the same output skips images that already
+have a result, so an interrupted run resumes where it stopped; images that
+failed are scored again, and their new row follows the failed one.
+
+Run from backend/ so MODEL_PATH resolves as it does for the server:
+
+    python score_images.py /data/fundus --output scores.csv --processes 4 --threads 1
+    python score_images.py --manifest images.txt --output scores_parquet --format parquet
+"""
+import argparse
+import csv
+import glob
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+_server = None
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def result_columns(specs: tuple) -> list:
+    columns = ["path"]
+    for spec in specs:
+        columns += [f"{spec.name}_prediction", f"{spec.name}_confidence", f"{spec.name}_severity_level"]
+        columns += [f"{spec.name}_prob_{_slug(name)}" for name in spec.classes]
+    columns.append("error")
+    return columns
+
+
+def result_schema(columns: list):
+    """Arrow schema for ``result_columns``, so every Parquet part has the same column types"""
+    import pyarrow as pa
+    fields = []
+    for column in columns:
+        if column.endswith("_confidence") or "_prob_" in column:
+            fields.append(pa.field(column, pa.float64()))
+        elif column.endswith("_severity_level"):
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _flatten(path: str, results: dict) -> dict:
+    row = {"path": path, "error": ""}
+    for prefix, result in results.items():
+        row[f"{prefix}_prediction"] = result["prediction"]
+        row[f"{prefix}_confidence"] = result["confidence"]
+        row[f"{prefix}_severity_level"] = result["severity_level"]
+        for name, probability in result["probabilities"].items():
+            row[f"{prefix}_prob_{_slug(name)}"] = probability
+    return row
+
+
+def _init_worker(threads: int):
+    """Load one interpreter per model in this worker process"""
+    global _server
+    logging.basicConfig(level=logging.WARNING)
+    import app.main as server
+
+    server.INTERPRETER_POOL_SIZE = 1
+    server.INTERPRETER_NUM_THREADS = threads
+    server.load_models()
+    _server = server
+
+
+def _read_image(path: str) -> bytes:
+    if os.path.getsize(path) > _server.MAX_IMAGE_SIZE:
+        raise ValueError(f"File too large: {os.path.getsize(path)} bytes")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _predict(pool, images: list):
+    with pool.checkout() as interpreter:
+        return _server.predict_with_tflite_quantized(
+            interpreter, pool.input_details, pool.output_details, images,
+            pool.input_scale, pool.input_zero_point, pool.output_scale, pool.output_zero_point
+        )
+
+
+def _score_chunk(paths: list) -> list:
+    """Preprocess a chunk of images and score them as one batch per model"""
+    sizes = {spec.name: _server.model_pools[spec.name].input_size for spec in _server.MODEL_SPECS}
+    rows, images, scored_paths = [], [], []
+    for path in paths:
+        try:
+            arrays = _server.preprocess_sizes(_read_image(path), sizes.values())
+            images.append({name: arrays[size] for name, size in sizes.items()})
+            scored_paths.append(path)
+        except Exception as e:
+            rows.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+
+    if not images:
+        return rows
+
+    try:
+        preds = {spec.name: _predict(_server.model_pools[spec.name], [image[spec.name] for image in images])
+                 for spec in _server.MODEL_SPECS}
+    except Exception as e:
+        return rows + [{"path": path, "error": f"{type(e).__name__}: {e}"} for path in scored_paths]
+
+    for i, path in enumerate(scored_paths):
+        rows.append(_flatten(path, {spec.name: spec.format_result(_server.image_row(preds[spec.name], i))
+                                    for spec in _server.MODEL_SPECS}))
+    return rows
+
+
+def discover_images(root: str) -> list:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+def read_manifest(manifest: str) -> list:
+    """One path per line, or a CSV file with a 'path' column"""
+    with open(manifest, "r", encoding="utf-8") as f:
+        if manifest.endswith(".csv"):
+            return [row["path"] for row in csv.DictReader(f) if row.get("path")]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class CsvResultWriter:
+    """Appends rows to a CSV file, flushing after every chunk"""
+
+    def __init__(self, path: str, columns: list):
+        self.path = path
+        self.columns = columns
+
+    def completed_paths(self) -> set:
+        """Paths with a result; failed rows do not count, so they are retried"""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            return {row["path"] for row in csv.DictReader(f) if not row.get("error")}
+
+    def __enter__(self):
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+        if is_new:
+            self._writer.writeheader()
+        return self
+
+    def write(self, rows: list):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes each chunk as a new part file in an output directory"""
+
+    def __init__(self, path: str, columns: list):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.columns = columns
+        self.schema = result_schema(columns)
+
+    def _parts(self) -> list:
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def completed_paths(self) -> set:
+        """Paths with a result; failed rows do not count, so they are retried"""
+        import pyarrow.parquet as pq
+        completed = set()
+        for part in self._parts():
+            table = pq.read_table(part, columns=["path", "error"])
+            completed.update(path for path, error in zip(table.column("path").to_pylist(),
+                                                         table.column("error").to_pylist()) if not error)
+        return completed
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._next_part = len(self._parts())
+        return self
+
+    def write(self, rows: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist([{col: row.get(col) for col in self.columns} for row in rows],
+                                     schema=self.schema)
+        part = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        pq.write_table(table, f"{part}.tmp")
+        os.replace(f"{part}.tmp", part)
+        self._next_part += 1
+
+    def __exit__(self, *exc):
+        pass
+
+
+def main(args) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    from app.main import MODEL_SPECS
+
+    if args.manifest:
+        paths = read_manifest(args.manifest)
+    elif args.input:
+        paths = discover_images(args.input)
+    else:
+        print("Provide an input directory or --manifest")
+        return 1
+
+    output_format = args.format or ("parquet" if not args.output.endswith(".csv") else "csv")
+    writer_cls = ParquetResultWriter if output_format == "parquet" else CsvResultWriter
+    writer = writer_cls(args.output, result_columns(MODEL_SPECS))
+
+    completed = writer.completed_paths()
+    pending = [path for path in paths if path not in completed]
+    print(f"{len(paths)} images, {len(completed)} already scored, {len(pending)} to go "
+          f"({args.processes} processes x {args.threads} threads, chunks of {args.chunk_size})")
+    if not pending:
+        return 0
+
+    chunks = [pending[i:i + args.chunk_size] for i in range(0, len(pending), args.chunk_size)]
+    context = multiprocessing.get_context("spawn")
+    scored = failed = 0
+    start = last_report = time.perf_counter()
+
+    with writer, context.Pool(args.processes, initializer=_init_worker, initargs=(args.threads,)) as pool:
+        for rows in pool.imap_unordered(_score_chunk, chunks):
+            writer.write(rows)
+            scored += len(rows)
+            failed += sum(1 for row in rows if row.get("error"))
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every or scored == len(pending):
+                elapsed = now - start
+                print(f"  {scored}/{len(pending)} scored ({failed} failed) - {scored / elapsed:.1f} images/sec")
+                last_report = now
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {scored} images in {elapsed:.1f}s ({scored / elapsed:.1f} images/sec), "
+          f"{failed} failed -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-score retinal images with the DR and glaucoma models")
+    parser.add_argument("input", nargs="?", help="Directory of images, searched recursively")
+    parser.add_argument("--manifest", help="Text file of image paths, or CSV with a 'path' column")
+    parser.add_argument("--output", required=True, help="Output .csv file or Parquet directory")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Default: csv if --output ends in .csv")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="Interpreter threads per process")
+    parser.add_argument("--chunk-size", type=int, default=8, help="Images per batched invoke")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between progress lines")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def echo_batch(arrays: list) -> np.ndarray:
+    """One row per image holding the image's first value"""
+    return np.array([[float(array.reshape(-1)[0])] for array in arrays], dtype=np.float32)
+
+
+def image(value: float) -> np.ndarray:
+    return np.full((1, 2, 2, 3), value, dtype=np.float32)
+
+
+@pytest.fixture
+def batcher():
+    batchers = []
+
+    def start(predict_fn=echo_batch, **kwargs):
+        instance = MicroBatcher("test", predict_fn, **kwargs)
+        instance.start()
+        batchers.append(instance)
+        return instance
+
+    yield start
+    for instance in batchers:
+        instance.stop()
+
+
+def test_concurrent_images_share_a_batch(batcher):
+    instance = batcher(max_batch_size=4, max_wait_ms=200)
+    futures = [instance.submit(image(value)) for value in range(4)]
+
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [float(rows[0, 0]) for rows, _ in results] == [0.0, 1.0, 2.0, 3.0]
+    assert all(info["batch_size"] == 4 for _, info in results)
+
+
+def test_cancelled_waiter_does_not_stop_the_batcher(batcher):
+    instance = batcher(max_batch_size=8, max_wait_ms=100)
+
+    async def run():
+        abandoned = asyncio.ensure_future(asyncio.wrap_future(instance.submit(image(1))))
+        kept = asyncio.wrap_future(instance.submit(image(2)))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        rows, _ = await asyncio.wait_for(kept, 5)
+        later, _ = await asyncio.wait_for(asyncio.wrap_future(instance.submit(image(3))), 5)
+        return float(rows[0, 0]), float(later[0, 0])
+
+    assert asyncio.run(run()) == (2.0, 3.0)
+
+
+def test_waiter_cancelled_during_invoke_does_not_stop_the_batcher(batcher):
+    invoking, release = threading.Event(), threading.Event()
+
+    def slow_predict(arrays):
+        invoking.set()
+        release.wait(5)
+        return echo_batch(arrays)
+
+    instance = batcher(slow_predict, max_batch_size=1, max_wait_ms=0)
+
+    async def run():
+        abandoned = asyncio.ensure_future(asyncio.wrap_future(instance.submit(image(1))))
+        await asyncio.to_thread(invoking.wait, 5)
+        abandoned.cancel()
+        release.set()
+        rows, _ = await asyncio.wait_for(asyncio.wrap_future(instance.submit(image(2))), 5)
+        return float(rows[0, 0])
+
+    assert asyncio.run(run()) == 2.0
+
+
+def test_failed_batch_fails_its_images_only(batcher):
+    calls = []
+
+    def flaky_predict(arrays):
+        calls.append(len(arrays))
+        if len(calls) == 1:
+            raise RuntimeError("invoke failed")
+        return echo_batch(arrays)
+
+    instance = batcher(flaky_predict, max_batch_size=1, max_wait_ms=0)
+
+    with pytest.raises(RuntimeError, match="invoke failed"):
+        instance.submit(image(1)).result(timeout=5)
+    rows, _ = instance.submit(image(2)).result(timeout=5)
+    assert float(rows[0, 0]) == 2.0
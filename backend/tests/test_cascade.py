@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import app.main as server
+from app.batching import MicroBatcher
+from app.registry import ModelBundle
+
+SPECS = {spec.name: spec for spec in server.MODEL_SPECS}
+
+
+def rows(values: list):
+    def predict(arrays):
+        return np.array([values] * len(arrays), dtype=np.float32)
+    return predict
+
+
+@pytest.fixture
+def bundle():
+    batchers = []
+
+    def build(predictors: dict, screening_predictors: dict) -> ModelBundle:
+        def start(name, predict_fn):
+            batcher = MicroBatcher(name, predict_fn, max_batch_size=1, max_wait_ms=0)
+            batcher.start()
+            batchers.append(batcher)
+            return batcher
+        return ModelBundle(
+            "test", "", {}, {name: start(name, fn) for name, fn in predictors.items()},
+            screening_batchers={name: start(f"{name}_screening", fn) for name, fn in screening_predictors.items()}
+        )
+
+    yield build
+    for batcher in batchers:
+        batcher.stop()
+
+
+def image() -> np.ndarray:
+    return np.zeros((1, 4, 4, 3), dtype=np.uint8)
+
+
+def test_models_without_screening_do_not_wait_for_the_cascade(bundle):
+    glaucoma_ran = threading.Event()
+
+    def glaucoma(arrays):
+        glaucoma_ran.set()
+        return rows([0.2])(arrays)
+
+    def slow_dr_screening(arrays):
+        # Only returns once the glaucoma model has run alongside it
+        assert glaucoma_ran.wait(5)
+        return rows([0.97, 0.01, 0.01, 0.005, 0.005])(arrays)
+
+    models = bundle({"dr": rows([0.2, 0.2, 0.2, 0.2, 0.2]), "glaucoma": glaucoma}, {"dr": slow_dr_screening})
+    specs = [SPECS["dr"], SPECS["glaucoma"]]
+
+    results, timing, _, tiers = asyncio.run(server.run_diagnosis_models(
+        {"dr": image(), "glaucoma": image()}, models, specs, {"dr": image()}
+    ))
+
+    assert tiers == {"dr": "screening", "glaucoma": "full"}
+    assert list(results) == [SPECS["dr"].result_key, SPECS["glaucoma"].result_key]
+    assert results[SPECS["dr"].result_key]["prediction"] == "No DR"
+    assert "dr_screening_ms" in timing and "glaucoma_prediction_ms" in timing
+
+
+def test_uncertain_screening_escalates_to_the_full_model(bundle):
+    models = bundle({"dr": rows([0.0, 0.0, 0.95, 0.05, 0.0])}, {"dr": rows([0.4, 0.3, 0.3, 0.0, 0.0])})
+
+    results, _, batching, tiers = asyncio.run(server.run_diagnosis_models(
+        {"dr": image()}, models, [SPECS["dr"]], {"dr": image()}
+    ))
+
+    assert tiers == {"dr": "full"}
+    assert results[SPECS["dr"].result_key]["prediction"] == "Moderate NPDR"
+    assert batching["dr_batch_size"] == 1
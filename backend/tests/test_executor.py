@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from app.executor import InferenceExecutor, InferenceSaturated
+from app.logs import REQUEST_ID
+
+
+def test_run_carries_the_request_id_to_the_worker_thread():
+    executor = InferenceExecutor(max_workers=1)
+
+    async def run():
+        REQUEST_ID.set("abc123")
+        return await executor.run(REQUEST_ID.get)
+
+    try:
+        assert asyncio.run(run()) == "abc123"
+    finally:
+        executor.shutdown()
+
+
+def test_default_admission_never_drops_below_min_pending():
+    executor = InferenceExecutor(max_workers=1, min_pending=8)
+    try:
+        assert executor.max_pending == 8
+        for _ in range(8):
+            executor.acquire()
+        with pytest.raises(InferenceSaturated):
+            executor.acquire()
+    finally:
+        executor.shutdown()
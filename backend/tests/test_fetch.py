@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.fetch import ImageFetcher, ImageTooLarge
+
+MAX_BYTES = 256 * 1024
+CHUNK = 16 * 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Image host that serves well-behaved, oversized and slow bodies"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, total: int, declare_length: bool, delay: float = 0.0):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        if declare_length:
+            self.send_header("Content-Length", str(total))
+        else:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            while sent < total:
+                size = min(CHUNK, total - sent)
+                payload = b"\xff" * size
+                if declare_length:
+                    self.wfile.write(payload)
+                else:
+                    self.wfile.write(f"{size:x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+                sent += size
+                if delay:
+                    time.sleep(delay)
+            if not declare_length:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        if self.path == "/ok":
+            self._send_body(MAX_BYTES // 2, declare_length=True)
+        elif self.path == "/oversized-declared":
+            self._send_body(MAX_BYTES * 4, declare_length=True)
+        elif self.path == "/oversized-chunked":
+            self._send_body(MAX_BYTES * 4, declare_length=False)
+        elif self.path == "/slow-trickle":
+            self._send_body(MAX_BYTES // 2, declare_length=False, delay=0.2)
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture(scope="module")
+def image_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url: str, **kwargs) -> bytes:
+    async def run():
+        fetcher = ImageFetcher(MAX_BYTES, connect_timeout=1.0, **kwargs)
+        try:
+            return await fetcher.fetch(url)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(run())
+
+
+def test_fetch_returns_body(image_host):
+    assert fetch(f"{image_host}/ok") == b"\xff" * (MAX_BYTES // 2)
+
+
+def test_declared_oversized_body_is_rejected_before_reading(image_host):
+    with pytest.raises(ImageTooLarge, match="declared"):
+        fetch(f"{image_host}/oversized-declared")
+
+
+def test_oversized_body_is_rejected_while_streaming(image_host):
+    with pytest.raises(ImageTooLarge, match="more than"):
+        fetch(f"{image_host}/oversized-chunked")
+
+
+def test_declared_length_is_also_enforced_while_streaming(image_host):
+    with pytest.raises(ImageTooLarge, match="more than"):
+        fetch(f"{image_host}/oversized-declared", check_content_length=False)
+
+
+def test_slow_host_hits_total_timeout(image_host):
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        fetch(f"{image_host}/slow-trickle", read_timeout=5.0, total_timeout=0.5)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_http_errors_propagate(image_host):
+    with pytest.raises(httpx.HTTPStatusError, match="404"):
+        fetch(f"{image_host}/missing")
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import app.main as server
+
+
+class StandInInterpreter:
+    """Float model that sums each image, with an optionally fixed batch dimension"""
+
+    def __init__(self, fixed_batch: bool = False):
+        self.fixed_batch = fixed_batch
+        self.shape = np.array([1, 2, 2, 3])
+        self.allocations = 0
+        self.invokes = []
+        self._input = np.zeros(self.shape, dtype=np.float32)
+        self._output = np.zeros((1, 1), dtype=np.float32)
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": self.shape.copy(), "dtype": np.float32,
+                 "quantization_parameters": {"scales": np.array([]), "zero_points": np.array([])}}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array(self._output.shape), "dtype": np.float32,
+                 "quantization_parameters": {"scales": np.array([]), "zero_points": np.array([])}}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = np.array(shape)
+
+    def allocate_tensors(self):
+        if self.fixed_batch and self.shape[0] != 1:
+            raise RuntimeError("tensor has a fixed batch dimension")
+        self.allocations += 1
+        self._input = np.zeros(self.shape, dtype=np.float32)
+        self._output = np.zeros((self.shape[0], 1), dtype=np.float32)
+
+    def set_tensor(self, index, value):
+        assert value.shape == self._input.shape
+        self._input[...] = value
+
+    def invoke(self):
+        self.invokes.append(self._input.shape[0])
+        self._output[:, 0] = self._input.reshape(self._input.shape[0], -1).sum(axis=1)
+
+    def tensor(self, index):
+        return lambda: self._output
+
+    def get_tensor(self, index):
+        return self._output.copy()
+
+
+def predict(interpreter, images):
+    return server.predict_with_tflite_quantized(
+        interpreter, interpreter.get_input_details(), interpreter.get_output_details(),
+        images, 1.0, 0, 1.0, 0
+    )
+
+
+def batch(*values) -> np.ndarray:
+    return np.stack([np.full((2, 2, 3), value, dtype=np.float32) for value in values])
+
+
+def test_repeated_batch_size_is_allocated_once():
+    interpreter = StandInInterpreter()
+
+    for _ in range(3):
+        np.testing.assert_allclose(predict(interpreter, [batch(1), batch(2)]), [[12.0], [24.0]])
+    predict(interpreter, batch(1))
+
+    assert interpreter.allocations == 2
+    assert interpreter.invokes == [2, 2, 2, 1]
+
+
+@pytest.mark.parametrize("zero_copy", [True, False])
+def test_fixed_batch_model_falls_back_to_per_image_invokes(monkeypatch, zero_copy):
+    monkeypatch.setattr(server, "ZERO_COPY_INPUT", zero_copy)
+    interpreter = StandInInterpreter(fixed_batch=True)
+
+    first = predict(interpreter, [batch(1, 2), batch(3)])
+    second = predict(interpreter, batch(4, 5))
+
+    np.testing.assert_allclose(first, [[12.0], [24.0], [36.0]])
+    np.testing.assert_allclose(second, [[48.0], [60.0]])
+    assert interpreter.invokes == [1] * 5
+    assert list(interpreter.shape) == [1, 2, 2, 3]
@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.jobs import DONE, JobQueue, JobStore
+
+LIMITS = {"interactive": 10, "bulk": 10}
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+async def echo(job: dict) -> dict:
+    return {"n": job["request"]["n"]}
+
+
+def test_recover_leaves_live_leases_alone(store_path):
+    owner = JobStore(store_path, LIMITS, lease_seconds=0.3)
+    sibling = JobStore(store_path, LIMITS, lease_seconds=0.3)
+    owner.submit({"n": 1}, b"image", "bulk")
+    job = owner.claim()
+
+    assert sibling.recover() == (0, 0)
+    time.sleep(0.2)
+    owner.heartbeat([job["job_id"]])
+    time.sleep(0.2)
+    assert sibling.recover() == (0, 0)
+
+    time.sleep(0.4)
+    assert sibling.recover() == (1, 0)
+    assert not owner.finish(job["job_id"], {"n": 1})
+    retried = sibling.claim()
+    assert retried["attempt"] == 2
+    assert sibling.finish(retried["job_id"], {"n": 1})
+    assert sibling.get(retried["job_id"])["status"] == DONE
+
+
+def test_finished_jobs_drop_their_image(store_path):
+    store = JobStore(store_path, LIMITS)
+    store.submit({"n": 1}, b"image" * 1000, "interactive")
+    job = store.claim()
+    store.finish(job["job_id"], {"n": 1})
+
+    assert store._conn.execute("SELECT COUNT(image) FROM jobs").fetchone()[0] == 0
+
+
+class FlakyStore(JobStore):
+    """Fails the first claim and heartbeat with a locked database"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = {"claim": 1, "heartbeat": 1}
+        self.heartbeats = 0
+
+    def _fail(self, name: str):
+        if self.failures[name]:
+            self.failures[name] -= 1
+            raise sqlite3.OperationalError("database is locked")
+
+    def claim(self):
+        self._fail("claim")
+        return super().claim()
+
+    def heartbeat(self, job_ids):
+        self._fail("heartbeat")
+        self.heartbeats += 1
+        return super().heartbeat(job_ids)
+
+
+def test_queue_survives_sqlite_errors(store_path):
+    async def slow(job: dict) -> dict:
+        await asyncio.sleep(0.4)
+        return await echo(job)
+
+    async def run():
+        store = FlakyStore(store_path, LIMITS, lease_seconds=0.15)
+        queue = JobQueue(store, slow, workers=1, poll_interval=0.05)
+        await queue.start()
+        try:
+            job = await queue.submit({"n": 7}, None, "interactive")
+            finished = await queue.wait(job["job_id"], 5)
+            return finished, store
+        finally:
+            await queue.stop()
+
+    finished, store = asyncio.run(run())
+    assert finished["status"] == DONE
+    assert finished["result"] == {"n": 7}
+    assert finished["attempts"] == 1
+    assert store.failures == {"claim": 0, "heartbeat": 0}
+    assert store.heartbeats >= 1
+
+
+def test_waiters_are_dropped_after_waiting(store_path):
+    async def run():
+        queue = JobQueue(JobStore(store_path, LIMITS), echo, workers=1, poll_interval=0.05)
+        await queue.start()
+        try:
+            jobs = [await queue.submit({"n": n}, None, "bulk") for n in range(3)]
+            finished = await asyncio.gather(*(queue.wait(job["job_id"], 5) for job in jobs))
+            missing = await queue.wait("missing", 0.1)
+            return finished, missing, dict(queue._waiters)
+        finally:
+            await queue.stop()
+
+    finished, missing, waiters = asyncio.run(run())
+    assert [job["result"]["n"] for job in finished] == [0, 1, 2]
+    assert missing is None
+    assert waiters == {}
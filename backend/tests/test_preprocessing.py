@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.preprocessing import (
+    decode_image,
+    preprocess_image_fast,
+    preprocess_image_quantized,
+    quantize_pixels,
+)
+from app.quantization import TensorQuantization
+
+# Usual INT8 input calibration: [0, 1] over the full int8 range
+SCALE, ZERO_POINT = 1.0 / 255.0, -128
+
+
+def fundus_like(fmt: str, size: int = 1024, seed: int = 0) -> bytes:
+    """A lit disc with vessel-like texture and sensor noise on a dark background"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    radius = np.sqrt((xx - size / 2) ** 2 + (yy - size / 2) ** 2) / (size / 2)
+    disc = np.clip(1.0 - radius, 0, 1) ** 0.8
+    vessels = 0.15 * np.sin(xx / 12) * np.cos(yy / 20)
+    rgb = np.stack([disc * 210, disc * 100 + vessels * 60, disc * 45], axis=-1)
+    rgb += rng.normal(0, 6, rgb.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def reference_int8(image_bytes: bytes) -> np.ndarray:
+    pixels = preprocess_image_quantized(Image.open(io.BytesIO(image_bytes)))
+    return TensorQuantization(np.int8, SCALE, ZERO_POINT, axis=3, ndim=4).quantize(pixels)
+
+
+def fast_int8(image_bytes: bytes) -> np.ndarray:
+    pixels = preprocess_image_fast(decode_image(image_bytes, (224, 224)))
+    return quantize_pixels(pixels, np.int8, SCALE, ZERO_POINT)
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_fast_path_matches_reference(fmt):
+    data = fundus_like(fmt)
+    reference = reference_int8(data).astype(np.int16)
+    fast = fast_int8(data).astype(np.int16)
+
+    assert fast.shape == reference.shape == (1, 224, 224, 3)
+    diff = np.abs(fast - reference)
+    assert diff.mean() <= 2.0
+    assert np.percentile(diff, 99) <= 4
+
+
+@pytest.mark.parametrize("dtype, scale, zero_point", [
+    (np.int8, 1.0 / 255.0, -128),
+    (np.uint8, 1.0 / 255.0, 0),
+    (np.int8, 0.0078125, 0),
+    (np.int16, 1.0 / 32768.0, 0),
+])
+def test_quantize_pixels_matches_float_quantization(dtype, scale, zero_point):
+    pixels = np.arange(256, dtype=np.uint8).reshape(1, 16, 16, 1).repeat(3, axis=3)
+    expected = TensorQuantization(dtype, scale, zero_point).quantize(pixels.astype(np.float32) / 255.0)
+
+    quantized = quantize_pixels(pixels, dtype, scale, zero_point)
+
+    assert quantized.dtype == np.dtype(dtype)
+    assert np.max(np.abs(quantized.astype(np.int32) - expected.astype(np.int32))) <= 1
+
+
+def test_quantize_pixels_writes_into_out():
+    pixels = np.full((1, 8, 8, 3), 200, dtype=np.uint8)
+    out = np.zeros((1, 8, 8, 3), dtype=np.int8)
+
+    assert quantize_pixels(pixels, np.int8, SCALE, ZERO_POINT, out=out) is out
+    assert np.all(out == 72)
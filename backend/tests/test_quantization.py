@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from app.quantization import TensorQuantization
+
+
+def per_channel_dequantize(values: np.ndarray, scales: np.ndarray, zero_points: np.ndarray, axis: int) -> np.ndarray:
+    """Reference: dequantize one slice of ``axis`` at a time"""
+    moved = np.moveaxis(values, axis, 0).astype(np.float32)
+    slices = [scales[c] * (moved[c] - zero_points[c]) for c in range(moved.shape[0])]
+    return np.moveaxis(np.stack(slices), 0, axis)
+
+
+@pytest.mark.parametrize("dtype", [np.int8, np.uint8, np.int16])
+@pytest.mark.parametrize("shape, axis", [((16, 8), 1), ((4, 6, 6, 8), 3), ((8, 3, 3), 0)])
+def test_per_axis_dequantize_matches_per_channel_loop(dtype, shape, axis):
+    rng = np.random.default_rng(0)
+    info = np.iinfo(dtype)
+    channels = shape[axis]
+    scales = rng.uniform(0.001, 0.05, channels).astype(np.float32)
+    zero_points = rng.integers(max(info.min, -10), min(info.max, 10), channels).astype(np.int32)
+    values = rng.integers(info.min, int(info.max) + 1, shape).astype(dtype)
+    quantization = TensorQuantization(dtype, scales, zero_points, axis=axis, ndim=len(shape))
+
+    dequantized = quantization.dequantize(values)
+
+    assert quantization.per_axis
+    assert dequantized.dtype == np.float32
+    np.testing.assert_allclose(dequantized, per_channel_dequantize(values, scales, zero_points, axis),
+                               rtol=1e-6, atol=1e-6)
+    np.testing.assert_array_equal(quantization.quantize(dequantized), values)
+
+
+def test_per_tensor_round_trip_and_saturation():
+    quantization = TensorQuantization(np.int8, [0.02], [-5])
+    values = np.arange(-128, 128, dtype=np.int8)
+
+    assert not quantization.per_axis
+    np.testing.assert_array_equal(quantization.quantize(quantization.dequantize(values)), values)
+    np.testing.assert_array_equal(quantization.quantize(np.array([-100.0, 100.0], dtype=np.float32)),
+                                  np.array([-128, 127], dtype=np.int8))
+
+
+def test_from_details_reads_per_axis_parameters():
+    details = {
+        "dtype": np.int8,
+        "shape": np.array([1, 5]),
+        "quantization_parameters": {
+            "scales": np.array([0.1, 0.2, 0.3, 0.4, 0.5], dtype=np.float32),
+            "zero_points": np.array([0, 1, 2, 3, 4], dtype=np.int32),
+            "quantized_dimension": 1,
+        },
+    }
+    quantization = TensorQuantization.from_details(details)
+
+    values = np.full((1, 5), 10, dtype=np.int8)
+    np.testing.assert_allclose(quantization.dequantize(values), [[1.0, 1.8, 2.4, 2.8, 3.0]], rtol=1e-6)
+
+
+def test_float_tensors_pass_through():
+    quantization = TensorQuantization(np.float32, [], [])
+    values = np.linspace(0, 1, 10, dtype=np.float32)
+
+    assert not quantization.quantized
+    assert quantization.dequantize(values) is values
+    assert quantization.quantize(values) is values
@@ -0,0 +1,34 @@
+import pytest
+
+from app.models import ModelSpec
+from score_images import CsvResultWriter, ParquetResultWriter, result_columns
+
+SPECS = (ModelSpec("dr", "diabetic_retinopathy", "DR", "dr.tflite", "dr_float.tflite", ["No DR", "Mild NPDR"], {}),)
+COLUMNS = result_columns(SPECS)
+
+FAILED = {"path": "a.jpg", "error": "ValueError: corrupt"}
+SCORED = {"path": "b.jpg", "error": "", "dr_prediction": "No DR", "dr_confidence": 0.9,
+          "dr_severity_level": 0, "dr_prob_no_dr": 0.9, "dr_prob_mild_npdr": 0.1}
+
+
+def test_csv_resume_retries_failed_images(tmp_path):
+    writer = CsvResultWriter(str(tmp_path / "scores.csv"), COLUMNS)
+    with writer:
+        writer.write([FAILED, SCORED])
+
+    assert writer.completed_paths() == {"b.jpg"}
+
+
+def test_parquet_parts_share_one_schema(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    writer = ParquetResultWriter(str(tmp_path / "scores"), COLUMNS)
+    with writer:
+        writer.write([FAILED])
+        writer.write([SCORED])
+
+    table = ds.dataset(str(tmp_path / "scores")).to_table()
+    assert table.num_rows == 2
+    assert table.schema.field("dr_confidence").type == "double"
+    assert writer.completed_paths() == {"b.jpg"}